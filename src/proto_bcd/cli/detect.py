@@ -13,9 +13,11 @@
 # limitations under the License.
 
 import click
+from concurrent.futures import ThreadPoolExecutor
 from proto_bcd.detector.options import Options
-from proto_bcd.detector.loader import Loader
+from proto_bcd.detector.loader import Loader, ensure_dependency_descriptor_set
 from proto_bcd.detector.detector import Detector
+from proto_bcd.findings.finding_category import ChangeType
 
 
 @click.command()
@@ -37,16 +39,22 @@ from proto_bcd.detector.detector import Detector
 )
 @click.option(
     "--original_descriptor_set_file_path",
-    help="The path to the original compiled descriptor set file.",
+    help="The path to the original compiled descriptor set file. It can be compressed with gzip, bz2 or xz.",
 )
 @click.option(
     "--update_descriptor_set_file_path",
-    help="The path to the update compiled descriptor set file.",
+    help="The path to the update compiled descriptor set file. It can be compressed with gzip, bz2 or xz.",
 )
 @click.option(
     "--output_json_path",
     help="The file path for json output which contains all the breaking change findings. The default path is the current folder.",
 )
+@click.option(
+    "--output_format",
+    type=click.Choice(["json", "jsonl"]),
+    default="json",
+    help="The format of the findings file at --output_json_path. jsonl writes one finding per line as soon as it is found. The default is json.",
+)
 @click.option(
     "--human_readable_message",
     default=False,
@@ -65,6 +73,32 @@ from proto_bcd.detector.detector import Detector
     is_flag=True,
     help="Show all changes between two API definitions, not only breaking changes.",
 )
+@click.option(
+    "--cache_dir",
+    help="The directory of a local cache of the descriptor sets compiled from the proto API definition files. The cached descriptor set is used when the proto files, the directories and the protoc are unchanged.",
+)
+@click.option(
+    "--dependency_descriptor_set",
+    help="The path of a descriptor set of the common dependencies (google/api, google/protobuf, ...) that protoc reuses instead of parsing them again. It is built before the first use, and built again when the dependency files in the original API definition directories change.",
+)
+@click.option(
+    "--original_descriptor_set_out",
+    help="Write a snapshot of the original descriptor set to this path, for a later --original_descriptor_set_file_path.",
+)
+@click.option(
+    "--update_descriptor_set_out",
+    help="Write a snapshot of the update descriptor set to this path, for a later --update_descriptor_set_file_path.",
+)
+@click.option(
+    "--descriptor_set_out_compression",
+    type=click.Choice(["gzip", "bz2", "xz"]),
+    help="Compress the descriptor set snapshots. They are not compressed by default.",
+)
+@click.option(
+    "--index_processes",
+    type=click.IntRange(min=1),
+    help="The number of processes that index the files of a descriptor set of 16 MiB or more. They are indexed in a single process by default.",
+)
 def detect(
     original_api_definition_dirs: str,
     update_api_definition_dirs: str,
@@ -73,9 +107,16 @@ def detect(
     original_descriptor_set_file_path: str,
     update_descriptor_set_file_path: str,
     output_json_path: str,
+    output_format: str,
     human_readable_message: bool,
     line_numbers: bool,
     all_changes: bool,
+    cache_dir: str,
+    dependency_descriptor_set: str,
+    original_descriptor_set_out: str,
+    update_descriptor_set_out: str,
+    descriptor_set_out_compression: str,
+    index_processes: int,
 ):
     """Detect the breaking changes of the original and updated versions of API definition files."""
     # 1. Read the stdin options and create the Options object for all the command args.
@@ -91,42 +132,90 @@ def detect(
         update_descriptor_set_file_path=update_descriptor_set_file_path,
         human_readable_message=human_readable_message,
         output_json_path=output_json_path,
+        output_format=output_format,
         line_numbers=line_numbers,
         all_changes=all_changes,
+        cache_dir=cache_dir,
+        dependency_descriptor_set=dependency_descriptor_set,
+        original_descriptor_set_out=original_descriptor_set_out,
+        update_descriptor_set_out=update_descriptor_set_out,
+        descriptor_set_out_compression=descriptor_set_out_compression,
+        index_processes=index_processes,
     )
     # 3. Create protoc command (back up solution) to load the FileDescriptorSet.
     # It takes options, returns file_descriptor_set.
     if options.use_descriptor_set():
-        file_set_original = Loader(
-            proto_definition_dirs=None,
-            proto_files=None,
-            descriptor_set=options.original_descriptor_set_file_path,
-        ).get_descriptor_set()
-        file_set_update = Loader(
-            proto_definition_dirs=None,
-            proto_files=None,
-            descriptor_set=options.update_descriptor_set_file_path,
-        ).get_descriptor_set()
+        file_set_original, file_set_update = _load_concurrently(
+            Loader(
+                proto_definition_dirs=None,
+                proto_files=None,
+                descriptor_set=options.original_descriptor_set_file_path,
+                lazy=True,
+                descriptor_set_out=options.original_descriptor_set_out,
+                descriptor_set_out_compression=options.descriptor_set_out_compression,
+            ),
+            Loader(
+                proto_definition_dirs=None,
+                proto_files=None,
+                descriptor_set=options.update_descriptor_set_file_path,
+                lazy=True,
+                descriptor_set_out=options.update_descriptor_set_out,
+                descriptor_set_out_compression=options.descriptor_set_out_compression,
+            ),
+        )
     elif options.use_proto_dirs():
-        file_set_original = Loader(
-            proto_definition_dirs=options.original_api_definition_dirs,
-            proto_files=options.original_proto_files,
-            descriptor_set=None,
-        ).get_descriptor_set()
-        file_set_update = Loader(
-            proto_definition_dirs=options.update_api_definition_dirs,
-            proto_files=options.update_proto_files,
-            descriptor_set=None,
-        ).get_descriptor_set()
+        if options.dependency_descriptor_set:
+            # Build the dependency descriptor set once, before the loaders
+            # use it. A loader skips it if its own dependencies differ.
+            ensure_dependency_descriptor_set(
+                options.dependency_descriptor_set,
+                options.original_api_definition_dirs,
+                protoc_in_subprocess=True,
+            )
+        # The two loaders run protoc concurrently, each in its own process.
+        file_set_original, file_set_update = _load_concurrently(
+            Loader(
+                proto_definition_dirs=options.original_api_definition_dirs,
+                proto_files=options.original_proto_files,
+                descriptor_set=None,
+                cache_dir=options.cache_dir,
+                protoc_in_subprocess=True,
+                dependency_descriptor_set=options.dependency_descriptor_set,
+                lazy=True,
+                descriptor_set_out=options.original_descriptor_set_out,
+                descriptor_set_out_compression=options.descriptor_set_out_compression,
+            ),
+            Loader(
+                proto_definition_dirs=options.update_api_definition_dirs,
+                proto_files=options.update_proto_files,
+                descriptor_set=None,
+                cache_dir=options.cache_dir,
+                protoc_in_subprocess=True,
+                dependency_descriptor_set=options.dependency_descriptor_set,
+                lazy=True,
+                descriptor_set_out=options.update_descriptor_set_out,
+                descriptor_set_out_compression=options.descriptor_set_out_compression,
+            ),
+        )
     # 4. Create the detector with two FileDescriptorSet and options.
     detector = Detector(file_set_original, file_set_update, options)
     # 5. Invoke the detector. It creates output_json file and prints
     # human-readable message if the option is enabled.
+    # The findings are counted as they are found, the JSON Lines findings
+    # are not kept.
     if all_changes:
-        result = detector.detect_all_changes()
-    else:
-        result = detector.detect_breaking_changes()
-    return len(result)
+        detector.detect_all_changes()
+        return detector.finding_container.count()
+    detector.detect_breaking_changes()
+    return detector.finding_container.count(ChangeType.MAJOR)
+
+
+def _load_concurrently(*loaders: Loader):
+    # Load the descriptor sets of the loaders concurrently, the threads mostly
+    # wait for the protoc processes or the file reads.
+    with ThreadPoolExecutor(max_workers=len(loaders)) as executor:
+        futures = [executor.submit(loader.get_descriptor_set) for loader in loaders]
+        return [future.result() for future in futures]
 
 
 if __name__ == "__main__":
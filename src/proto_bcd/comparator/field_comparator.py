@@ -92,6 +92,12 @@ class FieldComparator:
             )
             return
 
+        # Read the attributes that are used by several checks below only once.
+        required_update = self.field_update.required
+        proto_type_original = self.field_original.proto_type.value
+        proto_type_update = self.field_update.proto_type
+        type_name_original = self.field_original.type_name
+        type_name_update = self.field_update.type_name
         # 4. If the FieldDescriptors have the same name, check if the
         # repeated state of them stay the same.
         if self.field_original.repeated.value != self.field_update.repeated.value:
@@ -105,11 +111,11 @@ class FieldComparator:
                 extra_info=self.field_update.nested_path,
             )
         # Field option change from optional to required is breaking.
-        if not self.field_original.required.value and self.field_update.required.value:
+        if not self.field_original.required.value and required_update.value:
             self.finding_container.add_finding(
                 category=FindingCategory.FIELD_BEHAVIOR_CHANGE,
                 proto_file_name=self.field_update.proto_file_name,
-                source_code_line=self.field_update.required.source_code_line,
+                source_code_line=required_update.source_code_line,
                 subject=self.field_update.name,
                 context=self.context,
                 conventional_commit_tag=ConventionalCommitTag.FIX_BREAKING,
@@ -117,58 +123,58 @@ class FieldComparator:
                 + ["(google.api.field_behavior)"],
             )
         # 5. Check the type of the field.
-        if self.field_original.proto_type.value != self.field_update.proto_type.value:
+        if proto_type_original != proto_type_update.value:
             self.finding_container.add_finding(
                 category=FindingCategory.FIELD_TYPE_CHANGE,
                 proto_file_name=self.field_update.proto_file_name,
-                source_code_line=self.field_update.proto_type.source_code_line,
+                source_code_line=proto_type_update.source_code_line,
                 subject=self.field_update.name,
                 context=self.context,
-                oldtype=self.field_original.proto_type.value,
-                type=self.field_update.proto_type.value,
+                oldtype=proto_type_original,
+                type=proto_type_update.value,
                 conventional_commit_tag=ConventionalCommitTag.FIX_BREAKING,
                 extra_info=self.field_update.nested_path,
             )
         # If field has the same primitive type, then the type should be identical.
         # If field has the same non-primitive type like `TYPE_ENUM`.
         # Check the type_name of the field.
-        elif self.field_original.type_name and (
-            self.field_original.type_name.value != self.field_update.type_name.value
+        elif type_name_original and (
+            type_name_original.value != type_name_update.value
         ):
             # Version update is allowed here, for example from `.example.v1.Enum` to `.example.v1beta1.Enum`.
             # But from `.example.v1.Enum` to `.example.v2.EnumUpdate` is breaking.
             transformed_type_name = self._transformed_type_name(
-                self.field_original.type_name.value
+                type_name_original.value
             )
             if (
                 not transformed_type_name
-                or transformed_type_name != self.field_update.type_name.value
+                or transformed_type_name != type_name_update.value
             ):
                 self.finding_container.add_finding(
                     category=FindingCategory.FIELD_TYPE_CHANGE,
                     proto_file_name=self.field_update.proto_file_name,
-                    source_code_line=self.field_update.type_name.source_code_line,
+                    source_code_line=type_name_update.source_code_line,
                     subject=self.field_original.name,
                     context=self.context,
-                    oldtype=self.field_original.type_name.value,
-                    type=self.field_update.type_name.value,
+                    oldtype=type_name_original.value,
+                    type=type_name_update.value,
                     conventional_commit_tag=ConventionalCommitTag.FIX_BREAKING,
                     extra_info=self.field_update.nested_path,
                 )
         # If the fields have the same type_name, but they are map type,
         # the key type and value type should also be identical.
-        elif self.field_original.type_name:
+        elif type_name_original:
             if self.field_original.is_map_type and not self.field_update.is_map_type:
                 key_original = self.field_original.map_entry_type["key"]
                 value_original = self.field_original.map_entry_type["value"]
                 self.finding_container.add_finding(
                     category=FindingCategory.FIELD_TYPE_CHANGE,
                     proto_file_name=self.field_update.proto_file_name,
-                    source_code_line=self.field_update.type_name.source_code_line,
+                    source_code_line=type_name_update.source_code_line,
                     subject=self.field_original.name,
                     context=self.context,
                     oldtype=f"map<{key_original}, {value_original}>",
-                    type=self.field_update.type_name.value,
+                    type=type_name_update.value,
                     conventional_commit_tag=ConventionalCommitTag.FIX_BREAKING,
                     extra_info=self.field_update.nested_path,
                 )
@@ -178,10 +184,10 @@ class FieldComparator:
                 self.finding_container.add_finding(
                     category=FindingCategory.FIELD_TYPE_CHANGE,
                     proto_file_name=self.field_update.proto_file_name,
-                    source_code_line=self.field_update.type_name.source_code_line,
+                    source_code_line=type_name_update.source_code_line,
                     subject=self.field_original.name,
                     context=self.context,
-                    oldtype=self.field_original.type_name.value,
+                    oldtype=type_name_original.value,
                     type=f"map<{key_update}, {value_update}>",
                     conventional_commit_tag=ConventionalCommitTag.FIX_BREAKING,
                     extra_info=self.field_update.nested_path,
@@ -206,7 +212,7 @@ class FieldComparator:
                     self.finding_container.add_finding(
                         category=FindingCategory.FIELD_TYPE_CHANGE,
                         proto_file_name=self.field_update.proto_file_name,
-                        source_code_line=self.field_update.type_name.source_code_line,
+                        source_code_line=type_name_update.source_code_line,
                         subject=self.field_original.name,
                         context=self.context,
                         oldtype=f"map<{key_original}, {value_original}>",
@@ -272,15 +278,15 @@ class FieldComparator:
         self._compare_resource_reference()
 
         # 9. Field changing a field format is breaking.
+        format_original = self.field_original.fieldInfo.value.format
         if (
-            self.field_original.fieldInfo.value.format != FORMAT_UNSPECIFIED
-            and self.field_original.fieldInfo.value.format
-            != self.field_update.fieldInfo.value.format
+            format_original != FORMAT_UNSPECIFIED
+            and format_original != self.field_update.fieldInfo.value.format
         ):
             self.finding_container.add_finding(
                 category=FindingCategory.FIELD_FORMAT_CHANGE,
                 proto_file_name=self.field_update.proto_file_name,
-                source_code_line=self.field_update.required.source_code_line,
+                source_code_line=required_update.source_code_line,
                 subject=self.field_update.name,
                 context=self.context,
                 conventional_commit_tag=ConventionalCommitTag.FIX_BREAKING,
@@ -12,7 +12,9 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import logging
 import os.path
+from collections import Counter
 from proto_bcd.comparator.service_comparator import ServiceComparator
 from proto_bcd.comparator.message_comparator import DescriptorComparator
 from proto_bcd.comparator.enum_comparator import EnumComparator
@@ -30,10 +32,20 @@ class FileSetComparator:
         file_set_original: FileSet,
         file_set_update: FileSet,
         finding_container: FindingContainer,
+        prune_unchanged: bool = True,
     ):
         self.fs_original = file_set_original
         self.fs_update = file_set_update
         self.finding_container = finding_container
+        # Skip the matched services, messages and enums that are defined in
+        # files which did not change, or whose structural digests are equal,
+        # since comparing them can not find any change.
+        self.prune_unchanged = prune_unchanged
+        # The number of skipped pairs, by kind.
+        self.pruned = Counter()
+        # Whether a file is identical in both versions, by file name and
+        # whether the source code information is included.
+        self._unchanged_files = {}
         self.original_definition_files = [
             f.name for f in self.fs_original.definition_files
         ]
@@ -50,6 +62,15 @@ class FileSetComparator:
         self._compare_enums()
         # 5. Check the file-level resource definitions.
         self._compare_resources()
+        if self.prune_unchanged:
+            logging.info(
+                "Skipped unchanged subtrees: %s services, %s messages, %s enums "
+                "(%s in unchanged files)",
+                self.pruned["services"],
+                self.pruned["messages"],
+                self.pruned["enums"],
+                self.pruned["in_unchanged_files"],
+            )
 
     def _compare_packaging_options(self):
         packaging_options_original = self.fs_original.packaging_options_map
@@ -61,10 +82,10 @@ class FileSetComparator:
         # (e.g. v1 against v1beta1), we cannot look at the full filenames when determining if a file is
         # added or removed. Let's just look at their basenames just for this specific comparison.
         file_basenames_in_original = [
-            os.path.basename(f.name) for f in self.fs_original.file_set_pb.file
+            os.path.basename(name) for name in self.fs_original.import_graph.indexes
         ]
         file_basenames_in_update = [
-            os.path.basename(f.name) for f in self.fs_update.file_set_pb.file
+            os.path.basename(name) for name in self.fs_update.import_graph.indexes
         ]
         if not packaging_options_original and not packaging_options_update:
             return
@@ -170,6 +191,12 @@ class FileSetComparator:
                 context=name,
             ).compare()
         for name in keys_update & keys_original:
+            if self._unchanged(
+                "services",
+                self.fs_original.services_map[name],
+                self.fs_update.services_map[name],
+            ):
+                continue
             ServiceComparator(
                 self.fs_original.services_map[name],
                 self.fs_update.services_map[name],
@@ -186,6 +213,13 @@ class FileSetComparator:
                 name if name in keys_update else self._get_version_update_name(name)
             )
             if transformed_name in keys_update:
+                compared_update_keys.add(transformed_name)
+                if self._unchanged(
+                    "messages",
+                    self.fs_original.messages_map[name],
+                    self.fs_update.messages_map[transformed_name],
+                ):
+                    continue
                 # Common dependency or same message with version updates.
                 DescriptorComparator(
                     self.fs_original.messages_map[name],
@@ -193,7 +227,6 @@ class FileSetComparator:
                     self.finding_container,
                     context=name,
                 ).compare()
-                compared_update_keys.add(transformed_name)
             else:
                 # Message only exits in the original version.
                 message = self.fs_original.messages_map[name]
@@ -230,6 +263,13 @@ class FileSetComparator:
                 name if name in keys_update else self._get_version_update_name(name)
             )
             if transformed_name in keys_update:
+                compared_update_keys.add(transformed_name)
+                if self._unchanged(
+                    "enums",
+                    self.fs_original.enums_map[name],
+                    self.fs_update.enums_map[transformed_name],
+                ):
+                    continue
                 # Common dependency or same enum with version updates.
                 EnumComparator(
                     self.fs_original.enums_map[name],
@@ -237,7 +277,6 @@ class FileSetComparator:
                     self.finding_container,
                     context=name,
                 ).compare()
-                compared_update_keys.add(transformed_name)
             else:
                 # Enum only exits in the original version.
                 removed_enum = self.fs_original.enums_map[name]
@@ -349,6 +388,55 @@ class FileSetComparator:
                 conventional_commit_tag=ConventionalCommitTag.FIX_BREAKING,
             )
 
+    def _unchanged(self, kind, original, update) -> bool:
+        if not self.prune_unchanged:
+            return False
+        # Types that are defined in a file which is byte-identical in both
+        # versions have nothing to report, except for services, which also
+        # depend on the messages of their methods.
+        if self._file_unchanged(original, update) and (
+            kind != "services" or self._method_messages_unchanged(original, update)
+        ):
+            self.pruned[kind] += 1
+            self.pruned["in_unchanged_files"] += 1
+            return True
+        # Equal digests mean that the pair has no difference to report.
+        if original.structural_digest != update.structural_digest:
+            return False
+        self.pruned[kind] += 1
+        return True
+
+    def _file_unchanged(self, original, update, include_source_code_info=True):
+        # Version-renamed files are never considered unchanged, their types
+        # go through the normal comparison.
+        file_name = original.proto_file_name
+        if file_name != update.proto_file_name:
+            return False
+        key = (file_name, include_source_code_info)
+        if key not in self._unchanged_files:
+            digest = self.fs_original.file_digest(file_name, include_source_code_info)
+            self._unchanged_files[key] = (
+                digest is not None
+                and digest
+                == self.fs_update.file_digest(file_name, include_source_code_info)
+            )
+        return self._unchanged_files[key]
+
+    def _method_messages_unchanged(self, service_original, service_update):
+        # The pagination of a method depends on the fields of its request and
+        # response messages, but not on their comments.
+        for method in service_original.methods.values():
+            for type_name in (method.input.value, method.output.value):
+                message_original = self.fs_original.global_messages_map.get(type_name)
+                message_update = self.fs_update.global_messages_map.get(type_name)
+                if message_original is None or message_update is None:
+                    return False
+                if not self._file_unchanged(
+                    message_original, message_update, include_source_code_info=False
+                ):
+                    return False
+        return True
+
     def _get_version_update_name(self, name):
         original_version = self.fs_original.api_version
         update_version = self.fs_update.api_version
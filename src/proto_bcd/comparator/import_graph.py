@@ -0,0 +1,115 @@
+# Copyright 2026 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from google.protobuf import descriptor_pb2
+
+COMMON_PACKAGES = [
+    "google.longrunning",
+    "google.cloud",
+    "google.cloud.location",
+    "google.protobuf",
+    "google.type",
+    "google.rpc",
+    "google.api",
+]
+
+
+class ImportGraph:
+    """The import graph of the files in a FileDescriptorSet, built in one pass.
+
+    files_by_name: the file descriptors in the set, by file name.
+    indexes: the position of the files in the set, by file name.
+    imports: the files that a file imports directly, by file name.
+    importers: the files in the set that import a file directly, by file name.
+    roots: the names of the files that are not imported by any other file,
+           in the order of the set.
+    """
+
+    def __init__(self, file_set_pb: descriptor_pb2.FileDescriptorSet):
+        self._file_set_pb = file_set_pb
+        # The files of a LazyFileDescriptorSet are not decoded to build the
+        # graph, their headers have the same name, package and dependency.
+        files = getattr(file_set_pb, "headers", file_set_pb.file)
+        self.indexes: Dict[str, int] = {}
+        self.imports: Dict[str, Tuple[str, ...]] = {}
+        self._packages: Dict[str, str] = {}
+        for index, fd in enumerate(files):
+            self.indexes[fd.name] = index
+            self.imports[fd.name] = tuple(fd.dependency)
+            self._packages[fd.name] = fd.package
+        self.importers: Dict[str, List[str]] = {}
+        for name, dependencies in self.imports.items():
+            for dependency in dependencies:
+                self.importers.setdefault(dependency, []).append(name)
+        self.roots = [name for name in self.indexes if name not in self.importers]
+        self._files_by_name: Optional[Dict[str, descriptor_pb2.FileDescriptorProto]] = (
+            None
+        )
+        self._root_package: Optional[str] = None
+
+    @property
+    def files_by_name(self) -> Dict[str, descriptor_pb2.FileDescriptorProto]:
+        if self._files_by_name is None:
+            files = self._file_set_pb.file
+            self._files_by_name = {
+                name: files[index] for name, index in self.indexes.items()
+            }
+        return self._files_by_name
+
+    @property
+    def root_package(self) -> str:
+        """Return the package name of the API being checked.
+
+        In this code we don't have an access to "file_to_generate" boolean flag.
+        We only have parsed proto files in a FileDescriptorSet.
+        So the idea is to take the files that are not listed as imports of any
+        other proto files (are "roots" of the dependency tree) and take the
+        common prefix of their packages (ignoring known commmon protos such as
+        google/cloud/common_resources.proto).
+        """
+        if self._root_package is None:
+            packages = [
+                self._packages[name]
+                for name in self.roots
+                if self._packages[name] not in COMMON_PACKAGES
+            ]
+            self._root_package = os.path.commonprefix(packages) if packages else ""
+        return self._root_package
+
+    def transitive_imports(self, file_name: str) -> Set[str]:
+        """Return the names of all the files that a file imports, directly or not."""
+        return self._reachable([file_name], self.imports)
+
+    def transitive_importers(self, file_name: str) -> Set[str]:
+        """Return the names of all the files that import a file, directly or not."""
+        return self._reachable([file_name], self.importers)
+
+    def closure(self, file_names: Iterable[str]) -> Set[str]:
+        """Return the names of the files and of all the files they import, directly or not."""
+        file_names = list(file_names)
+        return self._reachable(file_names, self.imports).union(file_names)
+
+    @staticmethod
+    def _reachable(file_names, edges) -> Set[str]:
+        reached = set()
+        stack = [name for file_name in file_names for name in edges.get(file_name, ())]
+        while stack:
+            name = stack.pop()
+            if name in reached:
+                continue
+            reached.add(name)
+            stack.extend(edges.get(name, ()))
+        return reached
@@ -0,0 +1,261 @@
+# Copyright 2026 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from collections.abc import Sequence
+from typing import List, Optional, Tuple, Union
+
+from google.protobuf import descriptor_pb2
+
+# Wire types of the protocol buffers encoding.
+_VARINT = 0
+_I64 = 1
+_LEN = 2
+_START_GROUP = 3
+_END_GROUP = 4
+_I32 = 5
+# Field numbers of FileDescriptorSet.file and of FileDescriptorProto.
+_FILE = 1
+_NAME = 1
+_PACKAGE = 2
+_DEPENDENCY = 3
+_SOURCE_CODE_INFO = 9
+
+
+class LazyFileDescriptorSet:
+    """A FileDescriptorSet that decodes its files on demand.
+
+    The serialized set is only scanned for the boundaries of the files, and
+    then for the names, packages and dependencies of a file in `headers`. A
+    file is decoded the first time it is accessed in `file`, without its
+    source_code_info, which is decoded separately by `source_code_info`. The
+    buffer is kept, so it can be a memoryview of a mapped file.
+    """
+
+    def __init__(self, data: Union[bytes, memoryview]):
+        self._data = memoryview(data)
+        # The start of the tag and the (start, end) of the payload of the
+        # files in the set.
+        self._spans: List[Tuple[int, int, int]] = [
+            (tag_start, start, end)
+            for field_number, wire_type, tag_start, start, end in _fields(
+                self._data, 0, self._data.nbytes
+            )
+            if field_number == _FILE and wire_type == _LEN
+        ]
+        # The headers are scanned on the first access.
+        self._headers: List[Optional[_FileHeader]] = [None] * len(self._spans)
+        self.file = _LazyFiles(self)
+
+    @classmethod
+    def FromString(cls, data: Union[bytes, memoryview]) -> "LazyFileDescriptorSet":
+        return cls(data)
+
+    @property
+    def headers(self) -> List["_FileHeader"]:
+        """The name, package and dependency of the files, in the same order as `file`."""
+        return [self.header(index) for index in range(len(self._spans))]
+
+    def header(self, index: int) -> "_FileHeader":
+        header = self._headers[index]
+        if header is None:
+            header = self._headers[index] = _FileHeader(self._data, *self._spans[index])
+        return header
+
+    def set_headers(self, files: range, headers: List["_FileHeader"]):
+        """Set the headers of a range of the files, scanned from `serialized(files)`."""
+        offset = self._spans[files[0]][0] if files else 0
+        for index, header in zip(files, headers):
+            header.shift(offset)
+            self._headers[index] = header
+
+    @property
+    def nbytes(self) -> int:
+        return self._data.nbytes
+
+    def chunks(self, max_bytes: int) -> List[range]:
+        """Split the files into consecutive ranges of at most `max_bytes`.
+
+        A file larger than `max_bytes` is a range of its own.
+        """
+        chunks = []
+        first = 0
+        size = 0
+        for index, (tag_start, _, end) in enumerate(self._spans):
+            if index > first and size + end - tag_start > max_bytes:
+                chunks.append(range(first, index))
+                first = index
+                size = 0
+            size += end - tag_start
+        if first < len(self._spans):
+            chunks.append(range(first, len(self._spans)))
+        return chunks
+
+    def serialized(self, files: range) -> memoryview:
+        """Return a serialized FileDescriptorSet of a range of the files."""
+        if not files:
+            return self._data[0:0]
+        return self._data[self._spans[files[0]][0] : self._spans[files[-1]][2]]
+
+    def source_code_info(self, index: int) -> descriptor_pb2.SourceCodeInfo:
+        """Decode the source_code_info of a file."""
+        return descriptor_pb2.SourceCodeInfo.FromString(
+            self.source_code_info_bytes(index)
+        )
+
+    def source_code_info_bytes(self, index: int) -> bytes:
+        """Return the serialized source_code_info of a file, as in the set."""
+        # A message field that is repeated on the wire is merged, which for
+        # SourceCodeInfo is the same as concatenating the payloads.
+        return b"".join(
+            self._data[start:end]
+            for _, start, end in self.header(index).source_code_info
+        )
+
+    def __len__(self):
+        return len(self._spans)
+
+
+class _FileHeader:
+    __slots__ = (
+        "start",
+        "end",
+        "name",
+        "package",
+        "dependency",
+        "source_code_info",
+    )
+
+    def __init__(self, data: memoryview, tag_start: int, start: int, end: int):
+        # The payload of the file is data[start:end].
+        self.start = start
+        self.end = end
+        self.name = ""
+        self.package = ""
+        self.dependency: List[str] = []
+        # The start of the tag, and the (start, end) of the payload, of the
+        # source_code_info fields.
+        self.source_code_info: List[Tuple[int, int, int]] = []
+        for field_number, wire_type, tag_start, field_start, field_end in _fields(
+            data, start, end
+        ):
+            if wire_type != _LEN:
+                continue
+            if field_number == _NAME:
+                self.name = str(data[field_start:field_end], "utf-8")
+            elif field_number == _PACKAGE:
+                self.package = str(data[field_start:field_end], "utf-8")
+            elif field_number == _DEPENDENCY:
+                self.dependency.append(str(data[field_start:field_end], "utf-8"))
+            elif field_number == _SOURCE_CODE_INFO:
+                self.source_code_info.append((tag_start, field_start, field_end))
+
+    def shift(self, offset: int):
+        # Move the positions of a header scanned from a slice of the set.
+        self.start += offset
+        self.end += offset
+        self.source_code_info = [
+            (tag_start + offset, start + offset, end + offset)
+            for tag_start, start, end in self.source_code_info
+        ]
+
+
+class _LazyFiles(Sequence):
+    # The decoded files of a LazyFileDescriptorSet, by index.
+    def __init__(self, file_set: LazyFileDescriptorSet):
+        self._file_set = file_set
+        self._files: List[Optional[descriptor_pb2.FileDescriptorProto]] = [None] * len(
+            file_set
+        )
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        fd = self._files[index]
+        if fd is None:
+            fd = self._files[index] = self._decode(self._file_set.header(index))
+        return fd
+
+    def __len__(self):
+        return len(self._files)
+
+    def _decode(self, header: _FileHeader) -> descriptor_pb2.FileDescriptorProto:
+        # Skip the source_code_info fields (tag, length and payload), the
+        # other fields are decoded from the slices in between.
+        data = self._file_set._data
+        parts = []
+        position = header.start
+        for tag_start, _, end in header.source_code_info:
+            parts.append(data[position:tag_start])
+            position = end
+        parts.append(data[position : header.end])
+        if len(parts) == 1:
+            return descriptor_pb2.FileDescriptorProto.FromString(parts[0])
+        return descriptor_pb2.FileDescriptorProto.FromString(b"".join(parts))
+
+
+def _read_varint(data: memoryview, position: int) -> Tuple[int, int]:
+    result = 0
+    shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, position
+        shift += 7
+
+
+def _fields(data: memoryview, start: int, end: int):
+    # Yield the field number, wire type, the start of the tag and the
+    # (start, end) of the value of the fields in data[start:end]. For a
+    # length-delimited field, the value is its payload. A group, which is
+    # deprecated but can still be an unknown field, is skipped as a whole.
+    position = start
+    while position < end:
+        tag_start = position
+        tag, position = _read_varint(data, position)
+        field_number = tag >> 3
+        wire_type = tag & 0x7
+        if wire_type == _VARINT:
+            value_start = position
+            _, position = _read_varint(data, position)
+        elif wire_type == _LEN:
+            length, value_start = _read_varint(data, position)
+            position = value_start + length
+        elif wire_type == _I64:
+            value_start = position
+            position += 8
+        elif wire_type == _I32:
+            value_start = position
+            position += 4
+        elif wire_type == _START_GROUP:
+            value_start = position
+            position = _skip_group(data, position, end, field_number)
+        elif wire_type == _END_GROUP:
+            value_start = position
+        else:
+            raise ValueError(f"Unsupported wire type {wire_type} at {position}.")
+        if position > end:
+            raise ValueError("Truncated message.")
+        yield field_number, wire_type, tag_start, value_start, position
+
+
+def _skip_group(data: memoryview, start: int, end: int, field_number: int) -> int:
+    # Return the end of the end-group tag of the group that starts at start.
+    for number, wire_type, _, _, position in _fields(data, start, end):
+        if wire_type == _END_GROUP:
+            if number != field_number:
+                raise ValueError(f"Unmatched end group {number} at {position}.")
+            return position
+    raise ValueError("Truncated message.")
@@ -12,15 +12,29 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from typing import Callable, Optional
+
 
 class ResourceDatabase:
     # Create resource database for file-level and messasge-level resouce definitions.
     # It has two dictionaries: types map and patterns map. Register a resource will put
     # [type_str, resource_message] in types dict, and [pattern0, resource_message]
     # [pattern1, ressource_message] (if it has multiple patterns) in patterns dict."""
-    def __init__(self):
+    def __init__(self, register_pending: Optional[Callable[[], None]] = None):
         self.types = {}
         self.patterns = {}
+        # Registers the resources that were left out so far, called once when
+        # a query by type or pattern misses. See `FileSet`.
+        self._register_pending = register_pending
+
+    def _registered_pending(self) -> bool:
+        # Register the pending resources, return False if there were none.
+        register_pending = self._register_pending
+        if register_pending is None:
+            return False
+        self._register_pending = None
+        register_pending()
+        return True
 
     def register_resource(self, resource_with_location):
         """Register a resource in the database."""
@@ -38,7 +52,10 @@ class ResourceDatabase:
 
     def get_resource_by_type(self, resource_type):
         """Query the resource by type. Return None if the resource is not existing."""
-        return self.types.get(resource_type, None)
+        resource = self.types.get(resource_type, None)
+        if resource is None and self._registered_pending():
+            resource = self.types.get(resource_type, None)
+        return resource
 
     def get_parent_resources_by_child_type(self, child_type):
         """Query the resources by child_type. Return [] if the parent resource is not existing."""
@@ -71,4 +88,7 @@ class ResourceDatabase:
 
     def get_resource_by_pattern(self, pattern):
         """Query the resource by pattern. Return None if the resource is not existing."""
-        return self.patterns.get(pattern, None)
+        resource = self.patterns.get(pattern, None)
+        if resource is None and self._registered_pending():
+            resource = self.patterns.get(pattern, None)
+        return resource
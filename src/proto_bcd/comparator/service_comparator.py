@@ -257,12 +257,13 @@ class ServiceComparator:
                     ],
                 )
             # 3.7 The paginated response of an RPC method is changed.
-            if method_original.paged_result_field or method_update.paged_result_field:
+            paged_original = method_original.paged_result_field
+            paged_update = method_update.paged_result_field
+            if paged_original or paged_update:
                 if (
-                    not method_original.paged_result_field
-                    or not method_update.paged_result_field
-                    or method_original.paged_result_field.name
-                    != method_update.paged_result_field.name
+                    not paged_original
+                    or not paged_update
+                    or paged_original.name != paged_update.name
                 ):
                     self.finding_container.add_finding(
                         category=FindingCategory.METHOD_PAGINATED_RESPONSE_CHANGE,
@@ -308,8 +309,11 @@ class ServiceComparator:
 
     def _compare_http_annotation(self, method_original, method_update):
         """Compare the fields `http_method, http_uri, http_body` of google.api.http annotation."""
-        http_annotation_original = method_original.http_annotation.value
-        http_annotation_update = method_update.http_annotation.value
+        # Read the decoded annotations once for all the checks below.
+        http_original = method_original.http_annotation
+        http_update = method_update.http_annotation
+        http_annotation_original = http_original.value
+        http_annotation_update = http_update.value
         api_version_original = self.service_original.api_version
         api_version_update = self.service_update.api_version
 
@@ -321,7 +325,7 @@ class ServiceComparator:
                 self.finding_container.add_finding(
                     category=FindingCategory.HTTP_ANNOTATION_REMOVAL,
                     proto_file_name=method_original.proto_file_name,
-                    source_code_line=method_original.http_annotation.source_code_line,
+                    source_code_line=http_original.source_code_line,
                     subject=method_original.name,
                     context=self.context,
                     conventional_commit_tag=ConventionalCommitTag.FIX_BREAKING,
@@ -330,7 +334,7 @@ class ServiceComparator:
                 self.finding_container.add_finding(
                     category=FindingCategory.HTTP_ANNOTATION_ADDITION,
                     proto_file_name=method_update.proto_file_name,
-                    source_code_line=method_update.http_annotation.source_code_line,
+                    source_code_line=http_update.source_code_line,
                     subject=method_update.name,
                     context=self.context,
                     conventional_commit_tag=ConventionalCommitTag.FEAT,
@@ -344,7 +348,7 @@ class ServiceComparator:
             self.finding_container.add_finding(
                 category=FindingCategory.HTTP_ANNOTATION_CHANGE,
                 proto_file_name=method_update.proto_file_name,
-                source_code_line=method_update.http_annotation.source_code_line,
+                source_code_line=http_update.source_code_line,
                 subject=method_update.name,
                 context=self.context,
                 type="http_method",
@@ -361,7 +365,7 @@ class ServiceComparator:
             self.finding_container.add_finding(
                 category=FindingCategory.HTTP_ANNOTATION_CHANGE,
                 proto_file_name=method_update.proto_file_name,
-                source_code_line=method_update.http_annotation.source_code_line,
+                source_code_line=http_update.source_code_line,
                 subject=method_update.name,
                 context=self.context,
                 type="http_body",
@@ -381,7 +385,7 @@ class ServiceComparator:
                 self.finding_container.add_finding(
                     category=FindingCategory.HTTP_ANNOTATION_CHANGE,
                     proto_file_name=method_update.proto_file_name,
-                    source_code_line=method_update.http_annotation.source_code_line,
+                    source_code_line=http_update.source_code_line,
                     subject=method_update.name,
                     context=self.context,
                     type="http_uri",
@@ -404,7 +408,7 @@ class ServiceComparator:
             self.finding_container.add_finding(
                 category=FindingCategory.LRO_ANNOTATION_ADDITION,
                 proto_file_name=method_update.proto_file_name,
-                source_code_line=method_update.lro_annotation.source_code_line,
+                source_code_line=lro_update.source_code_line,
                 subject=method_update.name,
                 context=self.context,
                 conventional_commit_tag=ConventionalCommitTag.FIX_BREAKING,
@@ -415,7 +419,7 @@ class ServiceComparator:
             self.finding_container.add_finding(
                 category=FindingCategory.LRO_ANNOTATION_REMOVAL,
                 proto_file_name=method_original.proto_file_name,
-                source_code_line=method_original.lro_annotation.source_code_line,
+                source_code_line=lro_original.source_code_line,
                 subject=method_update.name,
                 context=self.context,
                 conventional_commit_tag=ConventionalCommitTag.FIX_BREAKING,
@@ -467,13 +471,14 @@ class ServiceComparator:
             )
 
     def _compare_method_signatures(self, method_original, method_update):
-        signatures_original = method_original.method_signatures.value
+        method_signatures = method_original.method_signatures
+        signatures_original = method_signatures.value
         signatures_update = method_update.method_signatures.value
         for sig in set(signatures_update) - set(signatures_original):
             self.finding_container.add_finding(
                 category=FindingCategory.METHOD_SIGNATURE_ADDITION,
                 proto_file_name=method_original.proto_file_name,
-                source_code_line=method_original.method_signatures.source_code_line,
+                source_code_line=method_signatures.source_code_line,
                 type=",".join(sig),
                 subject=method_original.name,
                 context=self.context,
@@ -485,7 +490,7 @@ class ServiceComparator:
             self.finding_container.add_finding(
                 category=FindingCategory.METHOD_SIGNATURE_REMOVAL,
                 proto_file_name=method_original.proto_file_name,
-                source_code_line=method_original.method_signatures.source_code_line,
+                source_code_line=method_signatures.source_code_line,
                 type=",".join(sig),
                 subject=method_original.name,
                 context=self.context,
@@ -505,7 +510,7 @@ class ServiceComparator:
                 self.finding_container.add_finding(
                     category=FindingCategory.METHOD_SIGNATURE_ORDER_CHANGE,
                     proto_file_name=method_original.proto_file_name,
-                    source_code_line=method_original.method_signatures.source_code_line,
+                    source_code_line=method_signatures.source_code_line,
                     type=",".join(sig),
                     subject=method_original.name,
                     context=self.context,
@@ -20,10 +20,17 @@ describe descriptors).
 
 """
 
+import concurrent.futures
 import dataclasses
+import functools
+import hashlib
+import itertools
+import operator
 import re
-import os
-from collections import defaultdict
+import sys
+from array import array
+from collections import OrderedDict, defaultdict
+from collections.abc import Mapping
 from google.api import field_behavior_pb2
 from google.api import field_info_pb2
 from google.api.field_info_pb2 import FieldInfo
@@ -33,23 +40,215 @@ from google.api import annotations_pb2
 from google.longrunning import operations_pb2
 from google.protobuf import descriptor_pb2
 from google.protobuf.descriptor_pb2 import FieldDescriptorProto
+from proto_bcd.comparator.import_graph import COMMON_PACKAGES, ImportGraph
+from proto_bcd.comparator.lazy_file_set import LazyFileDescriptorSet
 from proto_bcd.comparator.resource_database import ResourceDatabase
-from typing import Dict, Sequence, Optional, Tuple, cast, List
-
-COMMON_PACKAGES = [
-    "google.longrunning",
-    "google.cloud",
-    "google.cloud.location",
-    "google.protobuf",
-    "google.type",
-    "google.rpc",
-    "google.api",
-]
+from typing import Callable, Dict, Sequence, Optional, Set, Tuple, Union, cast, List
 
 FORMAT_UNSPECIFIED = FieldInfo.FORMAT_UNSPECIFIED
 
+# Static tables to map the enum numbers of FieldDescriptorProto to names,
+# e.g. `TYPE_STRING` to `string`.
+_FIELD_TYPE_NAMES = {
+    number: name[len("TYPE_") :].lower()
+    for name, number in FieldDescriptorProto.Type.items()
+}
+_NON_PRIMITIVE_TYPES = frozenset(
+    (
+        FieldDescriptorProto.TYPE_ENUM,
+        FieldDescriptorProto.TYPE_MESSAGE,
+        FieldDescriptorProto.TYPE_GROUP,
+    )
+)
+_REQUIRED = field_behavior_pb2.FieldBehavior.Value("REQUIRED")
+
+
+class _CollectionCache:
+    """Keep track of the wrappers that hold memoized collections.
+
+    By default a wrapper keeps every collection it builds for as long as the
+    wrapper itself is alive. When `max_size` is set, only the `max_size` most
+    recently used wrappers keep their collections; the least recently used
+    ones are dropped and rebuilt on the next access, so memory stays flat
+    on very large descriptor sets. The collections in _PINNED_COLLECTIONS
+    are always kept.
+    """
+
+    def __init__(self):
+        self.max_size: Optional[int] = None
+        self._owners: "OrderedDict[int, object]" = OrderedDict()
+
+    def reset(self, max_size: Optional[int]):
+        for owner in self._owners.values():
+            _drop_collections(owner)
+        self._owners.clear()
+        self.max_size = max_size
+
+    def touch(self, owner):
+        if self.max_size is None:
+            return
+        key = id(owner)
+        if key in self._owners:
+            self._owners.move_to_end(key)
+            return
+        self._owners[key] = owner
+        while len(self._owners) > self.max_size:
+            _, evicted = self._owners.popitem(last=False)
+            _drop_collections(evicted)
+
+
+_COLLECTION_CACHE = _CollectionCache()
+# The names of the memoized collections that are never dropped, see
+# `_memoized`.
+_PINNED_COLLECTIONS = set()
+
+
+def _drop_collections(owner):
+    collections = owner._collections
+    for name in [name for name in collections if name not in _PINNED_COLLECTIONS]:
+        del collections[name]
+
+
+def set_collection_cache_size(max_size: Optional[int] = None):
+    """Bound the number of wrappers that keep their memoized collections.
+
+    max_size: the number of most recently used wrappers whose collections
+              are kept. `None` (the default) keeps all of them.
+    """
+    if max_size is not None and max_size < 1:
+        raise ValueError("The collection cache size should be a positive number.")
+    _COLLECTION_CACHE.reset(max_size)
+
+
+def _memoized(func=None, *, evictable=True):
+    """Turn a wrapper method into a property that is computed only once.
+
+    The value is stored in the `_collections` dict of the wrapper instance, and
+    shared by every later access. A collection that is not `evictable` is kept
+    even when the collection cache is bounded, because its wrappers are also
+    looked up elsewhere and must stay the same objects.
+    """
+    if func is None:
+        return functools.partial(_memoized, evictable=evictable)
+    name = func.__name__
+    if not evictable:
+        _PINNED_COLLECTIONS.add(name)
+
+    @functools.wraps(func)
+    def getter(self):
+        collections = self._collections
+        if name in collections:
+            value = collections[name]
+        else:
+            value = collections[name] = func(self)
+        _COLLECTION_CACHE.touch(self)
+        return value
+
+    return property(getter)
+
+
+class _SourceCodeIndex:
+    """Look up the source code locations of a proto file by path.
+
+    Only the zero-based start line of every location is kept, in an array.
+    The locations are found by the hash of their path, and the hits are
+    checked against the paths of the file, encoded one after the other in
+    another array. The full Location messages (with the comments) are read
+    from the file's source_code_info on demand. The index supports `in` and
+    `[]` like a dict keyed by path.
+    """
+
+    __slots__ = (
+        "_load",
+        "_locations",
+        "_lines",
+        "_positions",
+        "_paths",
+        "_offsets",
+        "_collisions",
+    )
+
+    def __init__(self, source_code_info: descriptor_pb2.SourceCodeInfo):
+        self._load = None
+        self._build(source_code_info)
+
+    def _build(self, source_code_info: descriptor_pb2.SourceCodeInfo):
+        self._locations = source_code_info.location
+        # Read the path and the span of every location at once. Slicing the
+        # repeated path copies it into a list in one go.
+        fields = list(map(operator.attrgetter("path", "span"), self._locations))
+        paths = [path[:] for path, _ in fields]
+        # The zero-based start line of every location.
+        self._lines = array("i", [span[0] for _, span in fields])
+        # Key is the hash of the path, and value is the position of the location.
+        # Like a dict, the last location of a repeated path wins.
+        self._positions: Dict[int, int] = {
+            hash(tuple(path)): position for position, path in enumerate(paths)
+        }
+        # The path of the location at `position` is
+        # `_paths[_offsets[position]:_offsets[position + 1]]`.
+        self._paths = array("i", [index for path in paths for index in path])
+        self._offsets = array("I", itertools.accumulate(map(len, paths), initial=0))
+        # The paths that lost their hash to a different path.
+        self._collisions: Dict[Tuple[int, ...], int] = {}
+        if len(self._positions) != len(paths):
+            for position, path in enumerate(paths):
+                winner = self._positions[hash(tuple(path))]
+                if winner != position and paths[winner] != path:
+                    self._collisions[tuple(path)] = position
+
+    def _build_loaded(self):
+        self._build(self._load())
+        self._load = None
+
+    def _find(self, path) -> int:
+        if self._load is not None:
+            self._build_loaded()
+        position = self._positions.get(hash(path), -1)
+        if position != -1:
+            offsets = self._offsets
+            # A path that is not in the file could still share the hash.
+            if tuple(self._paths[offsets[position] : offsets[position + 1]]) != path:
+                position = self._collisions.get(path, -1)
+        return position
+
+    def line(self, path) -> int:
+        """Return the zero-based start line of the path, or -1 if it is unknown."""
+        position = self._find(path)
+        return self._lines[position] if position != -1 else -1
+
+    def __contains__(self, path):
+        return self._find(path) != -1
+
+    def __getitem__(self, path) -> descriptor_pb2.SourceCodeInfo.Location:
+        position = self._find(path)
+        if position == -1:
+            raise KeyError(path)
+        return self._locations[position]
+
+    def __len__(self):
+        if self._load is not None:
+            self._build_loaded()
+        return len(self._locations)
+
+
+class _LazySourceCodeIndex(_SourceCodeIndex):
+    """A _SourceCodeIndex that reads the source_code_info on the first lookup.
+
+    `load` returns the source_code_info of the file, e.g.
+    `LazyFileDescriptorSet.source_code_info`, which decodes it.
+    """
+
+    __slots__ = ()
+
+    def __init__(self, load: Callable[[], descriptor_pb2.SourceCodeInfo]):
+        self._load = load
+
 
 def _get_source_code_line(source_code_locations, path):
+    if isinstance(source_code_locations, _SourceCodeIndex):
+        line = source_code_locations.line(path)
+        return line + 1 if line != -1 else -1
     if not source_code_locations or path not in source_code_locations:
         return -1
     # The line number in `span` is zero-based, +1 to get the actual line number in .proto file.
@@ -59,6 +258,8 @@ def _get_source_code_line(source_code_locations, path):
 class WithLocation:
     """Wrap the attribute with location information."""
 
+    __slots__ = ("value", "path", "source_code_locations", "proto_file_name")
+
     def __init__(self, value, source_code_locations, path, proto_file_name=None):
         self.value = value
         self.path = path
@@ -70,6 +271,116 @@ class WithLocation:
         return _get_source_code_line(self.source_code_locations, self.path)
 
 
+class _FileContext:
+    """Information shared by all the wrappers defined in the same proto file.
+
+    proto_file_name: the proto file where the wrapped descriptors exist.
+    source_code_locations: the index of the source_code_info of the file, by path.
+    api_version: the version of the API definition files.
+    resource_database: global resource database that contains all file-level resource definitions
+                       and message-level resource options.
+    """
+
+    __slots__ = (
+        "proto_file_name",
+        "source_code_locations",
+        "api_version",
+        "resource_database",
+    )
+
+    def __init__(
+        self,
+        proto_file_name: str,
+        source_code_locations=None,
+        api_version: Optional[str] = None,
+        resource_database: Optional[ResourceDatabase] = None,
+    ):
+        self.proto_file_name = _intern(proto_file_name)
+        self.source_code_locations = source_code_locations
+        self.api_version = api_version
+        self.resource_database = resource_database
+
+
+class _InFile:
+    """Mixin for the wrappers that keep their file information in a _FileContext."""
+
+    __slots__ = ()
+
+    @property
+    def proto_file_name(self) -> str:
+        return self._file.proto_file_name
+
+    @property
+    def source_code_locations(self):
+        return self._file.source_code_locations
+
+    @property
+    def api_version(self) -> Optional[str]:
+        return self._file.api_version
+
+    @property
+    def resource_database(self) -> Optional[ResourceDatabase]:
+        return self._file.resource_database
+
+
+def _intern(name):
+    # File names and full names are repeated across many wrappers, interning
+    # them makes every wrapper share a single copy.
+    return sys.intern(name) if isinstance(name, str) else name
+
+
+def _normalized_file_name(proto_file_name: str) -> str:
+    # proto_file_name may contain version which we want to ignore.
+    return re.sub(r"/v\d[^/]*/", "/VERSION/", proto_file_name)
+
+
+def _comments(source_code_locations, path) -> Tuple[str, str]:
+    # Missing locations have empty comments, the same as in `get_location`.
+    try:
+        location = source_code_locations[path]
+    except (KeyError, TypeError):
+        return ("", "")
+    return (location.leading_comments, location.trailing_comments)
+
+
+def _serialized_fields(pb, excluded=()):
+    """Yield the set fields of the descriptor `pb` in a deterministic form.
+
+    The fields are listed by field number, messages are serialized
+    deterministically, and the fields named in `excluded` are skipped.
+    """
+    for field, value in pb.ListFields():
+        if field.name in excluded:
+            continue
+        yield field.name
+        if field.type != field.TYPE_MESSAGE:
+            # Repeated scalar fields are listed as a list of values.
+            scalar = isinstance(value, (str, bytes, bool, int, float))
+            yield repr(value if scalar else list(value))
+            continue
+        # Repeated message fields are serialized item by item.
+        repeated = not hasattr(value, "SerializeToString")
+        for item in value if repeated else (value,):
+            yield item.SerializeToString(deterministic=True)
+
+
+def _structural_digest(*parts) -> bytes:
+    """Return the digest of the parts, which can be bytes, str or tuples of them."""
+    digest = hashlib.sha256()
+    stack = list(reversed(parts))
+    while stack:
+        part = stack.pop()
+        if isinstance(part, tuple):
+            stack.extend(reversed(part))
+            continue
+        if isinstance(part, str):
+            part = part.encode("utf-8")
+        # Prefix every part with its length, so that the boundaries are kept.
+        digest.update(len(part).to_bytes(8, "little"))
+        digest.update(part)
+    return digest.digest()
+
+
 @dataclasses.dataclass(frozen=True)
 class EnumValue:
     """Description of an enum value.
@@ -113,11 +424,14 @@ class Enum:
     path: Tuple[int, ...]
     full_name: str
     nested_path: List[str]
+    _collections: dict = dataclasses.field(
+        default_factory=dict, init=False, repr=False, compare=False
+    )
 
     def __getattr__(self, name):
         return getattr(self.enum_pb, name)
 
-    @property
+    @_memoized
     def values(self) -> Dict[str, EnumValue]:
         """Return EnumValues in this Enum.
 
@@ -138,13 +452,145 @@ class Enum:
             )
         return enum_value_map
 
+    @_memoized
+    def structural_digest(self) -> bytes:
+        """Return a digest of the enum, its values and their comments.
+
+        Source locations are not part of the digest. Two enums with the same
+        digest have no differences for the EnumComparator to report.
+        """
+        locations = self.source_code_locations
+        return _structural_digest(
+            tuple(_serialized_fields(self.enum_pb)),
+            _comments(locations, self.path),
+            # EnumDescriptorProto.value has field number 2.
+            tuple(
+                _comments(locations, self.path + (2, i))
+                for i in range(len(self.enum_pb.value))
+            ),
+        )
+
     @property
     def source_code_line(self):
         """Return the start line number of Enum definition in the proto file."""
         return _get_source_code_line(self.source_code_locations, self.path)
 
 
-class Field:
+@dataclasses.dataclass(frozen=True)
+class _FieldOptions:
+    """The option extensions of a field, decoded once.
+
+    required: whether `REQUIRED` is in the google.api.field_behavior annotation.
+    field_info: the google.api.field_info annotation.
+    resource_reference: the google.api.resource_reference annotation if any.
+    """
+
+    required: bool = False
+    field_info: FieldInfo = dataclasses.field(default_factory=FieldInfo)
+    resource_reference: Optional[resource_pb2.ResourceReference] = None
+
+    @classmethod
+    def decode(cls, field_pb: FieldDescriptorProto) -> "_FieldOptions":
+        # Most fields have no options, skip the extension lookups for them.
+        if not field_pb.HasField("options"):
+            return _NO_FIELD_OPTIONS
+        extensions = field_pb.options.Extensions
+        resource_ref = extensions[resource_pb2.resource_reference]
+        return cls(
+            required=_REQUIRED in extensions[field_behavior_pb2.field_behavior],
+            field_info=extensions[field_info_pb2.field_info],
+            resource_reference=(
+                resource_ref if resource_ref.type or resource_ref.child_type else None
+            ),
+        )
+
+
+_NO_FIELD_OPTIONS = _FieldOptions()
+
+
+@dataclasses.dataclass(frozen=True)
+class _MethodOptions:
+    """The option extensions of a method, decoded once.
+
+    operation_info: the response and metadata types of the
+                    google.longrunning.operation_info annotation, if both are set.
+    method_signatures: the google.api.method_signature annotations, split by field.
+    http_annotation: the http method, uri and body of the google.api.http annotation.
+    """
+
+    operation_info: Optional[Dict[str, str]] = None
+    method_signatures: Tuple[Tuple[str, ...], ...] = ()
+    http_annotation: Optional[Dict[str, str]] = None
+
+    @classmethod
+    def decode(cls, method_pb: descriptor_pb2.MethodDescriptorProto):
+        if not method_pb.HasField("options"):
+            return _NO_METHOD_OPTIONS
+        extensions = method_pb.options.Extensions
+        op = extensions[operations_pb2.operation_info]
+        http = extensions[annotations_pb2.http]
+        potential_verbs = {
+            "get": http.get,
+            "put": http.put,
+            "post": http.post,
+            "delete": http.delete,
+            "patch": http.patch,
+            "custom": http.custom.path,
+        }
+        return cls(
+            operation_info=(
+                {"response_type": op.response_type, "metadata_type": op.metadata_type}
+                if op.response_type and op.metadata_type
+                else None
+            ),
+            method_signatures=tuple(
+                tuple(field.strip() for field in sig.split(",") if field)
+                for sig in extensions[client_pb2.method_signature]
+            ),
+            http_annotation=next(
+                (
+                    {"http_method": verb, "http_uri": value, "http_body": http.body}
+                    for verb, value in potential_verbs.items()
+                    if value
+                ),
+                None,
+            ),
+        )
+
+
+_NO_METHOD_OPTIONS = _MethodOptions()
+
+
+@dataclasses.dataclass(frozen=True)
+class _ServiceOptions:
+    """The option extensions of a service, decoded once.
+
+    host: the google.api.default_host annotation.
+    oauth_scopes: the scopes of the google.api.oauth_scopes annotation.
+    """
+
+    host: str = ""
+    oauth_scopes: Tuple[str, ...] = ()
+
+    @classmethod
+    def decode(cls, service_pb: descriptor_pb2.ServiceDescriptorProto):
+        if not service_pb.HasField("options"):
+            return _NO_SERVICE_OPTIONS
+        extensions = service_pb.options.Extensions
+        return cls(
+            host=extensions[client_pb2.default_host],
+            oauth_scopes=tuple(
+                scope.strip()
+                for scope in extensions[client_pb2.oauth_scopes].split(",")
+                if scope
+            ),
+        )
+
+
+_NO_SERVICE_OPTIONS = _ServiceOptions()
+
+
+class Field(_InFile):
     """Description of a field.
 
     field_pb: the descriptor of Field.
@@ -160,6 +606,18 @@ class Field:
     oneof_name: the oneof name that the field belongs to if it is in any oneof.
     """
 
+    __slots__ = (
+        "field_pb",
+        "_file",
+        "path",
+        "message_resource",
+        "map_entry",
+        "oneof_name",
+        "_nested_path",
+        "_parent_nested_path",
+        "_decoded_options",
+    )
+
     def __init__(
         self,
         field_pb: FieldDescriptorProto,
@@ -176,22 +634,77 @@ class Field:
         nested_path: List[str] = [],
     ):
 
-        self.field_pb = field_pb
-        self.proto_file_name = proto_file_name
-        self.source_code_locations = source_code_locations
-        self.path = path
         # We need the resource database information to determine if the removal or change
         # of the resource_reference annotation is breaking or not.
-        self.resource_database = resource_database
+        self._init(
+            field_pb,
+            _FileContext(
+                proto_file_name, source_code_locations, api_version, resource_database
+            ),
+            path,
+            message_resource,
+            map_entry,
+            oneof_name,
+        )
+        self._nested_path = nested_path
+
+    @classmethod
+    def _in_file(
+        cls,
+        field_pb: FieldDescriptorProto,
+        file_context: _FileContext,
+        path: Tuple[int, ...],
+        message_resource: Optional[WithLocation] = None,
+        map_entry=None,
+        oneof_name: Optional[str] = None,
+        parent_nested_path: Optional[List[str]] = None,
+    ) -> "Field":
+        """Create a field that shares the file context of its message.
+
+        The nested path is derived from the one of the message on access,
+        instead of keeping a copy per field.
+        """
+        field = cls.__new__(cls)
+        field._init(
+            field_pb, file_context, path, message_resource, map_entry, oneof_name
+        )
+        field._parent_nested_path = parent_nested_path
+        return field
+
+    def _init(
+        self, field_pb, file_context, path, message_resource, map_entry, oneof_name
+    ):
+        self.field_pb = field_pb
+        self._file = file_context
+        self.path = path
         self.message_resource = message_resource
-        self.api_version = api_version
         self.map_entry = map_entry
         self.oneof_name = oneof_name
-        self.nested_path = nested_path
+        self._nested_path = None
+        self._parent_nested_path = None
+        self._decoded_options = None
 
     def __getattr__(self, name):
         return getattr(self.field_pb, name)
 
+    @property
+    def _options(self) -> _FieldOptions:
+        """Return the option extensions of the field, decoded on first access."""
+        options = self._decoded_options
+        if options is None:
+            options = self._decoded_options = _FieldOptions.decode(self.field_pb)
+        return options
+
+    @property
+    def nested_path(self) -> List[str]:
+        """Return the path of declarations leading to the field, for example
+        ["message Foo {", "field_name"]."""
+        if self._nested_path is not None:
+            return self._nested_path
+        if self._parent_nested_path is None:
+            return []
+        return self._parent_nested_path + [self.field_pb.name]
+
     @property
     def name(self):
         """Return the name of the field."""
@@ -210,9 +723,7 @@ class Field:
             bool: Whether this field is repeated.
         """
         # For proto3, only LABEL_REPEATED is explicitly specified which has a path.
-        label_repeated = (
-            FieldDescriptorProto().Label.Name(self.field_pb.label) == "LABEL_REPEATED"
-        )
+        label_repeated = self.field_pb.label == FieldDescriptorProto.LABEL_REPEATED
         # FieldDescriptorProto.label has field number 4.
         return WithLocation(
             label_repeated,
@@ -227,13 +738,9 @@ class Field:
         Returns:
             bool: Whether this field is required in field_behavior annotation.
         """
-        required = (
-            field_behavior_pb2.FieldBehavior.Value("REQUIRED")
-            in self.field_pb.options.Extensions[field_behavior_pb2.field_behavior]
-        )
         # fmt: off
         return WithLocation(
-            required,
+            self._options.required,
             self.source_code_locations,
             # FieldOption has field number 8, field_behavior has field
             # number 1052. One field can have multiple behaviors and
@@ -249,10 +756,9 @@ class Field:
         Returns:
             FieldInfo: The annotated field info.
         """
-        fieldInfo = self.field_pb.options.Extensions[field_info_pb2.field_info]
         # fmt: off
         return WithLocation(
-            fieldInfo,
+            self._options.field_info,
             self.source_code_locations,
             # FieldOption has field number 8, field_info has field
             # number 291403980.
@@ -264,9 +770,7 @@ class Field:
     def proto_type(self):
         """Return the proto type constant e.g. `enum`"""
         return WithLocation(
-            FieldDescriptorProto()
-            .Type.Name(self.field_pb.type)[len("TYPE_") :]
-            .lower(),
+            _FIELD_TYPE_NAMES[self.field_pb.type],
             self.source_code_locations,
             # FieldDescriptorProto.type has field number 5.
             self.path + (5,),
@@ -275,8 +779,7 @@ class Field:
     @property
     def is_primitive_type(self):
         """Return true if the proto_type is primitive python type like `string`"""
-        NON_PRIMITIVE_TYPE = ["enum", "message", "group"]
-        return self.proto_type.value not in NON_PRIMITIVE_TYPE
+        return self.field_pb.type not in _NON_PRIMITIVE_TYPES
 
     @property
     def is_map_type(self):
@@ -332,8 +835,8 @@ class Field:
     @property
     def resource_reference(self) -> Optional[WithLocation]:
         """Return the resource_reference annotation of the field if any"""
-        resource_ref = self.field_pb.options.Extensions[resource_pb2.resource_reference]
-        if not resource_ref.type and not resource_ref.child_type:
+        resource_ref = self._options.resource_reference
+        if resource_ref is None:
             return None
         # FieldDescriptorProto.options has field number 8. And `resource_reference` takes field number 1055.
         # If the reference uses `type`, the field number is 1,
@@ -353,8 +856,8 @@ class Field:
     @property
     def child_type(self) -> bool:
         """Return True if the resource_reference has child_type, False otherwise"""
-        resource_ref = self.field_pb.options.Extensions[resource_pb2.resource_reference]
-        return True if len(resource_ref.child_type) > 0 else False
+        resource_ref = self._options.resource_reference
+        return resource_ref is not None and len(resource_ref.child_type) > 0
 
     @property
     def source_code_line(self):
@@ -372,7 +875,26 @@ class Oneof:
         return getattr(self.oneof_pb, name)
 
 
-class Message:
+@dataclasses.dataclass(frozen=True)
+class _MessageIndex:
+    """Information about the fields of a message, derived in a single pass.
+
+    oneof_names: the oneof names, by position in `oneof_decl`.
+    map_entries: the key and value fields of the auto-generated map entries,
+                 by map entry name.
+    resource: the message-level resource definition if any.
+    field_map_entries: the map entry of each field, by position in `field`.
+    field_oneof_names: the oneof name of each field, by position in `field`.
+    """
+
+    oneof_names: Tuple[str, ...]
+    map_entries: Dict[str, Dict[str, "Field"]]
+    resource: Optional[WithLocation]
+    field_map_entries: Tuple[Optional[Dict[str, "Field"]], ...]
+    field_oneof_names: Tuple[Optional[str], ...]
+
+
+class Message(_InFile):
     """Description of a message (defined with the ``message`` keyword).
 
     message_pb: the descriptor of Message.
@@ -385,6 +907,15 @@ class Message:
     api_version: the version of the API definition files.
     """
 
+    __slots__ = (
+        "message_pb",
+        "_file",
+        "path",
+        "full_name",
+        "nested_path",
+        "_collections",
+    )
+
     def __init__(
         self,
         message_pb: descriptor_pb2.DescriptorProto,
@@ -398,14 +929,37 @@ class Message:
         full_name: Optional[str] = None,
         nested_path: List[str] = [],
     ):
+        self._init(
+            message_pb,
+            _FileContext(
+                proto_file_name, source_code_locations, api_version, resource_database
+            ),
+            path,
+            full_name,
+            nested_path,
+        )
+
+    @classmethod
+    def _in_file(
+        cls,
+        message_pb: descriptor_pb2.DescriptorProto,
+        file_context: _FileContext,
+        path: Tuple[int, ...],
+        full_name: Optional[str] = None,
+        nested_path: List[str] = [],
+    ) -> "Message":
+        """Create a message that shares the given file context."""
+        message = cls.__new__(cls)
+        message._init(message_pb, file_context, path, full_name, nested_path)
+        return message
+
+    def _init(self, message_pb, file_context, path, full_name, nested_path):
         self.message_pb = message_pb
-        self.proto_file_name = proto_file_name
-        self.source_code_locations = source_code_locations
+        self._file = file_context
         self.path = path
-        self.resource_database = resource_database
-        self.api_version = api_version
-        self.full_name = full_name
+        self.full_name = _intern(full_name)
         self.nested_path = nested_path
+        self._collections = {}
 
     def __getattr__(self, name):
         return getattr(self.message_pb, name)
@@ -415,55 +969,113 @@ class Message:
         """Return the name of this message."""
         return self.message_pb.name
 
-    @property
+    @_memoized
     def fields(self) -> Dict[int, Field]:
         """Return fields in this message.
 
         Returns:
             Dict[int, Field]: Field is identified by number.
         """
+        index = self._index
         fields_map = {}
         for i, field in enumerate(self.message_pb.field):
+            fields_map[field.number] = Field._in_file(
+                field_pb=field,
+                file_context=self._file,
+                path=self.path + (2, i),
+                message_resource=index.resource,
+                map_entry=index.field_map_entries[i],
+                oneof_name=index.field_oneof_names[i],
+                parent_nested_path=self.nested_path,
+            )
+        return fields_map
+
+    @_memoized
+    def _index(self) -> "_MessageIndex":
+        """Return the per-field information derived from the message, built in one pass."""
+        message_pb = self.message_pb
+        # `oneof_index` gives the index of a oneof in the containing type's oneof_decl
+        # list, so the names are kept by position.
+        oneof_names = [oneof_pb.name for oneof_pb in message_pb.oneof_decl]
+        # If the nested message is auto-generated map entry for the maps field,
+        # the message name is field_name + 'Entry', and it has two nested fields (key, value).
+        #
+        # For maps fields:
+        # map<KeyType, ValueType> map_field = 1;
+        # The parsed descriptor looks like:
+        #    message MapFieldEntry {
+        #        option map_entry = true;
+        #        optional KeyType key = 1;
+        #        optional ValueType value = 2;
+        #    }
+        #    repeated MapFieldEntry map_field = 1;
+        map_entries = {}
+        for message in message_pb.nested_type:
+            if message.options.map_entry:
+                fields = {field.name: field for field in message.field}
+                if not {"key", "value"} <= fields.keys():
+                    raise TypeError(
+                        "The auto-generated map entry message should have key and value fields."
+                    )
+                map_entries[message.name] = {
+                    "key": Field._in_file(
+                        field_pb=fields["key"],
+                        file_context=self._file,
+                        path=self.path,
+                    ),
+                    "value": Field._in_file(
+                        field_pb=fields["value"],
+                        file_context=self._file,
+                        path=self.path,
+                    ),
+                }
+        field_map_entries = []
+        field_oneof_names = []
+        for field in message_pb.field:
             # Convert field name to pascal case.
             # The auto-generated nested message uses the transformed
             # name of the field (name `first_field` is converted to `FirstFieldEntry`)
-            is_oneof = bool(self.oneofs and field.HasField("oneof_index"))
-            # `oneof_index` gives the index of a oneof in the containing type's oneof_decl
-            # list.  This field is a member of that oneof.
-            oneof_name = (
-                list(self.oneofs.keys())[field.oneof_index] if is_oneof else None
-            )
-            field_map_entry_name = (
-                field.name.replace("_", " ").title().replace(" ", "") + "Entry"
-            )
-            nested_path = self.nested_path + [field.name]
-            map_entry = (
-                self.map_entries[field_map_entry_name]
-                if field_map_entry_name in self.map_entries
+            map_entry = None
+            if map_entries:
+                field_map_entry_name = (
+                    field.name.replace("_", " ").title().replace(" ", "") + "Entry"
+                )
+                map_entry = map_entries.get(field_map_entry_name)
+            field_map_entries.append(map_entry)
+            field_oneof_names.append(
+                oneof_names[field.oneof_index]
+                if oneof_names and field.HasField("oneof_index")
                 else None
             )
-            fields_map[field.number] = Field(
-                field_pb=field,
-                proto_file_name=self.proto_file_name,
-                source_code_locations=self.source_code_locations,
-                path=self.path + (2, i),
-                resource_database=self.resource_database,
-                message_resource=self.resource,
-                api_version=self.api_version,
-                map_entry=map_entry,
-                oneof_name=oneof_name,
-                nested_path=nested_path,
-            )
-        return fields_map
+        resource = message_pb.options.Extensions[resource_pb2.resource]
+        return _MessageIndex(
+            oneof_names=tuple(oneof_names),
+            map_entries=map_entries,
+            resource=(
+                WithLocation(
+                    resource,
+                    self.source_code_locations,
+                    # MessageOptions has field nnumber 7 and resource options
+                    # take the field number 1053.
+                    self.path + (7, 1053),
+                    self.proto_file_name,
+                )
+                if resource.type and resource.pattern
+                else None
+            ),
+            field_map_entries=tuple(field_map_entries),
+            field_oneof_names=tuple(field_oneof_names),
+        )
 
-    @property
+    @_memoized
     def oneofs(self) -> Dict[str, Oneof]:
         """Return a dictionary of wrapped oneofs for the given message."""
         return {
             oneof_pb.name: Oneof(oneof_pb) for oneof_pb in self.message_pb.oneof_decl
         }
 
-    @property
+    # The nested types are also in the global type maps of the FileSet.
+    @_memoized(evictable=False)
     def nested_messages(self) -> Dict[str, "Message"]:
         """Return the nested messages in the message. Message is identified by name."""
         nested_messages_map = {}
@@ -475,10 +1087,9 @@ class Message:
             if message.options.map_entry:
                 continue
             nested_path = self.nested_path + ["message " + message.name + " {"]
-            nested_messages_map[message.name] = Message(
+            nested_messages_map[message.name] = Message._in_file(
                 message_pb=message,
-                proto_file_name=self.proto_file_name,
-                source_code_locations=self.source_code_locations,
+                file_context=self._file,
                 # DescriptorProto.nested_type has field number 3.
                 # So we append (3, nested_message_index) to the path.
                 path=self.path
@@ -486,8 +1097,6 @@ class Message:
                     3,
                     i,
                 ),
-                resource_database=self.resource_database,
-                api_version=self.api_version,
                 full_name=self.full_name + "." + message.name,
                 nested_path=nested_path,
             )
@@ -495,43 +1104,10 @@ class Message:
 
     @property
     def map_entries(self) -> Dict[str, Dict[str, Field]]:
-        # If the nested message is auto-generated map entry for the maps field,
-        # the message name is field_name + 'Entry', and it has two nested fields (key, value).
-        #
-        # For maps fields:
-        # map<KeyType, ValueType> map_field = 1;
-        # The parsed descriptor looks like:
-        #    message MapFieldEntry {
-        #        option map_entry = true;
-        #        optional KeyType key = 1;
-        #        optional ValueType value = 2;
-        #    }
-        #    repeated MapFieldEntry map_field = 1;
-        map_entries = {}
-        for message in self.message_pb.nested_type:
-            if message.options.map_entry:
-                fields = {field.name: field for field in message.field}
-                if not {"key", "value"} <= fields.keys():
-                    raise TypeError(
-                        "The auto-generated map entry message should have key and value fields."
-                    )
-                map_entries[message.name] = {
-                    "key": Field(
-                        field_pb=fields["key"],
-                        source_code_locations=self.source_code_locations,
-                        proto_file_name=self.proto_file_name,
-                        path=self.path,
-                    ),
-                    "value": Field(
-                        field_pb=fields["value"],
-                        source_code_locations=self.source_code_locations,
-                        proto_file_name=self.proto_file_name,
-                        path=self.path,
-                    ),
-                }
-        return map_entries
+        """Return the auto-generated map entries in the message, identified by name."""
+        return self._index.map_entries
 
-    @property
+    @_memoized(evictable=False)
     def nested_enums(self) -> Dict[str, Enum]:
         """Return the nested enums in the message. Enum is identified by name."""
         nested_enum_map = {}
@@ -544,25 +1120,51 @@ class Message:
                 # DescriptorProto.enum_type has field number 4.
                 # So we append (4, nested_enum_index) to the path.
                 path=self.path + (4, i),
-                full_name=self.full_name + "." + enum.name,
+                full_name=_intern(self.full_name + "." + enum.name),
                 nested_path=nested_path,
             )
         return nested_enum_map
 
+    @_memoized
+    def structural_digest(self) -> bytes:
+        """Return a digest of the message, computed bottom-up.
+
+        It covers the fields, options, oneofs, the auto-generated map entries,
+        the digests of the nested messages and enums, the comments of the
+        message and its fields, and the file name without version. Source
+        locations are not part of the digest. Two messages with the same
+        digest have no differences for the DescriptorComparator to report.
+        """
+        message_pb = self.message_pb
+        locations = self.source_code_locations
+        return _structural_digest(
+            _normalized_file_name(self.proto_file_name),
+            tuple(_serialized_fields(message_pb, ("nested_type", "enum_type"))),
+            tuple(
+                message.SerializeToString(deterministic=True)
+                for message in message_pb.nested_type
+                if message.options.map_entry
+            ),
+            _comments(locations, self.path),
+            # DescriptorProto.field has field number 2.
+            tuple(
+                _comments(locations, self.path + (2, i))
+                for i in range(len(message_pb.field))
+            ),
+            tuple(
+                (name, message.structural_digest)
+                for name, message in self.nested_messages.items()
+            ),
+            tuple(
+                (name, enum.structural_digest)
+                for name, enum in self.nested_enums.items()
+            ),
+        )
+
     @property
     def resource(self) -> Optional[WithLocation]:
         """If this message describes a resource, return the resource."""
-        resource = self.message_pb.options.Extensions[resource_pb2.resource]
-        if not resource.type or not resource.pattern:
-            return None
-        return WithLocation(
-            resource,
-            self.source_code_locations,
-            # MessageOptions has field nnumber 7 and resource options
-            # take the field number 1053.
-            self.path + (7, 1053),
-            self.proto_file_name,
-        )
+        return self._index.resource
 
     @property
     def source_code_line(self):
@@ -570,7 +1172,7 @@ class Message:
         return _get_source_code_line(self.source_code_locations, self.path)
 
 
-class Method:
+class Method(_InFile):
     """Description of a method (defined with the ``rpc`` keyword).
 
     method_pb: the descriptor of Method.
@@ -582,6 +1184,8 @@ class Method:
           we can get the location information.
     """
 
+    __slots__ = ("method_pb", "messages_map", "_file", "path", "_collections")
+
     def __init__(
         self,
         method_pb: descriptor_pb2.MethodDescriptorProto,
@@ -592,11 +1196,32 @@ class Method:
         ],
         path: Tuple[int],
     ):
+        self._init(
+            method_pb,
+            messages_map,
+            _FileContext(proto_file_name, source_code_locations),
+            path,
+        )
+
+    @classmethod
+    def _in_file(
+        cls,
+        method_pb: descriptor_pb2.MethodDescriptorProto,
+        messages_map: Dict[str, Message],
+        file_context: _FileContext,
+        path: Tuple[int, ...],
+    ) -> "Method":
+        """Create a method that shares the file context of its service."""
+        method = cls.__new__(cls)
+        method._init(method_pb, messages_map, file_context, path)
+        return method
+
+    def _init(self, method_pb, messages_map, file_context, path):
         self.method_pb = method_pb
         self.messages_map = messages_map
-        self.proto_file_name = proto_file_name
-        self.source_code_locations = source_code_locations
+        self._file = file_context
         self.path = path
+        self._collections = {}
 
     @property
     def name(self):
@@ -644,7 +1269,12 @@ class Method:
             self.path + (6,),
         )
 
-    @property
+    @_memoized
+    def _options(self) -> _MethodOptions:
+        """Return the option extensions of the method, decoded once."""
+        return _MethodOptions.decode(self.method_pb)
+
+    @_memoized
     def paged_result_field(self) -> Optional[FieldDescriptorProto]:
         """Return the response pagination field if the method is paginated."""
         # (AIP 158) The response must not be a streaming response for a paginated method.
@@ -690,13 +1320,9 @@ class Method:
         # Remove this condition will fail the service-annotation test in cli integration test.
         if not self.output.value.endswith("google.longrunning.Operation") or self.proto_file_name == "google/longrunning/operations.proto":
             return None
-        op = self.method_pb.options.Extensions[operations_pb2.operation_info]
-        if not op.response_type or not op.metadata_type:
+        lro_annotation = self._options.operation_info
+        if lro_annotation is None:
             return None
-        lro_annotation = {
-            "response_type": op.response_type,
-            "metadata_type": op.metadata_type,
-        }
         # MethodDescriptorProto.method_options has field number 4,
         # and MethodOptions.extensions[operation_info] has field number 1049.
         return WithLocation(
@@ -708,10 +1334,9 @@ class Method:
     @property
     def method_signatures(self) -> WithLocation:
         """Return the signatures defined for this method."""
-        signatures = self.method_pb.options.Extensions[client_pb2.method_signature]
-        fields = []
-        for sig in signatures:
-            fields.append(tuple([field.strip() for field in sig.split(",") if field]))
+        # The decoded signatures are a memoized tuple, every caller gets a
+        # list of its own.
+        fields = list(self._options.method_signatures)
         # MethodDescriptorProto.method_options has field number 4,
         # and MethodOptions.extensions[method_signature] has field number 1051.
         return WithLocation(
@@ -728,23 +1353,7 @@ class Method:
 
         return `None` if no http annotation exists.
         """
-        http = self.method_pb.options.Extensions[annotations_pb2.http]
-        potential_verbs = {
-            "get": http.get,
-            "put": http.put,
-            "post": http.post,
-            "delete": http.delete,
-            "patch": http.patch,
-            "custom": http.custom.path,
-        }
-        http_annotation = next(
-            (
-                {"http_method": verb, "http_uri": value, "http_body": http.body}
-                for verb, value in potential_verbs.items()
-                if value
-            ),
-            None,
-        )
+        http_annotation = self._options.http_annotation
         # MethodDescriptorProto.method_options has field number 4,
         # and MethodOptions.extensions[http_annotation] has field number 72295728.
         return WithLocation(
@@ -754,13 +1363,31 @@ class Method:
         )
     # fmt: on
 
+    @_memoized
+    def structural_digest(self) -> bytes:
+        """Return a digest of the method, its comments and its messages.
+
+        The pagination of a method depends on its request and response
+        messages, so their digests are part of the method digest.
+        """
+        messages = []
+        for type_name in (self.method_pb.input_type, self.method_pb.output_type):
+            message = self.messages_map.get(type_name) if self.messages_map else None
+            messages.append(message.structural_digest if message else b"")
+        return _structural_digest(
+            _normalized_file_name(self.proto_file_name),
+            tuple(_serialized_fields(self.method_pb)),
+            _comments(self.source_code_locations, self.path),
+            tuple(messages),
+        )
+
     @property
     def source_code_line(self):
         """Return the start line number of method definition in the proto file."""
         return _get_source_code_line(self.source_code_locations, self.path)
 
 
-class Service:
+class Service(_InFile):
     """Description of a service (defined with the ``service`` keyword).
 
     service_pb: the decriptor of service.
@@ -773,6 +1400,8 @@ class Service:
     api_version: the version of the API definition files.
     """
 
+    __slots__ = ("service_pb", "messages_map", "_file", "path", "_collections")
+
     def __init__(
         self,
         service_pb: descriptor_pb2.ServiceDescriptorProto,
@@ -784,28 +1413,47 @@ class Service:
         path: Tuple[int],
         api_version: Optional[str] = None,
     ):
+        self._init(
+            service_pb,
+            messages_map,
+            _FileContext(proto_file_name, source_code_locations, api_version),
+            path,
+        )
+
+    @classmethod
+    def _in_file(
+        cls,
+        service_pb: descriptor_pb2.ServiceDescriptorProto,
+        messages_map: Dict[str, Message],
+        file_context: _FileContext,
+        path: Tuple[int, ...],
+    ) -> "Service":
+        """Create a service that shares the given file context."""
+        service = cls.__new__(cls)
+        service._init(service_pb, messages_map, file_context, path)
+        return service
+
+    def _init(self, service_pb, messages_map, file_context, path):
         self.service_pb = service_pb
         self.messages_map = messages_map
-        self.proto_file_name = proto_file_name
-        self.source_code_locations = source_code_locations
+        self._file = file_context
         self.path = path
-        self.api_version = api_version
+        self._collections = {}
 
     @property
     def name(self):
         """Return the name of the service."""
         return self.service_pb.name
 
-    @property
+    @_memoized
     def methods(self) -> Dict[str, Method]:
         """Return the methods defined in the service. Method is identified by name."""
         # fmt: off
         return {
-            method.name: Method(  # pytype: disable=wrong-arg-types
+            method.name: Method._in_file(  # pytype: disable=wrong-arg-types
                 method,
                 self.messages_map,
-                self.proto_file_name,
-                self.source_code_locations,
+                self._file,
                 # ServiceDescriptorProto.method has field number 2.
                 # So we append (2, method_index) to the path.
                 self.path + (2, i,),
@@ -814,6 +1462,11 @@ class Service:
         }
         # fmt: on
 
+    @_memoized
+    def _options(self) -> _ServiceOptions:
+        """Return the option extensions of the service, decoded once."""
+        return _ServiceOptions.decode(self.service_pb)
+
     @property
     def host(self) -> Optional[WithLocation]:
         """Return the hostname for this service, if specified.
@@ -821,9 +1474,9 @@ class Service:
         Returns:
             str: The hostname, with no protocol and no trailing ``/``.
         """
-        if not self.service_pb.options.Extensions[client_pb2.default_host]:
+        default_host = self._options.host
+        if not default_host:
             return None
-        default_host = self.service_pb.options.Extensions[client_pb2.default_host]
         return WithLocation(
             value=default_host,
             source_code_locations=self.source_code_locations,
@@ -833,7 +1486,7 @@ class Service:
             proto_file_name=self.proto_file_name,
         )
 
-    @property
+    @_memoized
     def oauth_scopes(self) -> Optional[Sequence[WithLocation]]:
         """Return a sequence of oauth scopes, if applicable.
 
@@ -842,94 +1495,305 @@ class Service:
         """
         # fmt: off
         oauth_scopes = []
-        for scope in self.service_pb.options.Extensions[client_pb2.oauth_scopes].split(","):
-            if scope:
-                oauth_scopes.append(
-                    WithLocation(
-                        scope.strip(),
-                        self.source_code_locations,
-                        self.path + (3, 1050),
-                    )
+        for scope in self._options.oauth_scopes:
+            oauth_scopes.append(
+                WithLocation(
+                    scope,
+                    self.source_code_locations,
+                    self.path + (3, 1050),
                 )
+            )
 
         return oauth_scopes
         # fmt: on
 
+    @_memoized
+    def structural_digest(self) -> bytes:
+        """Return a digest of the service, its comments and its methods."""
+        return _structural_digest(
+            tuple(_serialized_fields(self.service_pb, ("method",))),
+            _comments(self.source_code_locations, self.path),
+            tuple(
+                (name, method.structural_digest)
+                for name, method in self.methods.items()
+            ),
+        )
+
     @property
     def source_code_line(self):
         """Return the start line number of service definition in the proto file."""
         return _get_source_code_line(self.source_code_locations, self.path)
 
 
+class _LazyTypeMap(Mapping):
+    """A read-only map from the full name of a type to its wrapper.
+
+    Only a cheap index entry is kept for every type in the file set. The
+    wrapper is created by `build(full_name, entry)` on the first lookup and
+    reused afterwards, so types that are never referenced are never wrapped.
+    `index_pending(full_name)` indexes the files left out that could define
+    a type missing from the index, or all of them for `None`, and returns
+    whether it indexed any.
+    """
+
+    def __init__(
+        self,
+        build: Callable,
+        index_pending: Optional[Callable[[Optional[str]], bool]] = None,
+    ):
+        self._build = build
+        self._index_pending = index_pending
+        self._index: Dict[str, tuple] = {}
+        self._wrappers: Dict[str, object] = {}
+
+    def __getitem__(self, full_name):
+        wrapper = self._wrappers.get(full_name)
+        if wrapper is None:
+            if full_name not in self:
+                raise KeyError(full_name)
+            wrapper = self._wrappers[full_name] = self._build(
+                full_name, self._index[full_name]
+            )
+        return wrapper
+
+    def __contains__(self, full_name):
+        if full_name in self._index:
+            return True
+        return (
+            self._index_pending is not None
+            and self._index_pending(full_name)
+            and full_name in self._index
+        )
+
+    def __iter__(self):
+        if self._index_pending is not None:
+            self._index_pending(None)
+        return iter(self._index)
+
+    def __len__(self):
+        if self._index_pending is not None:
+            self._index_pending(None)
+        return len(self._index)
+
+
+class _FileIndex:
+    """The index entries of a proto file, see `_index_file`.
+
+    The entries only have names, paths and option messages, so that a file
+    can be indexed in another process.
+
+    messages: (full name, parent message full name, index in the parent).
+    enums: (full name, parent message full name, index in the parent).
+    resources: (resource descriptor, path).
+    file_options: the options of the file.
+    digests: the file digests by `include_source_code_info`, if computed.
+    """
+
+    __slots__ = ("messages", "enums", "resources", "file_options", "digests")
+
+    def __init__(self):
+        self.messages: List[Tuple[str, Optional[str], int]] = []
+        self.enums: List[Tuple[str, Optional[str], int]] = []
+        self.resources: List[Tuple[resource_pb2.ResourceDescriptor, tuple]] = []
+        self.file_options: Optional[descriptor_pb2.FileOptions] = None
+        self.digests: Optional[Dict[bool, bytes]] = None
+
+
+def _index_file(fd: descriptor_pb2.FileDescriptorProto) -> _FileIndex:
+    # Index the types and resources of a file in a single traversal.
+    file_index = _FileIndex()
+    file_index.file_options = fd.options
+    # Register file-level resource definitions. The file option has field
+    # number 8, resource definition has field number 1053, and the index of
+    # the resource should be appended to the resource path.
+    for i, resource in enumerate(
+        fd.options.Extensions[resource_pb2.resource_definition]
+    ):
+        file_index.resources.append((resource, (8, 1053, i)))
+    prefix = "." + fd.package + "."
+    # Index first level enums.
+    for i, enum in enumerate(fd.enum_type):
+        file_index.enums.append((_intern(prefix + enum.name), None, i))
+    # Index first level messages, together with the path of the message
+    # in the file. The messages in file has field number 4, the index of
+    # the messasge should be appended to the path.
+    message_stack = [
+        (_intern(prefix + message.name), None, i, message, (4, i))
+        for i, message in enumerate(fd.message_type)
+    ]
+    # Iterate for nested messages and enums.
+    while message_stack:
+        full_name, parent, i, message, path = message_stack.pop()
+        file_index.messages.append((full_name, parent, i))
+        # Register message-level resource definitions. Message option has
+        # field number 7, and resource option has field number 1053.
+        resource = message.options.Extensions[resource_pb2.resource]
+        if resource.type and resource.pattern:
+            file_index.resources.append((resource, path + (7, 1053)))
+        for i, nested_message in enumerate(message.nested_type):
+            # The auto-generated map entries are not registered, the
+            # same as in `Message.nested_messages`. They have no resource
+            # options either.
+            if nested_message.options.map_entry:
+                continue
+            # Nested message has field number 3, and index of the
+            # nested message is appended to the path.
+            message_stack.append(
+                (
+                    _intern(full_name + "." + nested_message.name),
+                    full_name,
+                    i,
+                    nested_message,
+                    path + (3, i),
+                )
+            )
+        for i, nested_enum in enumerate(message.enum_type):
+            file_index.enums.append(
+                (_intern(full_name + "." + nested_enum.name), full_name, i)
+            )
+    return file_index
+
+
+def _index_chunk(data: bytes) -> Tuple[list, List[_FileIndex]]:
+    # Index the files of a serialized FileDescriptorSet in a worker process,
+    # and return their headers too. The digests are computed here as well,
+    # the parent only has to decode the files whose types are used.
+    file_set = LazyFileDescriptorSet(data)
+    file_indexes = []
+    for i, fd in enumerate(file_set.file):
+        file_index = _index_file(fd)
+        file_index.digests = {
+            False: _lazy_file_digest(fd, None),
+            True: _lazy_file_digest(fd, file_set.source_code_info_bytes(i)),
+        }
+        file_indexes.append(file_index)
+    return file_set.headers, file_indexes
+
+
+def _lazy_file_digest(
+    fd: descriptor_pb2.FileDescriptorProto, source_code_info: Optional[bytes]
+) -> bytes:
+    # The file of a LazyFileDescriptorSet is decoded without source_code_info,
+    # which is hashed from the bytes in the set instead. The digests of a
+    # lazy and an eager set differ, which only means that their files are
+    # compared.
+    digest = hashlib.sha256(fd.SerializeToString(deterministic=True))
+    if source_code_info is not None:
+        digest.update(b"\0")
+        digest.update(source_code_info)
+    return digest.digest()
+
+
 class FileSet:
     """Description of a file_set.
 
-    file_set_pb: The FileDescriptorSet object that is obtained by proto compiler.
+    file_set_pb: The FileDescriptorSet object that is obtained by proto compiler,
+                 or a LazyFileDescriptorSet.
+    processes: The number of processes that index the files of a large
+               LazyFileDescriptorSet, see `PARALLEL_INDEX_MIN_BYTES`. The files
+               are indexed in this process if it is not set, or 1.
     """
 
+    # A LazyFileDescriptorSet of at least this size is split at the file
+    # boundaries, and the chunks are decoded and indexed in a process pool.
+    # Below it, starting the processes costs more than it saves.
+    PARALLEL_INDEX_MIN_BYTES = 16 * 1024 * 1024
+
     def __init__(
         self,
-        file_set_pb: descriptor_pb2.FileDescriptorSet,
+        file_set_pb: Union[descriptor_pb2.FileDescriptorSet, LazyFileDescriptorSet],
+        processes: Optional[int] = None,
     ):
         # The default value for every language package option is a dict.
         # whose key is the option str, and value is the WithLocation object with
         # sourec code information.
         self.file_set_pb = file_set_pb
-        # Create source code location map, key is the file name, value is the
-        # source code information of every field.
-        source_code_locations_map = self._get_source_code_locations_map()
+        # The digests of the files, computed on demand. Key is the file name and
+        # whether the source_code_info is included.
+        self._file_digests: Dict[Tuple[str, bool], bytes] = {}
+        # Index every file of a large LazyFileDescriptorSet in a process pool.
+        # The workers also scan the headers of its files, so this comes before
+        # anything that reads them.
+        file_indexes = self._index_files_in_processes(processes)
+        # The import graph of the files, for the stages that need to query the
+        # (transitive) imports of a file.
+        self.import_graph = ImportGraph(file_set_pb)
         # Get the root package from the API definition files.
-        self.root_package = self.get_root_package(self.file_set_pb)
+        self.root_package = self.import_graph.root_package
         # Get API version from definition files.
         version = r"(?P<version>v[0-9]+(p[0-9]+)?((alpha|beta)[0-9]*)?)"
         search_version = re.search(version, self.root_package)
         self.api_version = search_version.group() if search_version else None
         # Get API definition files. This helps us to compare only the definition files
         # and imported dependency information.
+        # The headers of a LazyFileDescriptorSet have the package of the files
+        # without decoding them.
+        files = getattr(file_set_pb, "headers", file_set_pb.file)
+        definition_indexes = {
+            i for i, f in enumerate(files) if f.package.startswith(self.root_package)
+        }
         self.definition_files = [
-            f for f in file_set_pb.file if f.package.startswith(self.root_package)
+            file_set_pb.file[i] for i in sorted(definition_indexes)
         ]
+        # Otherwise index the files in this process, one traversal per file.
+        if file_indexes is None:
+            file_indexes = self._index_files(definition_indexes)
+        # The files that are not indexed yet, by package. They are indexed
+        # when a type that they could define or a resource is looked up.
+        self._pending_files: Dict[str, List[int]] = {}
+        for i, file_index in enumerate(file_indexes):
+            if file_index is None:
+                self._pending_files.setdefault(files[i].package, []).append(i)
+        # The resources of every indexed file, by index of the file in the set,
+        # to register them in order with those of the pending files.
+        self._file_resources: Optional[Dict[int, List[WithLocation]]] = (
+            {} if self._pending_files else None
+        )
         # Register all resources in the database.
-        self.resources_database = self._get_resource_database(
-            file_set_pb.file, source_code_locations_map
+        self.resources_database = ResourceDatabase(
+            self._register_pending_resources if self._pending_files else None
         )
+        # Register all resources in the API definition files in a separate database,
+        # so that we can avoid comparing redundant resources defined in dependencies.
+        self.used_resources_database = ResourceDatabase()
         # Create global messages/enums map to have all messages/enums registered from the file
         # set including the nested messages/enums, since they could also be referenced.
         # Key is the full name of the message/enum and value is the Message/Enum object.
-        self._get_global_info_map(source_code_locations_map)
+        # Only the full names are indexed here. The wrappers are created when a
+        # type is looked up, so the dependencies that are never referenced
+        # by the API under test are never wrapped.
+        self.global_messages_map = _LazyTypeMap(
+            self._build_message, self._index_pending_files
+        )
+        self.global_enums_map = _LazyTypeMap(
+            self._build_enum, self._index_pending_files
+        )
+        # Create packaging options map and duplicate the per-language rules for namespaces.
+        self.packaging_options_map = defaultdict(dict)
+        # The wrappers defined in the same file share a single file context.
+        self._file_contexts: Dict[str, _FileContext] = {}
+        # Fill all of the above from the indexes of the files.
+        for i, file_index in enumerate(file_indexes):
+            if file_index is not None:
+                self._add_file_index(
+                    i, files[i].name, file_index, i in definition_indexes
+                )
 
         # Get all **used** information for comparison.
-        self.packaging_options_map = defaultdict(dict)
         self.services_map: Dict[str, Service] = {}
         self.enums_map: Dict[str, Enum] = {}
         self.messages_map: Dict[str, Message] = {}
-        # Register all resources in the API definition files in a separate database,
-        # so that we can avoid comparing redundant resources defined in dependencies.
-        self.used_resources_database = self._get_resource_database(
-            self.definition_files, source_code_locations_map
-        )
         path = ()
         for fd in self.definition_files:
-            source_code_locations = (
-                source_code_locations_map[fd.name]
-                if source_code_locations_map
-                else None
-            )
-            # Create packaging options map and duplicate the per-language rules for namespaces.
-            self._get_packaging_options_map(
-                fd.options, fd.name, source_code_locations, path + (8,)
-            )
             # Creat services map.
             for i, service in enumerate(fd.service):
                 # fmt: off
-                service_wrapper = Service(  # pytype: disable=wrong-arg-types
+                service_wrapper = Service._in_file(  # pytype: disable=wrong-arg-types
                     service_pb=service,
                     messages_map=self.global_messages_map,
-                    proto_file_name=fd.name,
-                    source_code_locations=source_code_locations,
+                    file_context=self._file_contexts[fd.name],
                     # FileDescriptorProto.service has field number 6
                     path=path + (6, i,),
-                    api_version=self.api_version,
                 )
                 # fmt: on
                 self.services_map[service.name] = service_wrapper
@@ -993,171 +1857,244 @@ class FileSet:
         elif register_type in self.global_enums_map:
             self.enums_map[register_type] = self.global_enums_map[register_type]
 
-    def _get_global_info_map(self, source_code_locations_map):
-        self.global_messages_map = {}
-        self.global_enums_map = {}
-        for fd in self.file_set_pb.file:
-            source_code_locations = (
-                source_code_locations_map[fd.name]
-                if source_code_locations_map
-                else None
-            )
-            # Register first level enums.
-            # fmt: off
-            for i, enum in enumerate(fd.enum_type):
-                full_name = self._get_full_name(fd.package, enum.name)
-                self.global_enums_map[full_name] = Enum(
-                    enum_pb=enum,
-                    proto_file_name=fd.name,
-                    source_code_locations=source_code_locations,
-                    path=(5, i),
-                    full_name=full_name,
-                    nested_path=["enum " + enum.name + " {"],
-                )
-            # Register first level messages.
-            message_stack = [
-                Message(
-                    message_pb=message,
-                    proto_file_name=fd.name,
-                    source_code_locations=source_code_locations,
-                    path=(4, i),
-                    resource_database=self.resources_database,
-                    api_version=self.api_version,
-                    # `.package.outer_message.nested_message`
-                    full_name=self._get_full_name(fd.package, message.name),
-                    nested_path=["message " + message.name + " {"],
+    def _index_files(
+        self, definition_indexes: Set[int]
+    ) -> List[Optional["_FileIndex"]]:
+        # Return the index of every file in the set, in order. Only the files
+        # that the definition files import, directly or not, are decoded and
+        # indexed in a LazyFileDescriptorSet. The index of the others is None.
+        file_set_pb = self.file_set_pb
+        if not isinstance(file_set_pb, LazyFileDescriptorSet):
+            return [_index_file(fd) for fd in file_set_pb.file]
+        headers = file_set_pb.headers
+        reachable = self.import_graph.closure(
+            headers[i].name for i in definition_indexes
+        )
+        return [
+            _index_file(file_set_pb.file[i]) if header.name in reachable else None
+            for i, header in enumerate(headers)
+        ]
+
+    def _index_files_in_processes(
+        self, processes: Optional[int]
+    ) -> Optional[List["_FileIndex"]]:
+        # Return the index of every file of a large LazyFileDescriptorSet, in
+        # order, or None if the files are indexed in this process.
+        file_set_pb = self.file_set_pb
+        if (
+            not isinstance(file_set_pb, LazyFileDescriptorSet)
+            or not processes
+            or processes == 1
+            or file_set_pb.nbytes < self.PARALLEL_INDEX_MIN_BYTES
+        ):
+            return None
+        # A few chunks per process, so that a chunk of large files does not
+        # keep the others waiting.
+        chunks = file_set_pb.chunks(file_set_pb.nbytes // (processes * 4) + 1)
+        file_indexes = []
+        with concurrent.futures.ProcessPoolExecutor(processes) as executor:
+            for chunk, (headers, chunk_indexes) in zip(
+                chunks,
+                executor.map(
+                    _index_chunk,
+                    [bytes(file_set_pb.serialized(chunk)) for chunk in chunks],
+                ),
+            ):
+                file_set_pb.set_headers(chunk, headers)
+                file_indexes.extend(chunk_indexes)
+        return file_indexes
+
+    def _index_pending_files(self, full_name: Optional[str]) -> bool:
+        # Index the pending files that could define the type `full_name`, or
+        # all of them if it is None. Return whether any file was indexed.
+        if not self._pending_files:
+            return False
+        if full_name is None:
+            packages = list(self._pending_files)
+        elif (
+            full_name in self.global_messages_map._index
+            or full_name in self.global_enums_map._index
+        ):
+            # A message is also looked up in the enums, and the other way round.
+            return False
+        else:
+            # The package of the file is a prefix of the full name of the type.
+            parts = full_name.split(".")
+            packages = [".".join(parts[1:end]) for end in range(1, len(parts))]
+        indexed = False
+        for package in packages:
+            for i in self._pending_files.pop(package, ()):
+                # Their resources are registered with the others on the first
+                # miss in the resources database.
+                self._add_file_index(
+                    i,
+                    self.file_set_pb.header(i).name,
+                    _index_file(self.file_set_pb.file[i]),
+                    is_definition=False,
+                    register_resources=False,
                 )
-                for i, message in enumerate(fd.message_type)
-            ]
-            names = [m.name for m in message_stack]
-            # fmt: on
-            # Iterate for nested messages and enums.
-            while message_stack:
-                message = message_stack.pop()
-                self.global_messages_map[message.full_name] = message
-                message_stack.extend(message.nested_messages.values())
-                self.global_enums_map.update(
-                    (enum.full_name, enum) for enum in message.nested_enums.values()
+                indexed = True
+        if not self._pending_files:
+            # Once every file is indexed, the types are in the order of the set.
+            for type_map in (self.global_messages_map, self.global_enums_map):
+                type_map._index = dict(
+                    sorted(type_map._index.items(), key=lambda item: item[1][3])
                 )
+        return indexed
+
+    def _register_pending_resources(self):
+        # Index the pending files, and register the resources of all the files
+        # again in the order of the set, so that the same one wins for a type.
+        self._index_pending_files(None)
+        file_resources, self._file_resources = self._file_resources, None
+        self.resources_database.types.clear()
+        self.resources_database.patterns.clear()
+        for i in sorted(file_resources):
+            for resource in file_resources[i]:
+                self.resources_database.register_resource(resource)
+
+    def _add_file_index(
+        self,
+        i: int,
+        file_name: str,
+        file_index: "_FileIndex",
+        is_definition: bool,
+        register_resources: bool = True,
+    ):
+        # Index the source_code_info of the file by path.
+        #
+        # The comments in protocol buffers are sorted by a concept called
+        # the "path", which is a sequence of integers described in more
+        # detail below; the index finds a location by the tuple of its path.
+        # A file is only indexed once one of its locations is looked up, and
+        # the source_code_info of a LazyFileDescriptorSet is only decoded then.
+        if isinstance(self.file_set_pb, LazyFileDescriptorSet):
+            load = functools.partial(self.file_set_pb.source_code_info, i)
+        else:
+            load = functools.partial(
+                getattr, self.file_set_pb.file[i], "source_code_info"
+            )
+        source_code_locations = _LazySourceCodeIndex(load)
+        file_context = _FileContext(
+            file_name,
+            source_code_locations,
+            self.api_version,
+            self.resources_database,
+        )
+        self._file_contexts[file_name] = file_context
+        # The resources in the definition files are also registered in the
+        # used resources database.
+        resources_databases = [self.resources_database] if register_resources else []
+        if is_definition:
+            resources_databases.append(self.used_resources_database)
+            self._get_packaging_options_map(
+                file_index.file_options, file_name, source_code_locations, (8,)
+            )
+        resources = [
+            WithLocation(resource, source_code_locations, path, file_name)
+            for resource, path in file_index.resources
+        ]
+        if self._file_resources is not None:
+            self._file_resources[i] = resources
+        for resource_with_location in resources:
+            for resources_database in resources_databases:
+                resources_database.register_resource(resource_with_location)
+        # Each entry is (parent message full name, file context, index of the
+        # type in its parent or file, index of the file in the set).
+        # The names are interned by `_index_file`, or come from a single
+        # unpickled chunk.
+        self.global_enums_map._index.update(
+            (full_name, (parent, file_context, j, i))
+            for full_name, parent, j in file_index.enums
+        )
+        self.global_messages_map._index.update(
+            (full_name, (parent, file_context, j, i))
+            for full_name, parent, j in file_index.messages
+        )
+        if file_index.digests:
+            for include_source_code_info, digest in file_index.digests.items():
+                self._file_digests[(file_name, include_source_code_info)] = digest
+
+    def _build_message(self, full_name, entry) -> Message:
+        parent, file_context, i, file_index = entry
+        # Nested messages are taken from the parent message, so that both
+        # lookups share the same wrapper.
+        if parent is not None:
+            name = full_name[len(parent) + 1 :]
+            return self.global_messages_map[parent].nested_messages[name]
+        # The file is decoded here if it is lazy and none of its types was
+        # used before.
+        message = self.file_set_pb.file[file_index].message_type[i]
+        return Message._in_file(
+            message_pb=message,
+            file_context=file_context,
+            path=(4, i),
+            # `.package.outer_message.nested_message`
+            full_name=full_name,
+            nested_path=["message " + message.name + " {"],
+        )
+
+    def _build_enum(self, full_name, entry) -> Enum:
+        parent, file_context, i, file_index = entry
+        if parent is not None:
+            name = full_name[len(parent) + 1 :]
+            return self.global_messages_map[parent].nested_enums[name]
+        enum = self.file_set_pb.file[file_index].enum_type[i]
+        return Enum(
+            enum_pb=enum,
+            proto_file_name=file_context.proto_file_name,
+            source_code_locations=file_context.source_code_locations,
+            path=(5, i),
+            full_name=full_name,
+            nested_path=["enum " + enum.name + " {"],
+        )
+
+    def file_digest(
+        self, file_name: str, include_source_code_info: bool = True
+    ) -> Optional[bytes]:
+        """Return a digest of the deterministic serialization of a file in the set.
+
+        Without the source_code_info, the digest only covers the definitions,
+        so it stays the same when only comments or line numbers change.
+        Return None if the file is not in the set.
+        """
+        key = (file_name, include_source_code_info)
+        digest = self._file_digests.get(key)
+        if digest is not None:
+            return digest
+        index = self.import_graph.indexes.get(file_name)
+        if index is None:
+            return None
+        fd = self.file_set_pb.file[index]
+        if isinstance(self.file_set_pb, LazyFileDescriptorSet):
+            digest = self._file_digests[key] = _lazy_file_digest(
+                fd,
+                (
+                    self.file_set_pb.source_code_info_bytes(index)
+                    if include_source_code_info
+                    else None
+                ),
+            )
+            return digest
+        if not include_source_code_info and fd.HasField("source_code_info"):
+            stripped = descriptor_pb2.FileDescriptorProto()
+            stripped.CopyFrom(fd)
+            stripped.ClearField("source_code_info")
+            fd = stripped
+        digest = self._file_digests[key] = hashlib.sha256(
+            fd.SerializeToString(deterministic=True)
+        ).digest()
+        return digest
 
     @staticmethod
     def get_root_package(file_set_pb: descriptor_pb2.FileDescriptorSet) -> str:
         """
         Return the package name of the API being checked.
 
-        In this code we don't have an access to "file_to_generate" boolean flag.
-        We only have parsed proto files in a FileDescriptorSet.
-        So the idea is to find which files are not listed as imports of any other
-        proto files (are "roots" of the dependency tree) and take the common prefix
-        of their packages (ignoring known commmon protos such as
-        google/cloud/common_resources.proto).
+        See `ImportGraph.root_package`. A FileSet already has the value in
+        `root_package`, this builds the import graph of the file set again.
         """
-        all_files = set()
-        imported_files = set()
-        files_by_name = dict()
-        for file in file_set_pb.file:
-            files_by_name[file.name] = file
-
-        queue = [descriptor_proto for descriptor_proto in file_set_pb.file]
-        while len(queue) > 0:
-            descriptor_proto = queue.pop(0)
-            all_files.add(descriptor_proto.name)
-            files_by_name[descriptor_proto.name] = descriptor_proto
-            for dep in descriptor_proto.dependency:
-                imported_files.add(dep)
-                if dep not in all_files and dep in files_by_name:
-                    queue.append(files_by_name[dep])
-
-        never_imported = [
-            files_by_name[filename] for filename in all_files.difference(imported_files)
-        ]
-        api_definition_protos = [
-            file for file in never_imported if file.package not in COMMON_PACKAGES
-        ]
-        if len(api_definition_protos) == 0:
-            return ""
-        return os.path.commonprefix([file.package for file in api_definition_protos])
-
-    def _get_source_code_locations_map(
-        self,
-    ) -> Dict[str, Dict[Tuple[int, ...], descriptor_pb2.SourceCodeInfo.Location]]:
-        source_code_locations_map = {}
-        for fd in self.file_set_pb.file:
-            if not fd.source_code_info:
-                continue
-            # Iterate over the source_code_info and place it into a dictionary.
-            #
-            # The comments in protocol buffers are sorted by a concept called
-            # the "path", which is a sequence of integers described in more
-            # detail below; this code simply shifts from a list to a dict,
-            # with tuples of paths as the dictionary keys.
-            source_code_locations = {
-                tuple(location.path): location
-                for location in fd.source_code_info.location
-            }
-            source_code_locations_map[fd.name] = source_code_locations
-        return source_code_locations_map
-
-    def _get_resource_database(self, files, source_code_locations_map):
-        resources_database = ResourceDatabase()
-        for fd in files:
-            source_code_locations = (
-                source_code_locations_map[fd.name]
-                if source_code_locations_map
-                else None
-            )
-            # Register file-level resource definitions in database.
-            for i, resource in enumerate(
-                fd.options.Extensions[resource_pb2.resource_definition]
-            ):
-                # The file option has field number 8, resource definition has
-                # field number 1053, and the index of the resource should be
-                # appended to the resource path.
-                resource_path = (8, 1053, i)
-                resources_database.register_resource(
-                    WithLocation(
-                        resource, source_code_locations, resource_path, fd.name
-                    )
-                )
-            # Register message-level resource definitions in database.
-            # Put first layer message in stack and iterate them for nested messages.
-            message_stack = [
-                # The messages in file has field number 4, the index of the messasge
-                # should be appended to the resource path. Message option has field
-                # number 7, and resource option has field number 1053.
-                WithLocation(message, source_code_locations, (4, i, 7, 1053), fd.name)
-                for i, message in enumerate(fd.message_type)
-            ]
-
-            while message_stack:
-                message_with_location = message_stack.pop()
-                message = message_with_location.value
-                resource = message.options.Extensions[resource_pb2.resource]
-                if resource.type and resource.pattern:
-                    resources_database.register_resource(
-                        WithLocation(
-                            resource,
-                            source_code_locations,
-                            message_with_location.path,
-                            fd.name,
-                        )
-                    )
-                for i, nested_message in enumerate(message.nested_type):
-                    # Nested message has field number 3, and index of the
-                    # nested message is appended to the resource path.
-                    # fmt: off
-                    resource_path = message_with_location.path + (3,i,)
-                    message_stack.append(
-                        WithLocation(
-                            nested_message,
-                            source_code_locations,
-                            resource_path,
-                            fd.name,
-                        )
-                    )
-                    # fmt: on
-
-        return resources_database
+        return ImportGraph(file_set_pb).root_package
 
     def _get_packaging_options_map(
         self,
@@ -1196,7 +2133,7 @@ class FileSet:
                 )
 
     def _get_full_name(self, package_name, name) -> str:
-        return "." + package_name + "." + name
+        return _intern("." + package_name + "." + name)
 
 
 def get_location(element) -> descriptor_pb2.SourceCodeInfo.Location:
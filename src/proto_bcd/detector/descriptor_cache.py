@@ -0,0 +1,289 @@
+# Copyright 2026 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from google.protobuf import descriptor_pb2 as desc
+from proto_bcd.comparator.import_graph import ImportGraph
+
+
+class DescriptorSetCache:
+    # A local on-disk cache of the serialized FileDescriptorSets built by protoc.
+    #
+    # An entry is keyed by a hash of the contents of the proto files passed to
+    # protoc, the include directories, the protoc identity and whether the
+    # source code info is included. The imported files are only known after
+    # protoc ran, so each entry also has a manifest with the content hash of
+    # every file in the set, resolved through the include directories. A hit
+    # is only returned if all of them are unchanged.
+    #
+    # The compiled files are also cached one by one, see `compile_incrementally`.
+    #
+    # The entries are evicted in least recently used order, by the
+    # modification time that is refreshed on every hit, once the total size
+    # of the cache is above `max_bytes`.
+    DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+    _DESCRIPTOR_SET_SUFFIX = ".pb"
+    _MANIFEST_SUFFIX = ".json"
+    _FILES_PREFIX = "files-"
+
+    def __init__(self, cache_dir: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(
+        self,
+        proto_files: Sequence[str],
+        include_dirs: Sequence[str],
+        protoc_identity: str,
+        include_source_code: bool,
+    ) -> str:
+        """Return the cache key of a protoc invocation."""
+        digest = hashlib.sha256()
+        for part in (protoc_identity, str(include_source_code)):
+            _update(digest, part)
+        for directory in include_dirs:
+            _update(digest, os.path.abspath(directory))
+        for proto_file in proto_files:
+            _update(digest, proto_file)
+            _update(digest, _file_hash(proto_file) or "")
+        return digest.hexdigest()
+
+    def get(self, key: str, include_dirs: Sequence[str]) -> Optional[bytes]:
+        """Return the serialized FileDescriptorSet of a key, or None on a miss."""
+        path = self._path(key, self._DESCRIPTOR_SET_SUFFIX)
+        try:
+            with open(self._path(key, self._MANIFEST_SUFFIX)) as f:
+                manifest = json.load(f)
+            if any(
+                _resolve_hash(name, include_dirs) != file_hash
+                for name, file_hash in manifest["files"].items()
+            ):
+                logging.info(f"Stale descriptor set cache entry {key}.")
+                return None
+            with open(path, "rb") as f:
+                data = f.read()
+        except (OSError, ValueError, KeyError):
+            return None
+        # Refresh the entry for the LRU eviction.
+        os.utime(path)
+        logging.info(f"Descriptor set cache hit {key}.")
+        return data
+
+    def put(self, key: str, data: bytes, include_dirs: Sequence[str]):
+        """Store the serialized FileDescriptorSet of a key and evict old entries."""
+        file_set = desc.FileDescriptorSet.FromString(data)
+        manifest = {
+            "files": {
+                fd.name: _resolve_hash(fd.name, include_dirs) for fd in file_set.file
+            }
+        }
+        # Write the descriptor set before the manifest, so that a concurrent
+        # reader never finds a manifest without its descriptor set.
+        self._write(self._path(key, self._DESCRIPTOR_SET_SUFFIX), data)
+        self._write(
+            self._path(key, self._MANIFEST_SUFFIX), json.dumps(manifest).encode()
+        )
+        self._evict()
+
+    def compile_incrementally(
+        self,
+        key: str,
+        proto_files: Sequence[str],
+        include_dirs: Sequence[str],
+        compile_files: Callable[[Sequence[str]], bytes],
+    ) -> bytes:
+        """Return the serialized FileDescriptorSet of the proto files.
+
+        Only the files that changed since they were cached under the key, and
+        the files that import them, are compiled again with `compile_files`.
+        The FileDescriptorSet is then assembled from the cached files, in the
+        same order as protoc with `--include_imports`. The key must cover
+        everything but the proto files, see `key`.
+        """
+        files, hashes = self._get_files(key)
+        roots = [_virtual_name(proto_file, include_dirs) for proto_file in proto_files]
+        if None in roots:
+            # Let protoc report the files that are not in the include dirs.
+            return compile_files(proto_files)
+        paths = dict(zip(roots, proto_files))
+        # Find the changed files in the files imported by the proto files,
+        # the imports of a changed file are found when it is compiled again.
+        dirty = set()
+        seen = set()
+        stack = list(roots)
+        while stack:
+            name = stack.pop()
+            if name in seen:
+                continue
+            seen.add(name)
+            if name not in files or hashes.get(name) != _resolve_hash(
+                name, include_dirs
+            ):
+                dirty.add(name)
+            else:
+                stack.extend(files[name].dependency)
+        if dirty:
+            graph = ImportGraph(desc.FileDescriptorSet(file=files.values()))
+            for name in list(dirty):
+                dirty.update(graph.transitive_importers(name) & seen)
+            compile_paths = []
+            for name in sorted(dirty):
+                path = paths.get(name) or _resolve_path(name, include_dirs)
+                # A removed file is reported by protoc for its importers.
+                if path is not None:
+                    compile_paths.append(path)
+            logging.info(f"Compile {len(compile_paths)} of {len(seen)} files.")
+            compiled = desc.FileDescriptorSet.FromString(compile_files(compile_paths))
+            for fd in compiled.file:
+                files[fd.name] = fd
+                hashes[fd.name] = _resolve_hash(fd.name, include_dirs)
+            self._put_files(key, files, hashes)
+        # Assemble the files in post-order, the same as protoc.
+        file_set = desc.FileDescriptorSet()
+        added = set()
+        for root in roots:
+            stack = [(root, False)]
+            while stack:
+                name, expanded = stack.pop()
+                if expanded:
+                    file_set.file.append(files[name])
+                    continue
+                if name in added:
+                    continue
+                added.add(name)
+                stack.append((name, True))
+                stack.extend(
+                    (dependency, False)
+                    for dependency in reversed(files[name].dependency)
+                )
+        return file_set.SerializeToString()
+
+    def _get_files(
+        self, key: str
+    ) -> Tuple[Dict[str, desc.FileDescriptorProto], Dict[str, Optional[str]]]:
+        key = self._FILES_PREFIX + key
+        path = self._path(key, self._DESCRIPTOR_SET_SUFFIX)
+        try:
+            with open(self._path(key, self._MANIFEST_SUFFIX)) as f:
+                hashes = json.load(f)["files"]
+            with open(path, "rb") as f:
+                file_set = desc.FileDescriptorSet.FromString(f.read())
+        except (OSError, ValueError, KeyError):
+            return {}, {}
+        os.utime(path)
+        return {fd.name: fd for fd in file_set.file}, hashes
+
+    def _put_files(
+        self,
+        key: str,
+        files: Dict[str, desc.FileDescriptorProto],
+        hashes: Dict[str, Optional[str]],
+    ):
+        key = self._FILES_PREFIX + key
+        file_set = desc.FileDescriptorSet(file=files.values())
+        self._write(
+            self._path(key, self._DESCRIPTOR_SET_SUFFIX), file_set.SerializeToString()
+        )
+        self._write(
+            self._path(key, self._MANIFEST_SUFFIX),
+            json.dumps({"files": hashes}).encode(),
+        )
+
+    def _path(self, key: str, suffix: str) -> str:
+        return os.path.join(self.cache_dir, key + suffix)
+
+    def _write(self, path: str, data: bytes):
+        # Write to a temporary file and rename it, so that the readers never
+        # see a partially written entry.
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def _evict(self):
+        entries = []
+        total = 0
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if not entry.name.endswith(self._DESCRIPTOR_SET_SUFFIX):
+                    continue
+                stat = entry.stat()
+                key = entry.name[: -len(self._DESCRIPTOR_SET_SUFFIX)]
+                entries.append((stat.st_mtime, key, stat.st_size))
+                total += stat.st_size
+        # Remove the least recently used entries first.
+        for _, key, size in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            for suffix in (self._MANIFEST_SUFFIX, self._DESCRIPTOR_SET_SUFFIX):
+                try:
+                    os.unlink(self._path(key, suffix))
+                except FileNotFoundError:
+                    pass
+            total -= size
+            logging.info(f"Evicted descriptor set cache entry {key}.")
+
+
+def _update(digest, part: str):
+    # Prefix every part with its length, so that the parts cannot run together.
+    encoded = part.encode()
+    digest.update(len(encoded).to_bytes(8, "little"))
+    digest.update(encoded)
+
+
+def _file_hash(path: str) -> Optional[str]:
+    try:
+        with open(path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return None
+
+
+def _resolve_hash(name: str, include_dirs: Sequence[str]) -> Optional[str]:
+    # Resolve a file of the descriptor set the same way as protoc does, in the
+    # first include directory that has it. The files that are not found are
+    # built into protoc, and covered by the protoc identity.
+    path = _resolve_path(name, include_dirs)
+    return _file_hash(path) if path is not None else None
+
+
+def _resolve_path(name: str, include_dirs: Sequence[str]) -> Optional[str]:
+    for directory in include_dirs:
+        path = os.path.join(directory, name)
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def _virtual_name(proto_file: str, include_dirs: Sequence[str]) -> Optional[str]:
+    # The name of a proto file in the descriptor set is its path relative to
+    # the first include directory that has it.
+    for directory in include_dirs:
+        relative = os.path.relpath(
+            os.path.abspath(proto_file), os.path.abspath(directory)
+        )
+        if not relative.startswith(os.pardir):
+            return relative.replace(os.sep, "/")
+    return None
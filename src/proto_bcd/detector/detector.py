@@ -12,41 +12,81 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import contextlib
 import json
 import sys
-from typing import Optional
+from typing import Optional, Union
 from google.protobuf import descriptor_pb2 as desc
 from proto_bcd.detector.options import Options
+from proto_bcd.comparator.lazy_file_set import LazyFileDescriptorSet
 from proto_bcd.comparator.file_set_comparator import FileSetComparator
 from proto_bcd.comparator.wrappers import FileSet
-from proto_bcd.findings.finding_container import FindingContainer
+from proto_bcd.findings.finding_container import FindingContainer, JsonLinesWriter
+
+DescriptorSet = Union[
+    desc.FileDescriptorSet, LazyFileDescriptorSet, bytes, bytearray, memoryview
+]
 
 
 class Detector:
-    """Detect the breaking changes in the two versions of FileDescriptorSet"""
+    """Detect the breaking changes in the two versions of FileDescriptorSet
+
+    A version can also be given as a serialized FileDescriptorSet, such as
+    the output of Loader.get_serialized_descriptor_set, which is decoded on
+    demand.
+    """
 
     def __init__(
         self,
-        descriptor_set_original: desc.FileDescriptorSet,
-        descriptor_set_update: desc.FileDescriptorSet,
+        descriptor_set_original: DescriptorSet,
+        descriptor_set_update: DescriptorSet,
         opts: Optional[Options] = None,
     ):
-        self.descriptor_set_original = descriptor_set_original
-        self.descriptor_set_update = descriptor_set_update
+        self.descriptor_set_original = _file_descriptor_set(descriptor_set_original)
+        self.descriptor_set_update = _file_descriptor_set(descriptor_set_update)
         self.opts = opts
-        self.finding_container = FindingContainer()
+        # The findings that are streamed to a JSON Lines file are only kept
+        # for the human-readable message, so that the memory does not grow
+        # with their number. They are still counted, see
+        # FindingContainer.count.
+        self.finding_container = FindingContainer(
+            keep_findings=not (
+                opts
+                and opts.output_json_path
+                and opts.output_format == "jsonl"
+                and not opts.human_readable_message
+            )
+        )
 
     def _compare(self):
         # Init FileSetComparator and compare the two FileDescriptorSet.
         # Result is stored in self.finding_container, and printed to stdout if requested.
+        processes = self.opts.index_processes if self.opts else None
         comparator = FileSetComparator(
-            FileSet(self.descriptor_set_original),
-            FileSet(self.descriptor_set_update),
+            FileSet(self.descriptor_set_original, processes=processes),
+            FileSet(self.descriptor_set_update, processes=processes),
             self.finding_container,
         )
-        comparator.compare()
+        with contextlib.ExitStack() as stack:
+            if (
+                self.opts
+                and self.opts.output_json_path
+                and self.opts.output_format == "jsonl"
+            ):
+                # Write each finding as soon as it is found.
+                stream = stack.enter_context(
+                    open(self.opts.output_json_path, "w", buffering=1)
+                )
+                sink = JsonLinesWriter(stream)
+                self.finding_container.add_sink(sink)
+                stack.callback(self.finding_container.remove_sink, sink)
+            comparator.compare()
 
-        if self.opts and self.opts.output_json_path:
+        if (
+            self.opts
+            and self.opts.output_json_path
+            and self.opts.output_format == "json"
+        ):
             # Output json file of findings and human-readable messages if the
             # command line option is enabled.
             with open(self.opts.output_json_path, "w") as write_json_file:
@@ -55,11 +95,10 @@ class Detector:
                 )
 
         if self.opts and self.opts.human_readable_message:
-            sys.stdout.write(
-                self.finding_container.to_human_readable_message(
-                    line_numbers=self.opts.line_numbers,
-                    all_changes=self.opts.all_changes,
-                )
+            self.finding_container.write_human_readable_message(
+                sys.stdout,
+                line_numbers=self.opts.line_numbers,
+                all_changes=self.opts.all_changes,
             )
 
     def detect_breaking_changes(self):
@@ -69,3 +108,11 @@ class Detector:
     def detect_all_changes(self):
         self._compare()
         return self.finding_container.get_all_findings()
+
+
+def _file_descriptor_set(
+    descriptor_set: DescriptorSet,
+) -> Union[desc.FileDescriptorSet, LazyFileDescriptorSet]:
+    if isinstance(descriptor_set, (bytes, bytearray, memoryview)):
+        return LazyFileDescriptorSet(descriptor_set)
+    return descriptor_set
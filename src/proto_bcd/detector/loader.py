@@ -12,16 +12,81 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import bz2
+import gzip
+import hashlib
+import importlib.metadata
+import io
+import json
 import logging
+import lzma
 import shutil
 import os
+import re
+import shlex
 import subprocess
-from subprocess import CalledProcessError, PIPE
-from typing import Optional, Sequence
+import sys
+from subprocess import PIPE
+from typing import Dict, FrozenSet, List, Optional, Sequence, Tuple, Union
 import tempfile
 
 from google.protobuf import descriptor_pb2 as desc
 from grpc_tools import protoc
+from proto_bcd.comparator.lazy_file_set import LazyFileDescriptorSet
+from proto_bcd.detector.descriptor_cache import DescriptorSetCache
+from proto_bcd.detector.protoc_output import ProtocOutput, map_fd
+from proto_bcd.detector.protoc_pool import ProtocWorkerPool
+
+# The files that are commonly imported by the API definition files, compiled
+# by `build_dependency_descriptor_set`.
+COMMON_DEPENDENCY_FILES = (
+    "google/api/annotations.proto",
+    "google/api/client.proto",
+    "google/api/field_behavior.proto",
+    "google/api/field_info.proto",
+    "google/api/http.proto",
+    "google/api/httpbody.proto",
+    "google/api/launch_stage.proto",
+    "google/api/resource.proto",
+    "google/api/routing.proto",
+    "google/cloud/common_resources.proto",
+    "google/cloud/location/locations.proto",
+    "google/longrunning/operations.proto",
+    "google/rpc/code.proto",
+    "google/rpc/error_details.proto",
+    "google/rpc/status.proto",
+    "google/type/date.proto",
+    "google/type/expr.proto",
+    "google/type/latlng.proto",
+    "google/type/money.proto",
+    "google/protobuf/any.proto",
+    "google/protobuf/api.proto",
+    "google/protobuf/descriptor.proto",
+    "google/protobuf/duration.proto",
+    "google/protobuf/empty.proto",
+    "google/protobuf/field_mask.proto",
+    "google/protobuf/source_context.proto",
+    "google/protobuf/struct.proto",
+    "google/protobuf/timestamp.proto",
+    "google/protobuf/type.proto",
+    "google/protobuf/wrappers.proto",
+)
+
+
+# The compressions of the descriptor set files, and the functions that open
+# a compressed file by path or file object.
+COMPRESSIONS = {
+    "gzip": gzip.open,
+    "bz2": bz2.open,
+    "xz": lzma.open,
+}
+_MAGIC_BYTES = {
+    "gzip": b"\x1f\x8b",
+    "bz2": b"BZh",
+    "xz": b"\xfd7zXZ\x00",
+}
+_MAGIC_BYTES_LENGTH = max(len(magic) for magic in _MAGIC_BYTES.values())
+_READ_CHUNK_BYTES = 1024 * 1024
 
 
 class Loader:
@@ -34,15 +99,26 @@ class Loader:
     _CURRENT_DIR = os.getcwd()
     PROTOBUF_PROTOS_DIR = os.path.join(_CURRENT_DIR, "protobuf/src")
     GRPC_TOOLS_PROTOC = "grpc_tools.protoc"
+    # Run grpc_tools.protoc with the same arguments in a separate interpreter.
+    _GRPC_TOOLS_PROTOC_MAIN = (
+        "import sys; from grpc_tools import protoc; sys.exit(protoc.main(sys.argv[1:]))"
+    )
 
     def __init__(
         self,
         proto_definition_dirs: Sequence[str],
         proto_files: Sequence[str],
-        descriptor_set: str,
+        descriptor_set: Optional[Union[str, bytes, memoryview]],
         include_source_code: bool = True,
         protoc_binary: Optional[str] = None,
         local_protobuf: bool = True,
+        cache_dir: Optional[str] = None,
+        protoc_in_subprocess: bool = False,
+        protoc_pool: Optional[ProtocWorkerPool] = None,
+        dependency_descriptor_set: Optional[str] = None,
+        lazy: bool = False,
+        descriptor_set_out: Optional[str] = None,
+        descriptor_set_out_compression: Optional[str] = None,
     ):
         self.proto_definition_dirs = proto_definition_dirs
         self.descriptor_set = descriptor_set
@@ -50,77 +126,524 @@ class Loader:
         self.include_source_code = include_source_code
         self.protoc_binary = protoc_binary or self.GRPC_TOOLS_PROTOC
         self.local_protobuf = local_protobuf
+        # The compiled descriptor sets are cached in `cache_dir` if it is set.
+        self.cache = DescriptorSetCache(cache_dir) if cache_dir else None
+        # grpc_tools.protoc runs in-process and is not re-entrant, run it in a
+        # subprocess if several loaders are used concurrently.
+        self.protoc_in_subprocess = protoc_in_subprocess
+        # grpc_tools.protoc runs in a warm worker of the pool if it is set.
+        self.protoc_pool = protoc_pool
+        # A prebuilt descriptor set of the common dependencies, passed to protoc
+        # with `--descriptor_set_in` so that they are not parsed again. It is
+        # built on the first use if the file does not exist.
+        self.dependency_descriptor_set = dependency_descriptor_set
+        # Return a LazyFileDescriptorSet, whose files are decoded on demand.
+        self.lazy = lazy
+        # `descriptor_set` is the path of a descriptor set file, or the
+        # serialized descriptor set itself.
+        # Write a snapshot of the loaded descriptor set to `descriptor_set_out`,
+        # compressed with one of COMPRESSIONS if set, see `write_descriptor_set`.
+        self.descriptor_set_out = descriptor_set_out
+        self.descriptor_set_out_compression = descriptor_set_out_compression
 
-    def get_descriptor_set(self) -> desc.FileDescriptorSet:
-        local_dir = os.getcwd()
+    def get_descriptor_set(
+        self,
+    ) -> Union[desc.FileDescriptorSet, LazyFileDescriptorSet]:
+        # Create FileDescriptorSet from the serialized data.
+        data = self.get_serialized_descriptor_set()
+        if self.lazy:
+            # The lazy set keeps the buffer, a mapped file stays mapped.
+            return LazyFileDescriptorSet(data)
         desc_set = desc.FileDescriptorSet()
+        _parse(desc_set, data)
+        return desc_set
+
+    def get_serialized_descriptor_set(self) -> Union[bytes, memoryview]:
+        """Return the serialized FileDescriptorSet, without parsing it.
+
+        protoc hands its output over in memory (see ProtocOutput), and
+        `descriptor_set` can be the serialized set itself, so nothing is
+        written to the filesystem unless `descriptor_set_out` is set.
+        """
+        data = self._load()
+        if self.descriptor_set_out and data is not None:
+            write_descriptor_set(
+                self.descriptor_set_out, data, self.descriptor_set_out_compression
+            )
+        return data if data is not None else b""
+
+    def _load(self) -> Optional[Union[bytes, memoryview]]:
+        local_dir = os.getcwd()
 
         # If users pass in descriptor set file directly, we
-        # can skip running the protoc command.
+        # can skip running the protoc command. It can also be the serialized
+        # descriptor set itself.
+        if isinstance(self.descriptor_set, (bytes, bytearray, memoryview)):
+            # A view of its own, which the parser can release.
+            return _decompress(memoryview(self.descriptor_set))
         if self.descriptor_set:
-            with open(self.descriptor_set, "rb") as f:
-                desc_set.ParseFromString(f.read())
-            return desc_set
+            return read_descriptor_set(self.descriptor_set)
 
         # Exit early with an empty description set if no directories or
         # proto files are provided.
-        if self.proto_definition_dirs is None:
-            return desc_set
-        if self.proto_files is None:
-            return desc_set
+        if self.proto_definition_dirs is None or self.proto_files is None:
+            return None
+
+        # Resolve the proto paths and files.
+        if self.local_protobuf:
+            proto_paths = list(self.proto_definition_dirs)
+            proto_paths.append(self.PROTOBUF_PROTOS_DIR)
+            proto_files = list(self.proto_files)
+        else:
+            proto_paths = [f"{local_dir}/{d}" for d in self.proto_definition_dirs]
+            proto_files = [(local_dir + "/" + pf) for pf in self.proto_files]
+        if self.dependency_descriptor_set and not os.path.exists(
+            self.dependency_descriptor_set
+        ):
+            build_dependency_descriptor_set(
+                self.dependency_descriptor_set,
+                self.proto_definition_dirs,
+                protoc_binary=self.protoc_binary,
+                include_source_code=self.include_source_code,
+                local_protobuf=self.local_protobuf,
+                protoc_in_subprocess=self.protoc_in_subprocess,
+            )
+
+        def compile_files(files: Sequence[str]) -> Union[bytes, memoryview]:
+            return self._run_protoc(self._protoc_command(proto_paths, files))
 
+        if not self.cache:
+            data = compile_files(proto_files)
+        else:
+            protoc_identity = self._protoc_identity()
+            if self.dependency_descriptor_set:
+                protoc_identity += " " + _file_hash(self.dependency_descriptor_set)
+            # Return the cached descriptor set if the inputs did not change.
+            cache_key = self.cache.key(
+                proto_files,
+                proto_paths,
+                protoc_identity,
+                self.include_source_code,
+            )
+            data = self.cache.get(cache_key, proto_paths)
+            if data is None:
+                # Otherwise only compile the files that changed, and the files
+                # that import them, again.
+                data = self.cache.compile_incrementally(
+                    self.cache.key(
+                        (), proto_paths, protoc_identity, self.include_source_code
+                    ),
+                    proto_files,
+                    proto_paths,
+                    compile_files,
+                )
+                self.cache.put(cache_key, data, proto_paths)
+        return data
+
+    def _protoc_command(
+        self, proto_paths: List[str], proto_files: Sequence[str]
+    ) -> List[str]:
         # Construct the protoc command with proper argument prefix.
         protoc_command = [self.protoc_binary]
-        for directory in self.proto_definition_dirs:
-            if self.local_protobuf:
-                protoc_command.append(f"--proto_path={directory}")
-            else:
-                protoc_command.append(f"--proto_path={local_dir}/{directory}")
-        if self.local_protobuf:
-            protoc_command.append(f"--proto_path={self.PROTOBUF_PROTOS_DIR}")
+        (
+            dependency_descriptor_set,
+            protoc_proto_paths,
+        ) = self._get_dependency_descriptor_set(proto_paths, proto_files)
+        if dependency_descriptor_set:
+            protoc_command.append(f"--descriptor_set_in={dependency_descriptor_set}")
+        protoc_command.extend(f"--proto_path={d}" for d in protoc_proto_paths)
         if self.include_source_code:
             protoc_command.append("--include_source_info")
         # Include the imported dependencies.
         protoc_command.append("--include_imports")
-        if self.local_protobuf:
-            protoc_command.extend(pf for pf in self.proto_files)
-        else:
-            protoc_command.extend((local_dir + "/" + pf) for pf in self.proto_files)
+        protoc_command.extend(proto_files)
+        return protoc_command
 
-        # Run protoc command to get pb file that contains serialized data of
-        # the proto files.
+    def _get_dependency_descriptor_set(
+        self, proto_paths: List[str], proto_files: Sequence[str]
+    ) -> Tuple[Optional[str], List[str]]:
+        # Return the path of the dependency descriptor set to use and the
+        # proto paths to pass to protoc with it.
+        path = self.dependency_descriptor_set
+        if not path:
+            return None, proto_paths
+        names, has_source_info = _get_file_names(path)
+        # The imported files would have no source code info otherwise.
+        if self.include_source_code and not has_source_info:
+            logging.info(f"Skip {path}, it has no source code info.")
+            return None, proto_paths
+        # The descriptor set may have been built from other versions of the
+        # dependencies, e.g. by the loader of the other side of the comparison.
+        if _dependencies_changed(path, proto_paths):
+            logging.info(f"Skip {path}, the dependencies in the proto paths changed.")
+            return None, proto_paths
+        # protoc only takes a file from the descriptor set if it is not found
+        # in the proto paths. So only the proto paths of the API files are
+        # passed, unless they import a file that is in neither.
+        own_proto_paths = []
+        for proto_file in proto_files:
+            directory = _proto_path_of(proto_file, proto_paths)
+            if directory is not None and directory not in own_proto_paths:
+                own_proto_paths.append(directory)
+        if _imports_are_resolved(proto_files, own_proto_paths, names):
+            return path, own_proto_paths
+        logging.info(f"Not all imports are in {path}, use all the proto paths.")
+        return path, proto_paths
+
+    def _protoc_identity(self) -> str:
+        # Identify the protoc that builds the descriptor set, so that the
+        # cached descriptor sets are rebuilt when it changes.
         if self.protoc_binary == self.GRPC_TOOLS_PROTOC:
-            fd, path = tempfile.mkstemp()
-            protoc_command.append("--descriptor_set_out=" + path)
-            # Use grpcio-tools.protoc to compile proto files
-            if protoc.main(protoc_command) != 0:
+            try:
+                version = importlib.metadata.version("grpcio-tools")
+            except importlib.metadata.PackageNotFoundError:
+                version = protoc.__file__
+            return f"{self.GRPC_TOOLS_PROTOC} {version}"
+        path = shutil.which(self.protoc_binary) or self.protoc_binary
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return path
+        return f"{os.path.realpath(path)} {stat.st_size} {stat.st_mtime_ns}"
+
+    def _run_protoc(self, protoc_command) -> Union[bytes, memoryview]:
+        # Run protoc command to get pb file that contains serialized data of
+        # the proto files. protoc writes the descriptor set to a file in
+        # memory, see `ProtocOutput`, or to a pipe.
+        if self.protoc_binary == self.GRPC_TOOLS_PROTOC and self.protoc_pool:
+            status, data = self.protoc_pool.compile(protoc_command)
+            if status != 0:
                 raise _ProtocInvokerException(
                     f"Protoc command to load the descriptor set fails. {protoc_command}"
                 )
-            else:
-                # Create FileDescriptorSet from the serialized data.
-                with open(fd, "rb") as f:
-                    desc_set.ParseFromString(f.read())
-                return desc_set
-        try:
-            protoc_command.append("-o/dev/stdout")
-            union_command = " ".join(protoc_command)
-            logging.info(f"Run protoc command: {union_command}")
-            process = subprocess.run(
-                union_command, shell=True, stdout=PIPE, stderr=PIPE
-            )
-            logging.info(f"Check the process output is not empty:")
-            logging.info(bool(process.stdout))
+            return data
+        if self.protoc_binary == self.GRPC_TOOLS_PROTOC and self.protoc_in_subprocess:
+            command = [sys.executable, "-c", self._GRPC_TOOLS_PROTOC_MAIN]
+            command.extend(protoc_command)
+            command.append("--descriptor_set_out=/dev/stdout")
+            logging.info(f"Run protoc command in a subprocess: {protoc_command}")
+            process = subprocess.run(command, stdout=PIPE, stderr=PIPE)
             if process.returncode != 0:
                 raise _ProtocInvokerException(
-                    f"Protoc command to load the descriptor set fails. {union_command}, error: {process.stderr}"
+                    f"Protoc command to load the descriptor set fails. {protoc_command}, error: {process.stderr}"
                 )
-        except (CalledProcessError, FileNotFoundError) as e:
-            logging.info(f"Call process error: {e}")
+            return process.stdout
+        with ProtocOutput() as output:
+            protoc_command.append("--descriptor_set_out=" + output.path)
+            if self.protoc_binary == self.GRPC_TOOLS_PROTOC:
+                # Use grpcio-tools.protoc to compile proto files
+                if protoc.main(protoc_command) != 0:
+                    raise _ProtocInvokerException(
+                        f"Protoc command to load the descriptor set fails. {protoc_command}"
+                    )
+                return output.read()
+            # The protoc binary can have arguments of its own, the other
+            # arguments are passed as they are, without a shell.
+            command = shlex.split(protoc_command[0]) + protoc_command[1:]
+            logging.info(f"Run protoc command: {command}")
+            try:
+                process = subprocess.run(
+                    command, stdout=PIPE, stderr=PIPE, pass_fds=(output.fd,)
+                )
+            except OSError as e:
+                logging.info(f"Call process error: {e}")
+                raise _ProtocInvokerException(
+                    f"Protoc command to load the descriptor set fails. {command}, error: {e}"
+                )
+            if process.returncode != 0:
+                raise _ProtocInvokerException(
+                    f"Protoc command to load the descriptor set fails. {command}, error: {process.stderr}"
+                )
+            return output.read()
 
-        # Create FileDescriptorSet from the serialized data.
-        desc_set.ParseFromString(process.stdout)
-        return desc_set
+
+def build_dependency_descriptor_set(
+    output_path: str,
+    proto_definition_dirs: Sequence[str],
+    proto_files: Sequence[str] = COMMON_DEPENDENCY_FILES,
+    include_source_code: bool = True,
+    protoc_binary: Optional[str] = None,
+    local_protobuf: bool = True,
+    protoc_in_subprocess: bool = False,
+):
+    """Compile the dependency files into a descriptor set for `Loader`.
+
+    The files are looked up in the proto definition directories, the ones
+    that are not found are skipped. A descriptor set with the source code info
+    can be used by all the loaders, protoc drops it from the output if it is
+    not requested, but it is cheaper for protoc to read one without it.
+
+    The content hash of every file in the set is written to a manifest next
+    to it, a loader skips the set if the files in its proto paths differ.
+    """
+    search_dirs = _dependency_search_dirs(proto_definition_dirs, local_protobuf)
+    found_files = []
+    for proto_file in proto_files:
+        path = _resolve_dependency(proto_file, search_dirs)
+        if path is not None:
+            found_files.append(path)
+    desc_set = Loader(
+        proto_definition_dirs=proto_definition_dirs,
+        proto_files=found_files,
+        descriptor_set=None,
+        include_source_code=include_source_code,
+        protoc_binary=protoc_binary,
+        local_protobuf=local_protobuf,
+        protoc_in_subprocess=protoc_in_subprocess,
+    ).get_descriptor_set()
+    manifest = {"files": {}}
+    for fd in desc_set.file:
+        path = _resolve_dependency(fd.name, search_dirs)
+        manifest["files"][fd.name] = _file_hash(path) if path is not None else None
+    # protoc reads the dependency descriptor set, it cannot be compressed.
+    write_descriptor_set(output_path, desc_set.SerializeToString())
+    # The manifest is written last, a set without one is never skipped.
+    _write_file(_manifest_path(output_path), json.dumps(manifest).encode())
+
+
+def ensure_dependency_descriptor_set(
+    output_path: str,
+    proto_definition_dirs: Sequence[str],
+    proto_files: Sequence[str] = COMMON_DEPENDENCY_FILES,
+    include_source_code: bool = True,
+    protoc_binary: Optional[str] = None,
+    local_protobuf: bool = True,
+    protoc_in_subprocess: bool = False,
+) -> bool:
+    """Build the dependency descriptor set, unless it is up to date.
+
+    The set is built if it does not exist, or if its manifest does not match
+    the files in the proto definition directories any more, see
+    `build_dependency_descriptor_set`. A set without a manifest is built
+    elsewhere and used as is. Return whether the set was built.
+    """
+    if os.path.exists(output_path) and not _dependencies_changed(
+        output_path, _dependency_search_dirs(proto_definition_dirs, local_protobuf)
+    ):
+        return False
+    build_dependency_descriptor_set(
+        output_path,
+        proto_definition_dirs,
+        proto_files=proto_files,
+        include_source_code=include_source_code,
+        protoc_binary=protoc_binary,
+        local_protobuf=local_protobuf,
+        protoc_in_subprocess=protoc_in_subprocess,
+    )
+    return True
+
+
+def read_descriptor_set(path: str) -> Union[bytes, memoryview]:
+    """Return the serialized FileDescriptorSet in a file.
+
+    A file compressed with one of COMPRESSIONS is decompressed, the format is
+    detected from the first bytes of the file and not from its extension. An
+    uncompressed file is mapped in memory.
+    """
+    compression = _compression_of(path)
+    if compression is None:
+        return _map_file(path)
+    # Decompress in chunks into a single buffer, so that neither the whole
+    # compressed file nor a second copy of the output is held in memory.
+    data = bytearray()
+    with COMPRESSIONS[compression](path, "rb") as f:
+        while True:
+            chunk = f.read(_READ_CHUNK_BYTES)
+            if not chunk:
+                break
+            data += chunk
+    logging.info(f"Decompressed {compression} descriptor set {path}.")
+    return memoryview(data)
+
+
+def write_descriptor_set(
+    path: str, data: Union[bytes, memoryview], compression: Optional[str] = None
+):
+    """Write a serialized FileDescriptorSet to a file.
+
+    The file is compressed with `compression`, one of COMPRESSIONS, if it is
+    set. `read_descriptor_set` and `Loader` read it back either way.
+    """
+    if compression is not None and compression not in COMPRESSIONS:
+        raise ValueError(
+            f"Unknown descriptor set compression {compression}, expected one of "
+            f"{', '.join(COMPRESSIONS)}."
+        )
+    _write_file(path, data, compression)
+
+
+def _write_file(
+    path: str, data: Union[bytes, memoryview], compression: Optional[str] = None
+):
+    # Write to a temporary file and rename it, so that the concurrent loaders
+    # never read a partially written file.
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            if compression is None:
+                f.write(data)
+            else:
+                with COMPRESSIONS[compression](f, "wb") as compressed:
+                    compressed.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def _decompress(data: memoryview) -> Union[bytes, memoryview]:
+    # Decompress a serialized FileDescriptorSet in memory, if it is compressed.
+    compression = _compression_of_header(data[:_MAGIC_BYTES_LENGTH].tobytes())
+    if compression is None:
+        return data
+    with COMPRESSIONS[compression](io.BytesIO(data)) as f:
+        return f.read()
+
+
+def _compression_of(path: str) -> Optional[str]:
+    with open(path, "rb") as f:
+        return _compression_of_header(f.read(_MAGIC_BYTES_LENGTH))
+
+
+def _compression_of_header(header: bytes) -> Optional[str]:
+    # A serialized FileDescriptorSet starts with the tag of its `file` field,
+    # which is none of the magic bytes.
+    for compression, magic in _MAGIC_BYTES.items():
+        if header.startswith(magic):
+            return compression
+    return None
+
+
+# The names of the files in the dependency descriptor sets and whether they
+# have source code info, by path. The entries are reused as long as the size
+# and modification time are the same.
+_DEPENDENCY_FILE_NAMES: Dict[
+    str, Tuple[Tuple[int, int], Tuple[FrozenSet[str], bool]]
+] = {}
+
+# The imports in comments are matched as well, they can only make the check
+# below fall back to all the proto paths.
+_IMPORT = re.compile(r'\bimport\s+(?:public\s+|weak\s+)?"([^"]+)"\s*;')
+
+
+def _get_file_names(path: str) -> Tuple[FrozenSet[str], bool]:
+    stat = os.stat(path)
+    version = (stat.st_size, stat.st_mtime_ns)
+    entry = _DEPENDENCY_FILE_NAMES.get(path)
+    if entry is None or entry[0] != version:
+        with open(path, "rb") as f:
+            dependencies = desc.FileDescriptorSet.FromString(f.read())
+        entry = _DEPENDENCY_FILE_NAMES[path] = (
+            version,
+            (
+                frozenset(fd.name for fd in dependencies.file),
+                any(fd.HasField("source_code_info") for fd in dependencies.file),
+            ),
+        )
+    return entry[1]
+
+
+def _manifest_path(path: str) -> str:
+    return path + ".json"
+
+
+def _dependency_search_dirs(
+    proto_definition_dirs: Sequence[str], local_protobuf: bool
+) -> List[str]:
+    search_dirs = list(proto_definition_dirs)
+    if local_protobuf:
+        search_dirs.append(Loader.PROTOBUF_PROTOS_DIR)
+    return search_dirs
+
+
+def _resolve_dependency(name: str, search_dirs: Sequence[str]) -> Optional[str]:
+    # protoc takes a file from the first directory that has it.
+    for directory in search_dirs:
+        path = os.path.join(directory, name)
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def _dependencies_changed(path: str, proto_paths: Sequence[str]) -> bool:
+    # Whether a file of the dependency descriptor set is found in the proto
+    # paths with another content than the one it was built from. The files
+    # that are not found there are taken from the set.
+    try:
+        with open(_manifest_path(path)) as f:
+            files = json.load(f)["files"]
+    except (OSError, ValueError, KeyError):
+        # Built elsewhere, there is nothing to check it against.
+        return False
+    for name, file_hash in files.items():
+        source = _resolve_dependency(name, proto_paths)
+        if source is not None and _file_hash(source) != file_hash:
+            return True
+    return False
+
+
+def _proto_path_of(proto_file: str, proto_paths: Sequence[str]) -> Optional[str]:
+    # protoc maps a proto file to the first proto path that has it.
+    for directory in proto_paths:
+        relative = os.path.relpath(
+            os.path.abspath(proto_file), os.path.abspath(directory)
+        )
+        if not relative.startswith(os.pardir):
+            return directory
+    return None
+
+
+def _imports_are_resolved(
+    proto_files: Sequence[str], proto_paths: Sequence[str], names: FrozenSet[str]
+) -> bool:
+    # Follow the imports of the proto files in the proto paths, and check that
+    # every import is found there or in the descriptor set.
+    stack = list(proto_files)
+    seen = set()
+    while stack:
+        proto_file = stack.pop()
+        if proto_file in seen:
+            continue
+        seen.add(proto_file)
+        try:
+            with open(proto_file, encoding="utf-8") as f:
+                content = f.read()
+        except (OSError, UnicodeDecodeError):
+            return False
+        for name in _IMPORT.findall(content):
+            for directory in proto_paths:
+                path = os.path.join(directory, name)
+                if os.path.isfile(path):
+                    stack.append(path)
+                    break
+            else:
+                if name not in names:
+                    return False
+    return True
+
+
+def _map_file(path: str) -> Union[bytes, memoryview]:
+    # Map the file in memory instead of reading it into a bytes object, see
+    # `map_fd`. The mapping outlives the file if it is removed, and is closed
+    # once the returned view is released.
+    with open(path, "rb") as f:
+        return map_fd(f.fileno())
+
+
+def _parse(desc_set: desc.FileDescriptorSet, data: Union[bytes, memoryview]):
+    # The parsed message does not refer to the buffer, so a mapped file is
+    # released right after.
+    try:
+        desc_set.ParseFromString(data)
+    finally:
+        if isinstance(data, memoryview):
+            data.release()
+
+
+def _file_hash(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
 
 
 class _ProtocInvokerException(Exception):
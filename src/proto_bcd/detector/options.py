@@ -32,8 +32,28 @@ class Options:
     output_json_path: Optional. The path of the findings json file. If not specify,
                       we will create a json for the users which is in
                       `$root/detected_breaking_changes.json`.
+    output_format: Optional. The format of the findings file, `json` for a
+                   JSON array (default), or `jsonl` for JSON Lines, which are
+                   written as the findings are found. The jsonl findings are
+                   only kept in memory for the human-readable message, they
+                   are counted otherwise.
     line_numbers: Show line numbers from the human readable output. True by default.
     all_changes: Show all changes, not only breaking changes. False by default.
+    cache_dir: Optional. The directory of the local cache of the descriptor sets
+               compiled from the proto definition files. No cache if not set.
+    dependency_descriptor_set: Optional. The path of a descriptor set of the
+               common dependencies, which protoc reuses instead of parsing them
+               again. It is built before the first use, and built again when
+               the dependency files it was built from change.
+    original_descriptor_set_out: Optional. The path where a snapshot of the
+               original descriptor set is written.
+    update_descriptor_set_out: Optional. The path where a snapshot of the
+               update descriptor set is written.
+    descriptor_set_out_compression: Optional. The compression of the snapshots,
+               gzip, bz2 or xz. Uncompressed if not set. The descriptor set
+               inputs can be compressed with any of them.
+    index_processes: Optional. The number of processes that index the files of
+               a large descriptor set. They are indexed in this process if not set.
     """
 
     def __init__(
@@ -48,6 +68,13 @@ class Options:
         output_json_path: Optional[str] = None,
         line_numbers: bool = True,
         all_changes: bool = False,
+        cache_dir: Optional[str] = None,
+        dependency_descriptor_set: Optional[str] = None,
+        original_descriptor_set_out: Optional[str] = None,
+        update_descriptor_set_out: Optional[str] = None,
+        descriptor_set_out_compression: Optional[str] = None,
+        output_format: str = "json",
+        index_processes: Optional[int] = None,
     ):
         self.original_api_definition_dirs = self._get_arg_arr(
             original_api_definition_dirs
@@ -64,8 +91,15 @@ class Options:
             )
         self.human_readable_message = human_readable_message
         self.output_json_path = self._get_output_json_path(output_json_path)
+        self.output_format = output_format
         self.line_numbers = line_numbers
         self.all_changes = all_changes
+        self.cache_dir = cache_dir
+        self.dependency_descriptor_set = dependency_descriptor_set
+        self.original_descriptor_set_out = original_descriptor_set_out
+        self.update_descriptor_set_out = update_descriptor_set_out
+        self.descriptor_set_out_compression = descriptor_set_out_compression
+        self.index_processes = index_processes
 
     def use_proto_dirs(self) -> bool:
         # User pass in the directories of proto definition files as input.
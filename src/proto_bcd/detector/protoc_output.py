@@ -0,0 +1,69 @@
+# Copyright 2026 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import mmap
+import os
+import tempfile
+from typing import Optional, Union
+
+
+class ProtocOutput:
+    # The file that protoc writes a descriptor set to, passed as
+    # `--descriptor_set_out=<path>`.
+    #
+    # Where the platform has memfd_create, it is an anonymous file in memory
+    # that protoc opens by its /dev/fd path, in this process or in a child
+    # process that inherits the descriptor (see `fd`), so the descriptor set
+    # never touches the filesystem. Elsewhere it is a temporary file that is
+    # removed on close.
+    def __init__(self):
+        self._temp_path: Optional[str] = None
+        if hasattr(os, "memfd_create"):
+            self.fd = os.memfd_create("descriptor_set")
+            self.path = f"/dev/fd/{self.fd}"
+        else:
+            self.fd, self._temp_path = tempfile.mkstemp(suffix=".pb")
+            self.path = self._temp_path
+
+    def read(self) -> Union[bytes, memoryview]:
+        """Return the descriptor set written by protoc, mapped in memory.
+
+        The mapping outlives the file, and is released with the returned view.
+        protoc truncates the file when it opens it, so the view must be
+        released before protoc writes to the same output again.
+        """
+        return map_fd(self.fd)
+
+    def close(self):
+        os.close(self.fd)
+        if self._temp_path is not None:
+            os.unlink(self._temp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def map_fd(fd: int) -> Union[bytes, memoryview]:
+    """Map an open file in memory, read-only.
+
+    The parser reads straight from the page cache, and no private copy of a
+    large descriptor set stays alive next to the parsed message.
+    """
+    if os.fstat(fd).st_size == 0:
+        # An empty file cannot be mapped.
+        return b""
+    return memoryview(mmap.mmap(fd, 0, access=mmap.ACCESS_READ))
@@ -0,0 +1,200 @@
+# Copyright 2026 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import logging
+import os
+import queue
+import subprocess
+import sys
+from subprocess import PIPE
+from typing import Optional, Sequence, Tuple
+
+from proto_bcd.detector.protoc_output import ProtocOutput
+
+# The header of a request is the length of the JSON encoded protoc arguments
+# and working directory.
+# The header of a response is the protoc exit status and the length of the
+# serialized FileDescriptorSet that follows.
+_LENGTH_BYTES = 8
+_STATUS_BYTES = 4
+
+
+class ProtocWorkerPool:
+    # A pool of long-lived worker processes that run grpc_tools.protoc.
+    #
+    # The protoc arguments are sent to a worker over its stdin, and the
+    # serialized FileDescriptorSet is returned over its stdout, so that the
+    # repeated compilations do not pay the start-up cost of a process. At most
+    # `size` compilations run at the same time, the callers above that wait
+    # for a free worker. A worker is replaced by a new one after
+    # `max_requests` compilations, or if it died.
+    def __init__(self, size: Optional[int] = None, max_requests: int = 100):
+        self.size = size or os.cpu_count() or 1
+        self.max_requests = max_requests
+        # The workers are started on demand, an empty slot is None.
+        self._idle = queue.LifoQueue()
+        for _ in range(self.size):
+            self._idle.put(None)
+
+    def compile(self, protoc_command: Sequence[str]) -> Tuple[int, bytes]:
+        """Run protoc with the arguments in a worker.
+
+        Return the exit status of protoc and the serialized FileDescriptorSet.
+        The `--descriptor_set_out` argument is added by the worker.
+        """
+        worker = self._idle.get()
+        try:
+            if worker is not None and not worker.alive:
+                worker.close()
+                worker = None
+            if worker is None:
+                worker = _Worker()
+            result = worker.compile(protoc_command)
+            if worker.requests >= self.max_requests:
+                worker.close()
+                worker = None
+            return result
+        except BaseException:
+            if worker is not None:
+                worker.close()
+                worker = None
+            raise
+        finally:
+            self._idle.put(worker)
+
+    def close(self):
+        """Stop the idle workers."""
+        for _ in range(self.size):
+            worker = self._idle.get()
+            if worker is not None:
+                worker.close()
+        for _ in range(self.size):
+            self._idle.put(None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ProtocWorkerError(Exception):
+    pass
+
+
+class _Worker:
+    def __init__(self):
+        # The child process imports this module from the same path.
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join(p for p in sys.path if p)
+        self.process = subprocess.Popen(
+            [
+                sys.executable,
+                "-c",
+                "from proto_bcd.detector.protoc_pool import _main; _main()",
+            ],
+            stdin=PIPE,
+            stdout=PIPE,
+            env=env,
+        )
+        self.requests = 0
+        logging.info(f"Started protoc worker {self.process.pid}.")
+
+    @property
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def compile(self, protoc_command: Sequence[str]) -> Tuple[int, bytes]:
+        try:
+            _write_request(self.process.stdin, protoc_command)
+        except OSError as e:
+            raise ProtocWorkerError(f"Protoc worker is not available: {e}")
+        result = _read_response(self.process.stdout)
+        self.requests += 1
+        return result
+
+    def close(self):
+        # Closing stdin ends the loop of the worker, which closes its
+        # output file before it exits.
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+        try:
+            self.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        self.process.stdout.close()
+
+
+def _write_request(stream, protoc_command: Sequence[str]):
+    # The relative paths in the arguments are resolved in the working
+    # directory of the caller.
+    request = json.dumps({"cwd": os.getcwd(), "args": list(protoc_command)}).encode()
+    stream.write(len(request).to_bytes(_LENGTH_BYTES, "little"))
+    stream.write(request)
+    stream.flush()
+
+
+def _read_response(stream) -> Tuple[int, bytes]:
+    header = _read_exactly(stream, _STATUS_BYTES + _LENGTH_BYTES)
+    status = int.from_bytes(header[:_STATUS_BYTES], "little", signed=True)
+    length = int.from_bytes(header[_STATUS_BYTES:], "little")
+    return status, _read_exactly(stream, length)
+
+
+def _read_exactly(stream, size: int) -> bytes:
+    data = stream.read(size)
+    if len(data) != size:
+        raise ProtocWorkerError("Protoc worker exited unexpectedly.")
+    return data
+
+
+def _main():  # pragma: no cover
+    # The entry point of a worker process. The requests are read from stdin
+    # and the responses are written to the original stdout, protoc itself
+    # writes to stderr only but anything else printed goes there too.
+    responses = os.fdopen(os.dup(1), "wb")
+    os.dup2(2, 1)
+    _serve(sys.stdin.buffer, responses)
+
+
+def _serve(requests, responses):
+    # The loop of a worker, until the end of the requests.
+    from grpc_tools import protoc
+
+    # A single output file is reused by all the requests of the worker, in
+    # memory where the platform allows it.
+    with ProtocOutput() as output:
+        while True:
+            header = requests.read(_LENGTH_BYTES)
+            if len(header) != _LENGTH_BYTES:
+                return
+            length = int.from_bytes(header, "little")
+            request = json.loads(requests.read(length))
+            os.chdir(request["cwd"])
+            protoc_command = request["args"]
+            protoc_command.append("--descriptor_set_out=" + output.path)
+            status = protoc.main(protoc_command)
+            data = output.read() if status == 0 else b""
+            responses.write(status.to_bytes(_STATUS_BYTES, "little", signed=True))
+            responses.write(len(data).to_bytes(_LENGTH_BYTES, "little"))
+            responses.write(data)
+            responses.flush()
+            # protoc truncates the output on the next request, which must not
+            # be mapped by then.
+            if isinstance(data, memoryview):
+                data.release()
@@ -13,17 +13,35 @@
 # limitations under the License.
 
 
+from string import Formatter
+from typing import NamedTuple
+
+from proto_bcd.findings.finding_category import FindingCategory
 from proto_bcd.findings.messages import templates
 
 
-class Finding:
-    class _Location:
-        proto_file_name: str
-        source_code_line: int
+class _Location(NamedTuple):
+    proto_file_name: str
+    source_code_line: int
+
 
-        def __init__(self, proto_file_name, source_code_line):
-            self.proto_file_name = proto_file_name
-            self.source_code_line = source_code_line
+class Finding:
+    # The location is stored in two slots of its own, `location` is a view
+    # of them that is only built when it is accessed.
+    __slots__ = (
+        "category",
+        "proto_file_name",
+        "source_code_line",
+        "change_type",
+        "conventional_commit_tag",
+        "extra_info",
+        "subject",
+        "oldsubject",
+        "context",
+        "type",
+        "oldtype",
+        "oldcontext",
+    )
 
     def __init__(
         self,
@@ -41,7 +59,8 @@ class Finding:
         oldcontext="",
     ):
         self.category = category
-        self.location = self._Location(proto_file_name, source_code_line)
+        self.proto_file_name = proto_file_name
+        self.source_code_line = source_code_line
         self.change_type = change_type
         self.conventional_commit_tag = conventional_commit_tag
         self.extra_info = extra_info
@@ -52,12 +71,16 @@ class Finding:
         self.oldtype = oldtype
         self.oldcontext = oldcontext
 
+    @property
+    def location(self) -> _Location:
+        return _Location(self.proto_file_name, self.source_code_line)
+
     def to_dict(self):
         return {
             "category": self.category.name,
             "location": {
-                "proto_file_name": self.location.proto_file_name,
-                "source_code_line": self.location.source_code_line,
+                "proto_file_name": self.proto_file_name,
+                "source_code_line": self.source_code_line,
             },
             "change_type": self.change_type.name,
             "conventional_commit_tag": self.conventional_commit_tag.name,
@@ -71,5 +94,30 @@ class Finding:
         }
 
     def get_message(self):
-        format_parameters = self.to_dict()
-        return templates[self.category].format(**format_parameters)
+        return _messages[self.category].render(self)
+
+
+class _Message:
+    # A message template, compiled once with its named fields replaced by
+    # positional ones. It is rendered from the attributes of a finding,
+    # without building its dict.
+    __slots__ = ("template", "fields")
+
+    def __init__(self, template: str):
+        parts = []
+        fields = []
+        for literal, field_name, format_spec, conversion in Formatter().parse(template):
+            parts.append(literal.replace("{", "{{").replace("}", "}}"))
+            if field_name is not None:
+                conversion = f"!{conversion}" if conversion else ""
+                format_spec = f":{format_spec}" if format_spec else ""
+                parts.append(f"{{{len(fields)}{conversion}{format_spec}}}")
+                fields.append(field_name)
+        self.template = "".join(parts)
+        self.fields = tuple(fields)
+
+    def render(self, finding: Finding) -> str:
+        return self.template.format(*[getattr(finding, field) for field in self.fields])
+
+
+_messages = {category: _Message(templates[category]) for category in FindingCategory}
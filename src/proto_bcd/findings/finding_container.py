@@ -12,23 +12,45 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import io
+import json
+from array import array
+from bisect import bisect_left
+from itertools import groupby
 from re import sub
-from typing import Callable
+from typing import Callable, Dict, List, Optional, TextIO
 from proto_bcd.findings.finding import Finding
+from proto_bcd.findings.finding_store import ColumnarFindingStore
 from proto_bcd.findings.finding_category import (
     FindingCategory,
     ChangeType,
     ConventionalCommitTag,
 )
-from collections import defaultdict
+
+# The change type of the findings that are added without one.
+_CHANGE_TYPES = {
+    ConventionalCommitTag.FEAT_BREAKING: ChangeType.MAJOR,
+    ConventionalCommitTag.FIX_BREAKING: ChangeType.MAJOR,
+    ConventionalCommitTag.FEAT: ChangeType.MINOR,
+    ConventionalCommitTag.FIX: ChangeType.PATCH,
+}
+# The attributes of the findings that FindingContainer indexes, and the
+# enum of the values of an attribute. The enums are indexed by their value,
+# hashing an enum member is a Python call.
+_INDEXED_ATTRIBUTES = {
+    "category": FindingCategory,
+    "proto_file_name": None,
+    "context": None,
+    "change_type": ChangeType,
+}
 
 
 def sorted_filtered_findings(findings: list, filter: Callable) -> list:
     filtered = [f for f in findings if filter(f)]
     filtered.sort(
         key=lambda f: (
-            f.location.proto_file_name,
-            f.location.source_code_line,
+            f.proto_file_name,
+            f.source_code_line,
             f.subject,
             f.oldsubject,
             f.context,
@@ -40,8 +62,36 @@ def sorted_filtered_findings(findings: list, filter: Callable) -> list:
 
 
 class FindingContainer:
-    def __init__(self):
-        self.finding_results = []
+    # The findings are kept in `finding_results`, and handed to the sinks
+    # added with `add_sink` as soon as they are found. With
+    # `keep_findings=False` they are only handed to the sinks, so that the
+    # memory does not grow with the number of findings. With `columnar=True`
+    # they are kept in a ColumnarFindingStore instead of a list, for the runs
+    # with millions of findings that are mostly counted. The store builds a
+    # new Finding every time one is accessed, so it is slower than the list
+    # when the findings are read.
+    #
+    # The findings are counted by the attributes in _INDEXED_ATTRIBUTES as
+    # they are added, and indexed by them for the queries, see `count`,
+    # `count_by` and `find`.
+    def __init__(self, keep_findings: bool = True, columnar: bool = False):
+        self.finding_results = ColumnarFindingStore() if columnar else []
+        self.keep_findings = keep_findings
+        self._sinks = []
+        # The number of findings by attribute, and value and change type.
+        # The findings that are not kept are also counted.
+        self._counts = {attribute: {} for attribute in _INDEXED_ATTRIBUTES}
+        # The rows of the findings in `finding_results`, in ascending order,
+        # by attribute and value. They are indexed on the first query, and
+        # then as they are added.
+        self._rows = None
+
+    def add_sink(self, sink: Callable[[Finding], None]):
+        """Call `sink` with every finding added from now on."""
+        self._sinks.append(sink)
+
+    def remove_sink(self, sink: Callable[[Finding], None]):
+        self._sinks.remove(sink)
 
     def add_finding(
         self,
@@ -59,20 +109,13 @@ class FindingContainer:
         oldcontext="",
     ):
         if change_type == ChangeType.UNDEFINED:
-            if (
-                conventional_commit_tag == ConventionalCommitTag.FEAT_BREAKING
-                or conventional_commit_tag == ConventionalCommitTag.FIX_BREAKING
-            ):
-                change_type = ChangeType.MAJOR
-            elif conventional_commit_tag == ConventionalCommitTag.FEAT:
-                change_type = ChangeType.MINOR
-            elif conventional_commit_tag == ConventionalCommitTag.FIX:
-                change_type = ChangeType.PATCH
-            else:
-                change_type = ChangeType.NONE
+            change_type = _CHANGE_TYPES.get(conventional_commit_tag, ChangeType.NONE)
 
-        self.finding_results.append(
-            Finding(
+        store = self.finding_results
+        if self._sinks or not (
+            self.keep_findings and isinstance(store, ColumnarFindingStore)
+        ):
+            finding = Finding(
                 category=category,
                 proto_file_name=proto_file_name,
                 source_code_line=source_code_line,
@@ -86,41 +129,220 @@ class FindingContainer:
                 oldtype=oldtype,
                 oldcontext=oldcontext,
             )
+        else:
+            # The columnar store takes the attributes, the Finding would only
+            # be split into its columns.
+            finding = None
+        for sink in self._sinks:
+            sink(finding)
+        change_type_key = change_type._value_
+        keys = (category._value_, proto_file_name, context, change_type_key)
+        for counts, key in zip(self._counts.values(), keys):
+            key = (key, change_type_key)
+            counts[key] = counts.get(key, 0) + 1
+        if self.keep_findings:
+            if self._rows is not None:
+                self._index_rows(len(store), keys)
+            if finding is None:
+                store.add(
+                    category,
+                    proto_file_name,
+                    source_code_line,
+                    change_type,
+                    conventional_commit_tag,
+                    extra_info,
+                    subject,
+                    oldsubject,
+                    context,
+                    type,
+                    oldtype,
+                    oldcontext,
+                )
+            else:
+                store.append(finding)
+
+    def count(self, change_type: Optional[ChangeType] = None, **filters) -> int:
+        """Return the number of findings of a change type, or of all of them.
+
+        The findings can be filtered by the values of the indexed attributes,
+        such as `count(ChangeType.MAJOR, proto_file_name="foo.proto")`. With
+        at most one filter, this is a lookup in the counters, which also count
+        the findings that are not kept. With more, the rows of the filters in
+        the indexes are intersected, so the findings must be kept.
+        """
+        if len(filters) > 1:
+            if not self.keep_findings:
+                raise ValueError(
+                    "The findings are not kept, they can only be counted by one "
+                    "attribute and the change type."
+                )
+            if change_type is not None:
+                filters["change_type"] = change_type
+            return len(self._find_rows(filters))
+        change_types = [change_type] if change_type is not None else ChangeType
+        if not filters:
+            # Every finding is counted once by its change type.
+            counts = self._counts["change_type"]
+            return sum(counts.get((t._value_, t._value_), 0) for t in change_types)
+        ((attribute, value),) = filters.items()
+        key = _index_key(attribute, value)
+        counts = self._counts[attribute]
+        return sum(counts.get((key, t._value_), 0) for t in change_types)
+
+    def count_by(
+        self, attribute: str, change_type: Optional[ChangeType] = None
+    ) -> Dict[object, int]:
+        """Return the number of findings by value of an indexed attribute.
+
+        For example the number of breaking changes by file is
+        `count_by("proto_file_name", ChangeType.MAJOR)`. The values without
+        findings of the change type are left out.
+        """
+        _check_indexed(attribute)
+        enum = _INDEXED_ATTRIBUTES[attribute]
+        change_type_key = change_type._value_ if change_type is not None else None
+        counts = {}
+        for (key, key_change_type), count in self._counts[attribute].items():
+            if change_type_key is None or key_change_type == change_type_key:
+                value = enum(key) if enum else key
+                counts[value] = counts.get(value, 0) + count
+        return counts
+
+    def find(self, **filters) -> List[Finding]:
+        """Return the findings with the values of the indexed attributes.
+
+        For example `find(context="Foo", change_type=ChangeType.MAJOR)`. The
+        findings are looked up in the indexes and sorted like
+        `get_all_findings`.
+        """
+        rows = self._find_rows(filters)
+        if isinstance(self.finding_results, ColumnarFindingStore):
+            findings = self.finding_results.findings(rows)
+        else:
+            findings = [self.finding_results[row] for row in rows]
+        return sorted_filtered_findings(findings, lambda f: True)
+
+    def _find_rows(self, filters) -> List[int]:
+        # Intersect the rows of the attribute values, starting from the
+        # shortest. A row is looked up in the others by bisection.
+        if not filters:
+            return list(range(len(self.finding_results)))
+        keys = {
+            attribute: _index_key(attribute, value)
+            for attribute, value in filters.items()
+        }
+        indexed_rows = self._indexed_rows()
+        postings = sorted(
+            (indexed_rows[attribute].get(key, ()) for attribute, key in keys.items()),
+            key=len,
         )
+        rows = list(postings[0])
+        for other in postings[1:]:
+            rows = [row for row in rows if _contains(other, row)]
+        return rows
+
+    def _index_rows(self, row: int, keys: tuple):
+        for rows, key in zip(self._rows.values(), keys):
+            key_rows = rows.get(key)
+            if key_rows is None:
+                key_rows = rows[key] = array("I")
+            key_rows.append(row)
+
+    def _indexed_rows(self) -> Dict[str, Dict[object, array]]:
+        if self._rows is None:
+            self._rows = {attribute: {} for attribute in _INDEXED_ATTRIBUTES}
+            for row, finding in enumerate(self.finding_results):
+                self._index_rows(
+                    row,
+                    (
+                        finding.category._value_,
+                        finding.proto_file_name,
+                        finding.context,
+                        finding.change_type._value_,
+                    ),
+                )
+        return self._rows
 
     def get_all_findings(self):
+        if isinstance(self.finding_results, ColumnarFindingStore):
+            return self._sorted_store_findings(None)
         return sorted_filtered_findings(self.finding_results, lambda f: True)
 
     def get_actionable_findings(self):
+        if isinstance(self.finding_results, ColumnarFindingStore):
+            return self._sorted_store_findings([ChangeType.MAJOR])
         return sorted_filtered_findings(
             self.finding_results, lambda f: f.change_type == ChangeType.MAJOR
         )
 
+    def _sorted_store_findings(self, change_types):
+        # Filter and sort the rows of the store, only the Findings that are
+        # returned are built.
+        store = self.finding_results
+        rows = store.rows(change_types)
+        store.sort(rows)
+        return store.findings(rows)
+
     def to_dict_arr(self):
         return [finding.to_dict() for finding in self.finding_results]
 
     def to_human_readable_message(self, line_numbers=True, all_changes=False):
-        output_message = ""
-        file_to_findings = defaultdict(list)
+        output = io.StringIO()
+        self.write_human_readable_message(
+            output, line_numbers=line_numbers, all_changes=all_changes
+        )
+        return output.getvalue()
+
+    def write_human_readable_message(
+        self, stream: TextIO, line_numbers=True, all_changes=False
+    ):
+        """Write the human-readable message to a text stream, a line at a time.
+
+        The findings are sorted once, by proto file name first, so that the
+        findings of a file are consecutive and ordered by the source code
+        line. The message is sorted alphabetically if the line is the same.
+        """
         if all_changes:
             findings = self.get_all_findings()
         else:
             findings = self.get_actionable_findings()
-        for finding in findings:
-            # Create a map to summarize the findings based on proto file name.
-            file_to_findings[finding.location.proto_file_name].append(finding)
-        # Add each finding to the output message.
-        for file_name, findings in file_to_findings.items():
-            # Customize sort key function to output the findings in the same
-            # file based on the source code line number.
-            # Sort message alphabetically if the line number is same.
-            sorted_findings = sorted_filtered_findings(findings, lambda f: True)
-            for finding in sorted_findings:
+        for file_name, file_findings in groupby(
+            findings, key=lambda f: f.proto_file_name
+        ):
+            for finding in file_findings:
                 message = finding.get_message()
-                if finding.location.source_code_line == -1 or not line_numbers:
-                    output_message += f"{file_name}: {message}\n"
+                if finding.source_code_line == -1 or not line_numbers:
+                    stream.write(f"{file_name}: {message}\n")
                 else:
-                    output_message += (
-                        f"{file_name} L{finding.location.source_code_line}: {message}\n"
+                    stream.write(
+                        f"{file_name} L{finding.source_code_line}: {message}\n"
                     )
-        return output_message
+
+
+class JsonLinesWriter:
+    # A sink of FindingContainer that writes every finding to a text stream
+    # as a line of JSON, in the order the findings are found. A line buffered
+    # stream hands each finding to the reader right away.
+    def __init__(self, stream: TextIO):
+        self.stream = stream
+
+    def __call__(self, finding: Finding):
+        self.stream.write(json.dumps(finding.to_dict()) + "\n")
+
+
+def _contains(rows, row: int) -> bool:
+    i = bisect_left(rows, row)
+    return i < len(rows) and rows[i] == row
+
+
+def _check_indexed(attribute: str):
+    if attribute not in _INDEXED_ATTRIBUTES:
+        raise ValueError(f"The findings are not indexed by {attribute}.")
+
+
+def _index_key(attribute: str, value):
+    # The key of an attribute value in the counters and the indexes.
+    _check_indexed(attribute)
+    if _INDEXED_ATTRIBUTES[attribute]:
+        return value._value_
+    return value
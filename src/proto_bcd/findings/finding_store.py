@@ -0,0 +1,250 @@
+# Copyright 2026 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import gc
+from array import array
+from collections.abc import Sequence
+from itertools import compress, repeat
+from operator import add, lshift, sub
+from typing import Collection, List, Optional
+
+from proto_bcd.findings.finding import Finding
+from proto_bcd.findings.finding_category import (
+    ChangeType,
+    ConventionalCommitTag,
+    FindingCategory,
+)
+
+_CATEGORIES = list(FindingCategory)
+_CATEGORY_CODES = {category: code for code, category in enumerate(_CATEGORIES)}
+_CHANGE_TYPES = list(ChangeType)
+_CHANGE_TYPE_CODES = {
+    change_type: code for code, change_type in enumerate(_CHANGE_TYPES)
+}
+_TAGS = list(ConventionalCommitTag)
+_TAG_CODES = {tag: code for code, tag in enumerate(_TAGS)}
+# The string attributes of a finding, which are codes in the string table.
+_STRING_COLUMNS = (
+    "proto_file_name",
+    "subject",
+    "oldsubject",
+    "context",
+    "type",
+    "oldtype",
+    "oldcontext",
+)
+# The number of Findings built at a time when the store is iterated.
+_ITER_CHUNK = 1024
+# The sort key of the findings is packed into integers of at most this size.
+_KEY_BITS = 62
+# The sort key of the findings, the same as sorted_filtered_findings.
+_SORT_COLUMNS = (
+    "proto_file_name",
+    "source_code_line",
+    "subject",
+    "oldsubject",
+    "context",
+    "type",
+    "oldtype",
+)
+
+
+class ColumnarFindingStore(Sequence):
+    """The findings of a FindingContainer, stored by attribute.
+
+    Every attribute is an array with one item per finding. The enums are
+    integer codes, and the strings are codes in a table shared by all the
+    string attributes, where every distinct string is stored once. A Finding
+    is only built when it is accessed, so the store takes a fraction of the
+    memory of the Finding objects. The Findings are not kept, a new one is
+    built every time a row is accessed.
+    """
+
+    def __init__(self):
+        self.category = bytearray()
+        self.change_type = bytearray()
+        self.conventional_commit_tag = bytearray()
+        self.source_code_line = array("i")
+        for column in _STRING_COLUMNS:
+            setattr(self, column, array("I"))
+        # Mostly None, or the nested path of a field.
+        self.extra_info = []
+        self.strings = []
+        self._string_codes = {}
+
+    def append(self, finding: Finding):
+        self.add(
+            finding.category,
+            finding.proto_file_name,
+            finding.source_code_line,
+            finding.change_type,
+            finding.conventional_commit_tag,
+            finding.extra_info,
+            finding.subject,
+            finding.oldsubject,
+            finding.context,
+            finding.type,
+            finding.oldtype,
+            finding.oldcontext,
+        )
+
+    def add(
+        self,
+        category: FindingCategory,
+        proto_file_name: str,
+        source_code_line: int,
+        change_type: ChangeType,
+        conventional_commit_tag: ConventionalCommitTag,
+        extra_info,
+        subject,
+        oldsubject,
+        context,
+        type,
+        oldtype,
+        oldcontext,
+    ):
+        """Add a finding by its attributes, without building a Finding."""
+        self.category.append(_CATEGORY_CODES[category])
+        self.change_type.append(_CHANGE_TYPE_CODES[change_type])
+        self.conventional_commit_tag.append(_TAG_CODES[conventional_commit_tag])
+        self.source_code_line.append(source_code_line)
+        intern = self._intern
+        self.proto_file_name.append(intern(proto_file_name))
+        self.subject.append(intern(subject))
+        self.oldsubject.append(intern(oldsubject))
+        self.context.append(intern(context))
+        self.type.append(intern(type))
+        self.oldtype.append(intern(oldtype))
+        self.oldcontext.append(intern(oldcontext))
+        self.extra_info.append(extra_info)
+
+    def rows(self, change_types: Optional[Collection[ChangeType]] = None) -> List[int]:
+        """Return the rows of the findings of the change types, or all of them."""
+        if change_types is None:
+            return list(range(len(self)))
+        # Map the codes of the change types to 1 and the others to 0, in a
+        # single pass over the column.
+        table = bytearray(256)
+        for change_type in change_types:
+            table[_CHANGE_TYPE_CODES[change_type]] = 1
+        return list(compress(range(len(self)), self.change_type.translate(table)))
+
+    def sort(self, rows: List[int]):
+        """Sort the rows by file, line and subject, like sorted_filtered_findings.
+
+        The attributes of the key are integers, the strings are replaced by
+        their rank in the sorted strings. They are packed into as few
+        integers of at most 62 bits as they fit in, and the rows are sorted
+        by one of them at a time, from the last to the first. The sort is
+        stable, so this is the same order as a sort by the whole key.
+        """
+        ranks = self._string_ranks()
+        # The packed keys, and the number of bits used in the last one.
+        keys = []
+        bits = _KEY_BITS
+        for column in _SORT_COLUMNS:
+            values = getattr(self, column)
+            if column in _STRING_COLUMNS:
+                values = array("I", map(ranks.__getitem__, values))
+            low = min(values, default=0)
+            column_bits = (max(values, default=0) - low).bit_length()
+            if column_bits == 0:
+                # The same value in all the rows.
+                continue
+            if low:
+                values = map(sub, values, repeat(low))
+            if bits + column_bits > _KEY_BITS:
+                keys.append(list(values))
+                bits = column_bits
+            else:
+                keys[-1] = list(
+                    map(add, map(lshift, keys[-1], repeat(column_bits)), values)
+                )
+                bits += column_bits
+        for key in reversed(keys):
+            rows.sort(key=key.__getitem__)
+
+    def findings(self, rows: List[int]) -> List[Finding]:
+        """Build the Findings of the rows, a column at a time."""
+
+        def column(name):
+            return map(getattr(self, name).__getitem__, rows)
+
+        def strings(name):
+            return map(self.strings.__getitem__, column(name))
+
+        # The cyclic garbage collector would run over and over while a
+        # million of Findings are allocated, and they have no cycle to collect.
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            return list(
+                map(
+                    Finding,
+                    map(_CATEGORIES.__getitem__, column("category")),
+                    strings("proto_file_name"),
+                    column("source_code_line"),
+                    map(_CHANGE_TYPES.__getitem__, column("change_type")),
+                    map(_TAGS.__getitem__, column("conventional_commit_tag")),
+                    column("extra_info"),
+                    strings("subject"),
+                    strings("oldsubject"),
+                    strings("context"),
+                    strings("type"),
+                    strings("oldtype"),
+                    strings("oldcontext"),
+                )
+            )
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.findings(range(*index.indices(len(self))))
+        if not -len(self) <= index < len(self):
+            raise IndexError("finding index out of range")
+        return self.findings([index % len(self)])[0]
+
+    def __iter__(self):
+        # Build the Findings a chunk at a time.
+        for start in range(0, len(self), _ITER_CHUNK):
+            yield from self.findings(range(start, min(start + _ITER_CHUNK, len(self))))
+
+    def __len__(self):
+        return len(self.category)
+
+    def _intern(self, value) -> int:
+        # The strings are mostly names, but a subject can also be a number.
+        code = self._string_codes.get(value)
+        if code is None:
+            code = self._string_codes[value] = len(self.strings)
+            self.strings.append(value)
+        return code
+
+    def _string_ranks(self) -> array:
+        # The rank of every code of the string table in the sorted strings.
+        strings = self.strings
+        try:
+            order = sorted(range(len(strings)), key=strings.__getitem__)
+        except TypeError:
+            # The values of different types are only ordered by type.
+            order = sorted(
+                range(len(strings)),
+                key=lambda code: (type(strings[code]).__name__, strings[code]),
+            )
+        ranks = array("I", [0]) * len(strings)
+        for rank, code in enumerate(order):
+            ranks[code] = rank
+        return ranks
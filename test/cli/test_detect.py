@@ -18,6 +18,7 @@ import tempfile
 import json
 from click.testing import CliRunner
 from proto_bcd.cli.detect import detect
+from proto_bcd.comparator.wrappers import FileSet
 from unittest.mock import patch
 from io import StringIO
 
@@ -48,6 +49,38 @@ class CliDetectTest(unittest.TestCase):
                 "enum_v1.proto L5: An existing enum `BookType` is removed.\n",
             )
 
+    def test_compressed_descriptor_set_snapshots(self):
+        # Compile the proto files once, writing compressed snapshots, then
+        # compare the snapshots.
+        with tempfile.TemporaryDirectory() as tmp, patch("sys.stdout", new=StringIO()):
+            original = os.path.join(tmp, "original.pb")
+            update = os.path.join(tmp, "update.pb")
+            outputs = []
+            for args in (
+                [
+                    "--original_api_definition_dirs=test/testdata/protos/enum/v1",
+                    "--update_api_definition_dirs=test/testdata/protos/enum/v1beta1",
+                    "--original_proto_files=test/testdata/protos/enum/v1/enum_v1.proto",
+                    "--update_proto_files=test/testdata/protos/enum/v1beta1/enum_v1beta1.proto",
+                    f"--original_descriptor_set_out={original}",
+                    f"--update_descriptor_set_out={update}",
+                    "--descriptor_set_out_compression=xz",
+                ],
+                [
+                    f"--original_descriptor_set_file_path={original}",
+                    f"--update_descriptor_set_file_path={update}",
+                ],
+            ):
+                result = CliRunner().invoke(detect, args + ["--human_readable_message"])
+                self.assertEqual(result.exit_code, 0)
+                outputs.append(result.output)
+            with open(original, "rb") as f:
+                self.assertEqual(f.read(6), b"\xfd7zXZ\x00")
+        self.assertEqual(
+            outputs[0], "enum_v1.proto L5: An existing enum `BookType` is removed.\n"
+        )
+        self.assertEqual(outputs[1], outputs[0])
+
     def test_single_directory_enum(self):
         # Mock the stdout so that the unit test does not
         # print anything to the console.
@@ -175,6 +208,24 @@ class CliDetectTest(unittest.TestCase):
                 "optional.proto L6: Changed proto3 optional flag of an existing field `enabled` in message `.example.v1.Test`.\n",
             )
 
+    def test_index_processes(self):
+        args = [
+            "--original_descriptor_set_file_path=test/testdata/protos/enum/v1/enum_descriptor_set.pb",
+            "--update_descriptor_set_file_path=test/testdata/protos/enum/v1beta1/enum_descriptor_set.pb",
+        ]
+        for extra_args, processes in (([], None), (["--index_processes=2"], 2)):
+            with patch(
+                "proto_bcd.detector.detector.FileSet", wraps=FileSet
+            ) as file_set:
+                result = CliRunner().invoke(detect, args + extra_args)
+            self.assertEqual(result.exit_code, 0)
+            self.assertEqual(
+                [call.kwargs["processes"] for call in file_set.call_args_list],
+                [processes, processes],
+            )
+        result = CliRunner().invoke(detect, args + ["--index_processes=0"])
+        self.assertEqual(result.exit_code, 2)
+
     def test_single_directory_enum_alias(self):
         # Mock the stdout so that the unit test does not
         # print anything to the console.
@@ -217,6 +268,39 @@ class CliDetectTest(unittest.TestCase):
                 self.assertEqual(len(json_obj), 2)
             os.unlink(tmpfile.name)
 
+    def test_single_directory_enum_jsonl(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            jsonl_path = os.path.join(tmp, "findings.jsonl")
+            json_path = os.path.join(tmp, "findings.json")
+            args = [
+                "--original_api_definition_dirs=test/testdata/protos/enum/v1",
+                "--update_api_definition_dirs=test/testdata/protos/enum/v1beta1",
+                "--original_proto_files=test/testdata/protos/enum/v1/enum_v1.proto",
+                "--update_proto_files=test/testdata/protos/enum/v1beta1/enum_v1beta1.proto",
+            ]
+            runner = CliRunner()
+            result = runner.invoke(
+                detect,
+                args + ["--output_json_path=" + jsonl_path, "--output_format=jsonl"],
+                standalone_mode=False,
+            )
+            self.assertEqual(result.exit_code, 0)
+            jsonl_result = result.return_value
+            result = runner.invoke(
+                detect,
+                args + ["--output_json_path=" + json_path],
+                standalone_mode=False,
+            )
+            self.assertEqual(result.exit_code, 0)
+            # The breaking changes are counted, the jsonl findings are not kept.
+            self.assertEqual(jsonl_result, result.return_value)
+            self.assertEqual(jsonl_result, 1)
+            with open(jsonl_path) as jsonl_file:
+                findings = [json.loads(line) for line in jsonl_file]
+            with open(json_path) as json_file:
+                self.assertEqual(findings, json.load(json_file))
+            self.assertEqual(len(findings), 2)
+
     def test_single_directory_message(self):
         with patch("sys.stdout", new=StringIO()):
             runner = CliRunner()
@@ -370,6 +454,26 @@ class CliDetectTest(unittest.TestCase):
                 + "service_annotation_v1beta1.proto L26: Long running operation metadata type is changed from `FooMetadata` to `FooMetadataUpdate` for method `Bar` in service `Example`.\n",
             )
 
+    def test_single_directory_service_annotation_dependency_descriptor_set(self):
+        args = [
+            f"--original_api_definition_dirs=test/testdata/protos/service_annotation/v1,{self.COMMON_PROTOS_DIR}",
+            f"--update_api_definition_dirs=test/testdata/protos/service_annotation/v1beta1,{self.COMMON_PROTOS_DIR}",
+            "--original_proto_files=test/testdata/protos/service_annotation/v1/service_annotation_v1.proto",
+            "--update_proto_files=test/testdata/protos/service_annotation/v1beta1/service_annotation_v1beta1.proto",
+            "--human_readable_message",
+        ]
+        with patch("sys.stdout", new=StringIO()), tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "dependencies.pb")
+            runner = CliRunner()
+            result = runner.invoke(
+                detect, args + [f"--dependency_descriptor_set={path}"]
+            )
+            # The set is built before the descriptor sets are loaded.
+            self.assertTrue(os.path.isfile(path))
+            self.assertTrue(os.path.isfile(path + ".json"))
+            self.assertEqual(result.exit_code, 0)
+            self.assertEqual(result.output, runner.invoke(detect, args).output)
+
     def test_single_directory_method_signature_order(self):
         with patch("sys.stdout", new=StringIO()):
             runner = CliRunner()
@@ -13,6 +13,7 @@
 # limitations under the License.
 
 import unittest
+from unittest import mock
 from test.tools.mock_resources import (
     make_file_options_resource_definition,
     make_message_options_resource_definition,
@@ -670,6 +671,148 @@ class FileSetComparatorTest(unittest.TestCase):
         self.assertEqual(finding.category.name, "MESSAGE_MOVED_TO_ANOTHER_FILE")
         self.assertEqual(finding.change_type.name, "MAJOR")
 
+    def _make_api(self, comment=" A field.\n", line=10):
+        L = descriptor_pb2.SourceCodeInfo.Location
+        request = make_message(
+            "request",
+            fields=(make_field(name="field", number=1, proto_type="TYPE_STRING"),),
+            full_name=".example.v1.request",
+        )
+        response = make_message("response", full_name=".example.v1.response")
+        service = make_service(
+            methods=[
+                make_method(
+                    name="DoThing", input_message=request, output_message=response
+                )
+            ]
+        )
+        enum = make_enum("Color", values=(("RED", 0),), full_name=".example.v1.Color")
+        return make_file_set(
+            files=[
+                make_file_pb2(
+                    messages=[request, response],
+                    services=[service],
+                    enums=[enum],
+                    # The only field of `request` and its comment.
+                    locations=[
+                        L(
+                            path=(4, 0, 2, 0),
+                            span=(line, 2, 20),
+                            leading_comments=comment,
+                        )
+                    ],
+                )
+            ]
+        )
+
+    def test_unchanged_subtrees_are_pruned(self):
+        # Moving the definitions in the file does not change the digests.
+        comparator = FileSetComparator(
+            self._make_api(), self._make_api(line=20), self.finding_container
+        )
+        with mock.patch(
+            "proto_bcd.comparator.file_set_comparator.DescriptorComparator"
+        ) as descriptor_comparator, mock.patch(
+            "proto_bcd.comparator.file_set_comparator.ServiceComparator"
+        ) as service_comparator:
+            comparator.compare()
+        descriptor_comparator.assert_not_called()
+        service_comparator.assert_not_called()
+        self.assertEqual(comparator.pruned, {"services": 1, "messages": 2, "enums": 1})
+        self.assertEqual(self.finding_container.get_all_findings(), [])
+
+    def test_comment_change_is_not_pruned(self):
+        comparator = FileSetComparator(
+            self._make_api(),
+            self._make_api(comment=" An updated field.\n"),
+            self.finding_container,
+        )
+        comparator.compare()
+        # The request message and the service using it are compared.
+        self.assertEqual(comparator.pruned, {"messages": 1, "enums": 1})
+        finding = self.finding_container.get_all_findings()[0]
+        self.assertEqual(finding.category.name, "FIELD_COMMENT_CHANGE")
+
+    def test_pruning_disabled(self):
+        comparator = FileSetComparator(
+            self._make_api(),
+            self._make_api(),
+            self.finding_container,
+            prune_unchanged=False,
+        )
+        with mock.patch(
+            "proto_bcd.comparator.file_set_comparator.DescriptorComparator"
+        ) as descriptor_comparator:
+            comparator.compare()
+        self.assertEqual(descriptor_comparator.call_count, 2)
+        self.assertEqual(comparator.pruned, {})
+
+    def test_types_in_unchanged_files_are_skipped(self):
+        def make_files(field_name):
+            request = make_message(
+                "request",
+                fields=(
+                    make_field(name=field_name, number=1, proto_type="TYPE_STRING"),
+                ),
+                full_name=".example.v1.request",
+            )
+            response = make_message("response", full_name=".example.v1.response")
+            service = make_service(
+                methods=[
+                    make_method(
+                        name="DoThing", input_message=request, output_message=response
+                    )
+                ]
+            )
+            return make_file_set(
+                files=[
+                    make_file_pb2(name="messages.proto", messages=[request, response]),
+                    make_file_pb2(
+                        name="service.proto",
+                        services=[service],
+                        dependency=["messages.proto"],
+                    ),
+                ]
+            )
+
+        # Nothing changed, the digests of the types are not even computed.
+        comparator = FileSetComparator(
+            make_files("field"), make_files("field"), self.finding_container
+        )
+        with mock.patch(
+            "proto_bcd.comparator.wrappers.Message.structural_digest",
+            new_callable=mock.PropertyMock,
+        ) as message_digest:
+            comparator.compare()
+        message_digest.assert_not_called()
+        self.assertEqual(
+            comparator.pruned,
+            {"services": 1, "messages": 2, "in_unchanged_files": 3},
+        )
+        # The request message changed, so the service in the unchanged file
+        # is compared by digest, since its pagination could have changed.
+        comparator = FileSetComparator(
+            make_files("field"), make_files("renamed"), self.finding_container
+        )
+        comparator.compare()
+        self.assertEqual(comparator.pruned, {"messages": 1})
+        finding = self.finding_container.get_all_findings()[0]
+        self.assertEqual(finding.category.name, "FIELD_NAME_CHANGE")
+
+    def test_version_renamed_files_are_compared(self):
+        message = make_message("Message", full_name=".example.Message")
+        comparator = FileSetComparator(
+            make_file_set(
+                files=[make_file_pb2("example/v1/file.proto", messages=[message])]
+            ),
+            make_file_set(
+                files=[make_file_pb2("example/v1beta1/file.proto", messages=[message])]
+            ),
+            self.finding_container,
+        )
+        comparator.compare()
+        self.assertEqual(comparator.pruned["in_unchanged_files"], 0)
+
 
 if __name__ == "__main__":
     unittest.main()
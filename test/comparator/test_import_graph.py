@@ -0,0 +1,123 @@
+# Copyright 2026 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+from google.protobuf import descriptor_pb2
+from proto_bcd.comparator.import_graph import ImportGraph
+
+
+class ImportGraphTest(unittest.TestCase):
+    def setUp(self):
+        FileDescriptorProto = descriptor_pb2.FileDescriptorProto
+        self.graph = ImportGraph(
+            descriptor_pb2.FileDescriptorSet(
+                file=[
+                    FileDescriptorProto(
+                        name="google/api/resource.proto", package="google.api"
+                    ),
+                    FileDescriptorProto(
+                        name="foo/v1/resources.proto",
+                        package="foo.v1",
+                        dependency=["google/api/resource.proto"],
+                    ),
+                    FileDescriptorProto(
+                        name="foo/v1/foo.proto",
+                        package="foo.v1",
+                        dependency=[
+                            "foo/v1/resources.proto",
+                            "google/api/resource.proto",
+                        ],
+                    ),
+                    FileDescriptorProto(
+                        name="foo/v1/bar.proto",
+                        package="foo.v1.bar",
+                        dependency=["foo/v1/resources.proto"],
+                    ),
+                    FileDescriptorProto(
+                        name="google/cloud/common_resources.proto",
+                        package="google.cloud",
+                    ),
+                ]
+            )
+        )
+
+    def test_edges(self):
+        self.assertEqual(
+            self.graph.imports["foo/v1/foo.proto"],
+            ("foo/v1/resources.proto", "google/api/resource.proto"),
+        )
+        self.assertEqual(
+            self.graph.importers["foo/v1/resources.proto"],
+            ["foo/v1/foo.proto", "foo/v1/bar.proto"],
+        )
+        self.assertNotIn("foo/v1/foo.proto", self.graph.importers)
+        self.assertEqual(
+            self.graph.files_by_name["foo/v1/bar.proto"].package, "foo.v1.bar"
+        )
+
+    def test_roots(self):
+        self.assertEqual(
+            self.graph.roots,
+            [
+                "foo/v1/foo.proto",
+                "foo/v1/bar.proto",
+                "google/cloud/common_resources.proto",
+            ],
+        )
+        # The common protos are ignored.
+        self.assertEqual(self.graph.root_package, "foo.v1")
+
+    def test_transitive_imports(self):
+        self.assertEqual(
+            self.graph.transitive_imports("foo/v1/bar.proto"),
+            {"foo/v1/resources.proto", "google/api/resource.proto"},
+        )
+        self.assertEqual(
+            self.graph.transitive_imports("google/api/resource.proto"), set()
+        )
+
+    def test_closure(self):
+        self.assertEqual(
+            self.graph.closure(["foo/v1/bar.proto", "foo/v1/foo.proto"]),
+            {
+                "foo/v1/bar.proto",
+                "foo/v1/foo.proto",
+                "foo/v1/resources.proto",
+                "google/api/resource.proto",
+            },
+        )
+        self.assertEqual(self.graph.closure([]), set())
+
+    def test_transitive_importers(self):
+        self.assertEqual(
+            self.graph.transitive_importers("google/api/resource.proto"),
+            {"foo/v1/resources.proto", "foo/v1/foo.proto", "foo/v1/bar.proto"},
+        )
+        self.assertEqual(self.graph.transitive_importers("foo/v1/foo.proto"), set())
+
+    def test_no_root_package(self):
+        graph = ImportGraph(
+            descriptor_pb2.FileDescriptorSet(
+                file=[
+                    descriptor_pb2.FileDescriptorProto(
+                        name="google/api/resource.proto", package="google.api"
+                    )
+                ]
+            )
+        )
+        self.assertEqual(graph.root_package, "")
+
+
+if __name__ == "__main__":
+    unittest.main()
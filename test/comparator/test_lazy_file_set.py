@@ -0,0 +1,210 @@
+# Copyright 2026 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+from unittest import mock
+from google.protobuf import descriptor_pb2
+from proto_bcd.comparator import lazy_file_set
+from proto_bcd.comparator.file_set_comparator import FileSetComparator
+from proto_bcd.comparator.import_graph import ImportGraph
+from proto_bcd.comparator.lazy_file_set import LazyFileDescriptorSet
+from proto_bcd.comparator.wrappers import FileSet
+from proto_bcd.findings.finding_container import FindingContainer
+
+
+class LazyFileDescriptorSetTest(unittest.TestCase):
+    def setUp(self):
+        self.file_set = descriptor_pb2.FileDescriptorSet()
+        dependency = self.file_set.file.add(
+            name="google/api/resource.proto", package="google.api"
+        )
+        dependency.message_type.add(name="ResourceDescriptor")
+        fd = self.file_set.file.add(
+            name="foo/v1/foo.proto",
+            package="foo.v1",
+            dependency=["google/api/resource.proto"],
+            syntax="proto3",
+        )
+        fd.options.java_package = "com.foo.v1"
+        message = fd.message_type.add(name="Foo")
+        message.field.add(name="id", number=1, type=9, label=1)
+        fd.source_code_info.location.add(
+            path=(4, 0), span=(3, 0, 5, 1), leading_comments=" Foo. "
+        )
+        fd.source_code_info.location.add(path=(4, 0, 2, 0), span=(4, 2, 12))
+        self.data = self.file_set.SerializeToString()
+
+    def test_headers(self):
+        lazy = LazyFileDescriptorSet(self.data)
+        self.assertEqual(len(lazy), 2)
+        self.assertEqual(len(lazy.file), 2)
+        self.assertEqual(
+            [(h.name, h.package, h.dependency) for h in lazy.headers],
+            [
+                ("google/api/resource.proto", "google.api", []),
+                ("foo/v1/foo.proto", "foo.v1", ["google/api/resource.proto"]),
+            ],
+        )
+
+    def test_files_are_decoded_without_source_code_info(self):
+        lazy = LazyFileDescriptorSet(memoryview(self.data))
+        for i, fd in enumerate(self.file_set.file):
+            stripped = descriptor_pb2.FileDescriptorProto()
+            stripped.CopyFrom(fd)
+            stripped.ClearField("source_code_info")
+            self.assertEqual(lazy.file[i], stripped)
+            self.assertEqual(lazy.source_code_info(i), fd.source_code_info)
+        # The decoded files are kept.
+        self.assertIs(lazy.file[1], lazy.file[1])
+        self.assertEqual(list(lazy.file[:1]), [lazy.file[0]])
+
+    def test_split_source_code_info(self):
+        # A message field that occurs more than once on the wire is merged.
+        fd = self.file_set.file[1]
+        first = descriptor_pb2.FileDescriptorProto(name=fd.name)
+        first.source_code_info.location.add(path=(4, 0), span=(3, 0, 5, 1))
+        second = descriptor_pb2.FileDescriptorProto(package=fd.package)
+        second.source_code_info.location.add(path=(8,), span=(1, 0, 10))
+        file_data = first.SerializeToString() + second.SerializeToString()
+        # Serializing a message would merge them, build the set by hand.
+        data = b"\x0a" + bytes([len(file_data)]) + file_data
+        lazy = LazyFileDescriptorSet(data)
+        self.assertEqual(
+            lazy.file[0],
+            descriptor_pb2.FileDescriptorProto(name=fd.name, package=fd.package),
+        )
+        self.assertEqual(
+            lazy.source_code_info(0),
+            descriptor_pb2.FileDescriptorProto.FromString(file_data).source_code_info,
+        )
+
+    def test_unknown_fields(self):
+        fd = descriptor_pb2.FileDescriptorProto(name="foo.proto", package="foo")
+        # Unknown varint, fixed64, fixed32 and group fields, the group with a
+        # nested group of another field number.
+        unknown = (
+            b"\xa0\x06\x96\x01"
+            + b"\xa9\x06"
+            + bytes(8)
+            + b"\xb5\x06"
+            + bytes(4)
+            + b"\xbb\x06\x08\x01\x0b\x10\x02\x0c\xbc\x06"
+        )
+        file_data = fd.SerializeToString() + unknown + b"\x1a\x07bar.pbx"
+        data = b"\x0a" + bytes([len(file_data)]) + file_data
+        lazy = LazyFileDescriptorSet.FromString(data)
+        self.assertEqual(
+            [(h.name, h.package, h.dependency) for h in lazy.headers],
+            [("foo.proto", "foo", ["bar.pbx"])],
+        )
+        # The unknown fields are kept in the decoded file.
+        self.assertEqual(
+            lazy.file[0].SerializeToString(),
+            descriptor_pb2.FileDescriptorProto.FromString(
+                file_data
+            ).SerializeToString(),
+        )
+        self.assertEqual(lazy.serialized(range(0)).nbytes, 0)
+        self.assertEqual(lazy.serialized(range(1)), data)
+
+    def test_malformed_fields(self):
+        for data, error in (
+            (b"\x0e", "Unsupported wire type 6"),
+            (b"\x0a\x05foo", "Truncated"),
+            (b"\x0d\x00", "Truncated"),
+            (b"\x0b\x08\x01", "Truncated"),
+            (b"\x0b\x14", "Unmatched end group 2"),
+        ):
+            with self.assertRaisesRegex(ValueError, error):
+                LazyFileDescriptorSet(data)
+
+    def test_import_graph_does_not_decode_files(self):
+        lazy = LazyFileDescriptorSet(self.data)
+        with mock.patch.object(
+            lazy_file_set._LazyFiles,
+            "_decode",
+            autospec=True,
+            side_effect=lazy_file_set._LazyFiles._decode,
+        ) as decode:
+            graph = ImportGraph(lazy)
+            self.assertEqual(graph.roots, ["foo/v1/foo.proto"])
+            self.assertEqual(graph.root_package, "foo.v1")
+            decode.assert_not_called()
+            self.assertEqual(graph.files_by_name["foo/v1/foo.proto"].package, "foo.v1")
+            self.assertEqual(decode.call_count, 2)
+
+    def test_source_code_info_is_decoded_on_lookup(self):
+        lazy = LazyFileDescriptorSet(self.data)
+        with mock.patch.object(
+            LazyFileDescriptorSet,
+            "source_code_info",
+            autospec=True,
+            side_effect=LazyFileDescriptorSet.source_code_info,
+        ) as source_code_info:
+            file_set = FileSet(lazy)
+            source_code_info.assert_not_called()
+            message = file_set.messages_map[".foo.v1.Foo"]
+            self.assertEqual(message.source_code_line, 4)
+            self.assertEqual(message.fields[1].source_code_line, 5)
+            source_code_info.assert_called_once_with(lazy, 1)
+
+    def test_file_digest(self):
+        eager = FileSet(self.file_set)
+        lazy = FileSet(LazyFileDescriptorSet(self.data))
+        name = "foo/v1/foo.proto"
+        self.assertEqual(
+            lazy.file_digest(name, include_source_code_info=False),
+            eager.file_digest(name, include_source_code_info=False),
+        )
+        self.file_set.file[1].source_code_info.location[0].span[0] = 2
+        moved = FileSet(LazyFileDescriptorSet(self.file_set.SerializeToString()))
+        self.assertNotEqual(moved.file_digest(name), lazy.file_digest(name))
+        self.assertEqual(
+            moved.file_digest(name, include_source_code_info=False),
+            lazy.file_digest(name, include_source_code_info=False),
+        )
+        self.assertIsNone(lazy.file_digest("bar.proto"))
+
+    def test_same_findings_as_eager_file_set(self):
+        def findings(original, update):
+            finding_container = FindingContainer()
+            FileSetComparator(
+                FileSet(original), FileSet(update), finding_container
+            ).compare()
+            return sorted(
+                str(f.to_dict()) for f in finding_container.get_all_findings()
+            )
+
+        sets = []
+        for version in ("v1", "v1beta1"):
+            path = f"test/testdata/protos/enum/{version}/enum_descriptor_set.pb"
+            with open(path, "rb") as f:
+                sets.append(f.read())
+        eager = findings(
+            *(descriptor_pb2.FileDescriptorSet.FromString(d) for d in sets)
+        )
+        self.assertTrue(eager)
+        self.assertEqual(findings(*(LazyFileDescriptorSet(d) for d in sets)), eager)
+        # A lazy set can be compared with an eager one.
+        self.assertEqual(
+            findings(
+                descriptor_pb2.FileDescriptorSet.FromString(sets[0]),
+                LazyFileDescriptorSet(sets[1]),
+            ),
+            eager,
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -14,6 +14,7 @@
 
 import unittest
 import os
+from unittest import mock
 from google.api import resource_pb2
 from proto_bcd.comparator.resource_database import ResourceDatabase
 from test.tools.mock_resources import make_resource_descriptor
@@ -109,6 +110,27 @@ class ResourceDatabaseTest(unittest.TestCase):
         )
         self.assertFalse(parent_resources)
 
+    def test_register_pending_resources_on_miss(self):
+        registered = make_resource_descriptor(
+            resource_type="registered", resource_patterns=["a"]
+        )
+        pending = make_resource_descriptor(
+            resource_type="pending", resource_patterns=["b"]
+        )
+        register_pending = mock.Mock(
+            side_effect=lambda: database.register_resource(pending)
+        )
+        database = ResourceDatabase(register_pending)
+        database.register_resource(registered)
+        # The queries that hit do not register the pending resources.
+        self.assertEqual(database.get_resource_by_type("registered"), registered)
+        self.assertEqual(database.get_resource_by_pattern("a"), registered)
+        register_pending.assert_not_called()
+        self.assertEqual(database.get_resource_by_pattern("b"), pending)
+        self.assertEqual(database.get_resource_by_type("pending"), pending)
+        self.assertIsNone(database.get_resource_by_type("non-existing"))
+        register_pending.assert_called_once_with()
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -13,7 +13,9 @@
 # limitations under the License.
 
 import unittest
+from unittest import mock
 from test.tools.mock_descriptors import make_enum
+from proto_bcd.comparator import wrappers
 from google.protobuf import descriptor_pb2
 
 
@@ -63,6 +65,37 @@ class EnumTest(unittest.TestCase):
         )
         self.assertEqual(enum.path, (4, 0))
 
+    def test_values_are_built_once(self):
+        enum_type = make_enum(name="Irrelevant", values=(("RED", 1), ("GREEN", 2)))
+        with mock.patch.object(
+            wrappers, "EnumValue", wraps=wrappers.EnumValue
+        ) as enum_value_cls:
+            for _ in range(3):
+                self.assertIs(enum_type.values, enum_type.values)
+        self.assertEqual(enum_value_cls.call_count, 2)
+        # The memoized values do not take part in the dataclass equality.
+        self.assertEqual(
+            enum_type, make_enum(name="Irrelevant", values=(("RED", 1), ("GREEN", 2)))
+        )
+
+    def test_structural_digest(self):
+        L = descriptor_pb2.SourceCodeInfo.Location
+
+        def digest(value_name="RED", span=(1, 0, 5), comment=""):
+            return make_enum(
+                name="Color",
+                values=((value_name, 1),),
+                locations=[L(path=(2, 0), span=span, leading_comments=comment)],
+                path=(),
+            ).structural_digest
+
+        self.assertEqual(digest(), digest())
+        # Source locations are ignored.
+        self.assertEqual(digest(), digest(span=(7, 0, 5)))
+        # Values and their comments are part of the digest.
+        self.assertNotEqual(digest(), digest(value_name="BLUE"))
+        self.assertNotEqual(digest(), digest(comment=" A comment.\n"))
+
 
 if __name__ == "__main__":
     unittest.main()
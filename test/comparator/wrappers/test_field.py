@@ -12,9 +12,13 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import os
+import tracemalloc
 import unittest
+from unittest import mock
+from proto_bcd.comparator import wrappers
 from proto_bcd.comparator.wrappers import get_location
-from test.tools.mock_descriptors import make_field
+from test.tools.mock_descriptors import make_field, make_message
 from google.protobuf import descriptor_pb2
 from google.api.field_info_pb2 import FieldInfo
 from google.api import resource_pb2
@@ -93,6 +97,29 @@ class FieldTest(unittest.TestCase):
         self.assertEqual(field.resource_reference.value.child_type, "foo/{foo}")
         self.assertEqual(field.child_type, True)
 
+    def test_options_are_decoded_once(self):
+        options = descriptor_pb2.FieldOptions()
+        options.Extensions[resource_pb2.resource_reference].type = "foo/Foo"
+        field = make_field(required=True, options=options, format=FieldInfo.UUID4)
+        with mock.patch.object(
+            wrappers._FieldOptions, "decode", wraps=wrappers._FieldOptions.decode
+        ) as decode:
+            for _ in range(3):
+                self.assertTrue(field.required.value)
+                self.assertEqual(field.fieldInfo.value.format, FieldInfo.UUID4)
+                self.assertEqual(field.resource_reference.value.type, "foo/Foo")
+                self.assertFalse(field.child_type)
+        self.assertEqual(decode.call_count, 1)
+
+    def test_no_options(self):
+        field = make_field(proto_type="TYPE_STRING")
+        self.assertFalse(field.field_pb.HasField("options"))
+        self.assertEqual(field.required.value, False)
+        self.assertEqual(field.fieldInfo.value.format, FieldInfo.FORMAT_UNSPECIFIED)
+        self.assertIsNone(field.resource_reference)
+        self.assertFalse(field.child_type)
+        self.assertEqual(field.proto_type.value, "string")
+
     def test_format(self):
         field = make_field(format=FieldInfo.UUID4)
         self.assertEqual(field.fieldInfo.value.format, FieldInfo.UUID4)
@@ -130,6 +157,77 @@ class FieldTest(unittest.TestCase):
         self.assertEqual(map_field.map_entry_type["key"], "string")
         self.assertEqual(map_field.map_entry_type["value"], ".example.foo")
 
+    def test_wrapped_fields_share_file_context(self):
+        # The fields only have their slots, and share the information of the
+        # file and the nested path of their message.
+        message = make_message(
+            "Wide",
+            fields=[make_field(name=f"field_{i}", number=i + 1) for i in range(100)],
+            nested_path=["message Wide {"],
+            api_version="v1",
+        )
+        fields = list(message.fields.values())
+        self.assertEqual(len(fields), 100)
+        for field in fields:
+            with self.assertRaises(AttributeError):
+                object.__setattr__(field, "extra", None)
+            self.assertIs(field._file, fields[0]._file)
+            self.assertEqual(field.api_version, "v1")
+        self.assertEqual(message.fields[1].nested_path, ["message Wide {", "field_0"])
+
+    @unittest.skipUnless(
+        os.environ.get("PROTO_BCD_BENCHMARKS"),
+        "Benchmark, set PROTO_BCD_BENCHMARKS=1 to run it.",
+    )
+    def test_memory_per_wrapped_field(self):
+        # Compare the bytes per wrapped field against the dict-backed layout
+        # the wrappers used before, where every field held its own references
+        # to the file information and its own copy of the nested path.
+        class DictBackedField:
+            def __init__(self, **kwargs):
+                self.__dict__.update(kwargs)
+
+        count = 2000
+        message = make_message(
+            "Wide",
+            fields=[make_field(name=f"field_{i}", number=i + 1) for i in range(count)],
+            nested_path=["message Wide {"],
+            api_version="v1",
+        )
+
+        def measure(build):
+            tracemalloc.start()
+            try:
+                before = tracemalloc.get_traced_memory()[0]
+                wrapped = build()
+                return (tracemalloc.get_traced_memory()[0] - before) / len(wrapped)
+            finally:
+                tracemalloc.stop()
+
+        dict_backed = measure(
+            lambda: {
+                field_pb.number: DictBackedField(
+                    field_pb=field_pb,
+                    proto_file_name=message.proto_file_name,
+                    source_code_locations=message.source_code_locations,
+                    path=message.path + (2, i),
+                    resource_database=message.resource_database,
+                    message_resource=None,
+                    api_version=message.api_version,
+                    map_entry=None,
+                    oneof_name=None,
+                    nested_path=message.nested_path + [field_pb.name],
+                )
+                for i, field_pb in enumerate(message.message_pb.field)
+            }
+        )
+        slotted = measure(lambda: message.fields)
+        print(
+            f"\nBytes per wrapped field: {dict_backed:.0f} (dict-backed) -> "
+            f"{slotted:.0f} (slots)"
+        )
+        self.assertLess(slotted, dict_backed)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -12,7 +12,10 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import os
+import time
 import unittest
+from unittest import mock
 from test.tools.mock_descriptors import (
     make_file_set,
     make_service,
@@ -25,7 +28,9 @@ from test.tools.mock_descriptors import (
 from google.api import resource_pb2
 from google.protobuf import descriptor_pb2
 
-from proto_bcd.comparator.wrappers import FileSet
+from proto_bcd.comparator import wrappers
+from proto_bcd.comparator.lazy_file_set import LazyFileDescriptorSet
+from proto_bcd.comparator.wrappers import FileSet, get_location
 
 
 class FileSetTest(unittest.TestCase):
@@ -227,6 +232,211 @@ class FileSetTest(unittest.TestCase):
             10,
         )
 
+    def test_file_set_source_code_index(self):
+        L = descriptor_pb2.SourceCodeInfo.Location
+        locations = [
+            L(path=(4, 0), span=(2, 0, 8, 1), leading_comments=" The message.\n"),
+            L(path=(4, 0, 2, 0), span=(4, 2, 30), trailing_comments=" A field.\n"),
+        ]
+        message = make_message("Message", fields=(make_field(name="field", number=1),))
+        file_set = make_file_set(
+            files=[make_file_pb2(messages=[message], locations=locations)]
+        )
+        message = file_set.messages_map[".example.v1.Message"]
+        # The file is only indexed once one of its locations is looked up.
+        index = file_set._file_contexts[message.proto_file_name].source_code_locations
+        self.assertIsInstance(index, wrappers._LazySourceCodeIndex)
+        self.assertIsNotNone(index._load)
+        self.assertEqual(message.source_code_line, 3)
+        self.assertIsNone(index._load)
+        self.assertEqual(message.fields[1].source_code_line, 5)
+        self.assertEqual(get_location(message).leading_comments, " The message.\n")
+        self.assertEqual(
+            get_location(message.fields[1]).trailing_comments, " A field.\n"
+        )
+        # Unknown paths have no line and an empty location.
+        self.assertEqual(message.fields[1].proto_type.source_code_line, -1)
+        self.assertEqual(get_location(message.fields[1].proto_type), L())
+
+    def test_lazy_source_code_index(self):
+        L = descriptor_pb2.SourceCodeInfo.Location
+        locations = [
+            L(path=(4, 0), span=(2, 0, 8, 1), leading_comments=" The message.\n"),
+            L(path=(4, 0, 2, 0), span=(4, 2, 30)),
+        ]
+        message = make_message("Message", fields=(make_field(name="field", number=1),))
+        file_set_pb = descriptor_pb2.FileDescriptorSet(
+            file=[make_file_pb2(messages=[message], locations=locations)]
+        )
+        lazy = LazyFileDescriptorSet(file_set_pb.SerializeToString())
+        with mock.patch.object(
+            lazy, "source_code_info", wraps=lazy.source_code_info
+        ) as source_code_info:
+            file_set = FileSet(lazy)
+            message = file_set.messages_map[".example.v1.Message"]
+            index = file_set._file_contexts[
+                message.proto_file_name
+            ].source_code_locations
+            self.assertIsInstance(index, wrappers._LazySourceCodeIndex)
+            # The source_code_info is decoded once, on the first lookup.
+            source_code_info.assert_not_called()
+            self.assertEqual(message.source_code_line, 3)
+            self.assertEqual(message.fields[1].source_code_line, 5)
+            self.assertEqual(get_location(message).leading_comments, " The message.\n")
+            self.assertEqual(len(index), 2)
+            self.assertNotIn((4, 1), index)
+            source_code_info.assert_called_once_with(0)
+
+    def test_lazy_set_indexes_imported_files(self):
+        # The common resources are in the set, but the API does not import
+        # them, nor the file that they import.
+        common_options = descriptor_pb2.FileOptions()
+        common_options.Extensions[resource_pb2.resource_definition].add(
+            type="cloudresourcemanager.googleapis.com/Project",
+            pattern=["projects/{project}"],
+        )
+        file_type = make_file_pb2(
+            name="google/type/unused.proto",
+            package="google.type",
+            messages=[make_message("Unused")],
+        )
+        file_common = make_file_pb2(
+            name="google/cloud/common_resources.proto",
+            package="google.cloud",
+            messages=[make_message("Common")],
+            enums=[make_enum("CommonEnum")],
+            options=common_options,
+            dependency=[file_type.name],
+        )
+        file_dep = make_file_pb2(
+            name="dep.proto",
+            package="example.common",
+            messages=[make_message("Used")],
+            enums=[make_enum("Kind")],
+        )
+        request_options = descriptor_pb2.MessageOptions()
+        request_resource = request_options.Extensions[resource_pb2.resource]
+        request_resource.type = "example/Request"
+        request_resource.pattern.append("requests/{request}")
+        file_api = make_file_pb2(
+            name="api.proto",
+            package="example.v1",
+            messages=[
+                make_message(
+                    "Request",
+                    fields=[
+                        make_field(name="used", type_name=".example.common.Used"),
+                        make_field(
+                            name="kind",
+                            number=2,
+                            proto_type="TYPE_ENUM",
+                            type_name=".example.common.Kind",
+                        ),
+                    ],
+                    options=request_options,
+                )
+            ],
+            dependency=[file_dep.name],
+        )
+        file_set_pb = descriptor_pb2.FileDescriptorSet(
+            file=[file_type, file_common, file_dep, file_api]
+        )
+        eager = FileSet(file_set_pb)
+        lazy = LazyFileDescriptorSet(file_set_pb.SerializeToString())
+        file_set = FileSet(lazy)
+        self.assertEqual(file_set.root_package, "example.v1")
+        self.assertEqual(lazy.file._files[:2], [None, None])
+        self.assertEqual(
+            list(file_set.messages_map),
+            [".example.v1.Request", ".example.common.Used"],
+        )
+        self.assertEqual(list(file_set.enums_map), [".example.common.Kind"])
+        # A message is also looked up in the enums, that is not a miss.
+        self.assertNotIn(".example.v1.Request", file_set.global_enums_map)
+        self.assertEqual(
+            file_set.resources_database.get_resource_by_type("example/Request").path,
+            (4, 0, 7, 1053),
+        )
+        self.assertEqual(lazy.file._files[:2], [None, None])
+        # The missing types are looked up in the files of their package.
+        self.assertIn(".google.cloud.Common", file_set.global_messages_map)
+        self.assertEqual(
+            file_set.global_enums_map[".google.cloud.CommonEnum"].path, (5, 0)
+        )
+        self.assertIsNone(lazy.file._files[0])
+        # A missing resource registers the resources of every file.
+        self.assertEqual(
+            file_set.resources_database.get_resource_by_type(
+                "cloudresourcemanager.googleapis.com/Project"
+            ).proto_file_name,
+            "google/cloud/common_resources.proto",
+        )
+        self.assertIsNotNone(lazy.file._files[0])
+        self.assertEqual(
+            list(file_set.resources_database.types),
+            list(eager.resources_database.types),
+        )
+        self.assertEqual(
+            list(file_set.global_messages_map), list(eager.global_messages_map)
+        )
+        self.assertEqual(list(file_set.global_enums_map), list(eager.global_enums_map))
+        self.assertNotIn(".google.cloud.Missing", file_set.global_messages_map)
+
+    def test_source_code_index_hash_collisions(self):
+        L = descriptor_pb2.SourceCodeInfo.Location
+        # The tuples (-1,) and (-2,) have the same hash.
+        self.assertEqual(hash((-1,)), hash((-2,)))
+        index = wrappers._SourceCodeIndex(
+            descriptor_pb2.SourceCodeInfo(
+                location=[
+                    L(path=(-1,), span=(1, 0, 1)),
+                    L(path=(-2,), span=(2, 0, 1)),
+                    L(path=(4, 0), span=(3, 0, 1)),
+                    L(path=(4, 0), span=(4, 0, 1)),
+                ]
+            )
+        )
+        self.assertEqual(index.line((-1,)), 1)
+        self.assertEqual(index.line((-2,)), 2)
+        # The last location of a repeated path wins, as in a dict.
+        self.assertEqual(index.line((4, 0)), 4)
+        self.assertEqual(index[(4, 0)].span, [4, 0, 1])
+        self.assertNotIn((4, 1), index)
+        self.assertEqual(index.line((4, 1)), -1)
+        with self.assertRaises(KeyError):
+            index[(4, 1)]
+
+    def test_file_digest(self):
+        L = descriptor_pb2.SourceCodeInfo.Location
+
+        def make(comment, span=(1, 0, 5)):
+            return make_file_set(
+                files=[
+                    make_file_pb2(
+                        name="foo.proto",
+                        messages=[make_message("Foo")],
+                        locations=[L(path=(4, 0), span=span, leading_comments=comment)],
+                    )
+                ]
+            )
+
+        file_set = make(" Foo.\n")
+        self.assertEqual(
+            file_set.file_digest("foo.proto"), make(" Foo.\n").file_digest("foo.proto")
+        )
+        self.assertIsNone(file_set.file_digest("bar.proto"))
+        # Without the source code information, only the definitions count.
+        self.assertNotEqual(
+            file_set.file_digest("foo.proto"),
+            make(" Bar.\n", span=(2, 0, 5)).file_digest("foo.proto"),
+        )
+        self.assertEqual(
+            file_set.file_digest("foo.proto", include_source_code_info=False),
+            make(" Bar.\n", span=(2, 0, 5)).file_digest(
+                "foo.proto", include_source_code_info=False
+            ),
+        )
+
     def test_file_set_packaging_options(self):
         option1 = descriptor_pb2.FileOptions()
         option1.java_package = "com.google.example.v1"
@@ -362,6 +572,12 @@ class FileSetTest(unittest.TestCase):
         self.assertEqual(
             [f.name for f in file_set.definition_files], ["proto2", "proto3"]
         )
+        # The import graph is exposed for the stages that query the imports.
+        self.assertEqual(file_set.import_graph.roots, ["proto3"])
+        self.assertEqual(
+            file_set.import_graph.transitive_imports("proto3"),
+            {"proto2", "proto1", "dep1", "dep2"},
+        )
         # If the files are totally not related, the root_package will be the first file package.
         file_set = make_file_set(files=[dep1, dep2])
         self.assertEqual(file_set.root_package, "example.external")
@@ -404,6 +620,216 @@ class FileSetTest(unittest.TestCase):
             "",
         )
 
+    def test_dependency_types_are_wrapped_on_demand(self):
+        # The API uses one message from a dependency with a hundred messages
+        # and enums.
+        used = make_message(
+            "Used",
+            nested_messages=[make_message("Inner")],
+            nested_enums=[make_enum("Kind", values=(("KIND_UNSPECIFIED", 0),))],
+            full_name=".example.common.Used",
+        )
+        unused_messages = [
+            make_message(f"Unused{i}", full_name=f".example.common.Unused{i}")
+            for i in range(100)
+        ]
+        unused_enums = [
+            make_enum(f"UnusedEnum{i}", full_name=f".example.common.UnusedEnum{i}")
+            for i in range(100)
+        ]
+        file_common = make_file_pb2(
+            name="common.proto",
+            package="example.common",
+            messages=[used] + unused_messages,
+            enums=unused_enums,
+        )
+        request = make_message(
+            "Request",
+            fields=[make_field(name="used", type_name=".example.common.Used")],
+        )
+        file_api = make_file_pb2(
+            name="api.proto",
+            package="example.v1",
+            messages=[request],
+            dependency=["common.proto"],
+        )
+        with mock.patch.object(
+            wrappers.Message, "_in_file", wraps=wrappers.Message._in_file
+        ) as wrap_message, mock.patch.object(
+            wrappers, "Enum", wraps=wrappers.Enum
+        ) as wrap_enum:
+            file_set = make_file_set(files=[file_common, file_api])
+        self.assertEqual(
+            list(file_set.messages_map.keys()),
+            [".example.v1.Request", ".example.common.Used"],
+        )
+        # Only the request message and the referenced message are wrapped.
+        self.assertEqual(wrap_message.call_count, 2)
+        self.assertEqual(wrap_enum.call_count, 0)
+        # The other types can still be looked up.
+        self.assertEqual(len(file_set.global_messages_map), 103)
+        self.assertEqual(len(file_set.global_enums_map), 101)
+        self.assertIn(".example.common.Unused42", file_set.global_messages_map)
+        self.assertEqual(
+            file_set.global_enums_map[".example.common.UnusedEnum7"].path, (5, 7)
+        )
+        # Nested types share the wrappers of their parent message.
+        used_message = file_set.global_messages_map[".example.common.Used"]
+        self.assertIs(
+            file_set.global_messages_map[".example.common.Used.Inner"],
+            used_message.nested_messages["Inner"],
+        )
+        self.assertIs(
+            file_set.global_enums_map[".example.common.Used.Kind"],
+            used_message.nested_enums["Kind"],
+        )
+        # Also once the collections of the parent are evicted.
+        wrappers.set_collection_cache_size(1)
+        try:
+            used_message.fields
+            for i in range(3):
+                file_set.global_messages_map[f".example.common.Unused{i}"].fields
+            self.assertIs(
+                file_set.global_messages_map[".example.common.Used.Inner"],
+                used_message.nested_messages["Inner"],
+            )
+        finally:
+            wrappers.set_collection_cache_size(None)
+
+    def test_files_are_traversed_once(self):
+        dependencies, file_api = _make_files_with_resources()
+        with mock.patch.object(
+            wrappers, "_index_file", side_effect=wrappers._index_file
+        ) as index_file:
+            file_set = make_file_set(files=dependencies + [file_api])
+        # One traversal per file fills the resource databases, the type maps
+        # and the packaging options.
+        self.assertEqual(index_file.call_count, len(dependencies) + 1)
+        self.assertEqual(len(file_set.global_messages_map), 100 * 50 * 2 + 1)
+        self.assertEqual(len(file_set.global_enums_map), 100 * 50)
+        self.assertEqual(len(file_set.resources_database.types), 100 * 50 + 1)
+        self.assertEqual(
+            file_set.resources_database.types["dep3/Res7"].path, (4, 7, 3, 0, 7, 1053)
+        )
+        self.assertEqual(
+            list(file_set.used_resources_database.types.keys()), ["example/Foo"]
+        )
+
+    @unittest.skipUnless(
+        os.environ.get("PROTO_BCD_BENCHMARKS"),
+        "Benchmark, set PROTO_BCD_BENCHMARKS=1 to run it.",
+    )
+    def test_wall_time_of_file_set(self):
+        dependencies, file_api = _make_files_with_resources()
+        with mock.patch.object(
+            wrappers, "_index_file", side_effect=wrappers._index_file
+        ) as index_file:
+            start = time.perf_counter()
+            file_set = make_file_set(files=dependencies + [file_api])
+            elapsed = time.perf_counter() - start
+        print(f"\nFileSet of {len(dependencies) + 1} files built in {elapsed:.3f}s")
+        self.assertEqual(index_file.call_count, len(dependencies) + 1)
+        self.assertEqual(len(file_set.resources_database.types), 100 * 50 + 1)
+
+    def test_files_are_indexed_in_this_process_by_default(self):
+        dependencies, file_api = _make_files_with_resources()
+        data = descriptor_pb2.FileDescriptorSet(
+            file=dependencies + [file_api]
+        ).SerializeToString()
+        with mock.patch.object(
+            FileSet, "PARALLEL_INDEX_MIN_BYTES", 0
+        ), mock.patch.object(
+            wrappers.concurrent.futures,
+            "ProcessPoolExecutor",
+            side_effect=AssertionError("Process pool"),
+        ):
+            file_set = FileSet(LazyFileDescriptorSet(data))
+        self.assertEqual(file_set.root_package, "example.v1")
+
+    def test_files_are_indexed_in_processes(self):
+        dependencies, file_api = _make_files_with_resources()
+        file_api.options.java_package = "com.example.v1"
+        data = descriptor_pb2.FileDescriptorSet(
+            file=dependencies + [file_api]
+        ).SerializeToString()
+        serial = FileSet(LazyFileDescriptorSet(data), processes=1)
+        with mock.patch.object(FileSet, "PARALLEL_INDEX_MIN_BYTES", 0):
+            lazy = LazyFileDescriptorSet(data)
+            parallel = FileSet(lazy, processes=2)
+        # The files that define no used type are not decoded in this process.
+        self.assertEqual(lazy.file._files.count(None), len(dependencies))
+        self.assertEqual(parallel.root_package, "example.v1")
+        self.assertEqual(
+            list(parallel.global_messages_map), list(serial.global_messages_map)
+        )
+        self.assertEqual(list(parallel.global_enums_map), list(serial.global_enums_map))
+        for database in ("resources_database", "used_resources_database"):
+            self.assertEqual(
+                {
+                    resource_type: (resource.value, resource.path)
+                    for resource_type, resource in getattr(
+                        parallel, database
+                    ).types.items()
+                },
+                {
+                    resource_type: (resource.value, resource.path)
+                    for resource_type, resource in getattr(
+                        serial, database
+                    ).types.items()
+                },
+            )
+        self.assertEqual(
+            parallel.packaging_options_map["java_package"]["com.example.v1"].path,
+            (8, 1),
+        )
+        for include_source_code_info in (False, True):
+            self.assertEqual(
+                parallel.file_digest("dep3.proto", include_source_code_info),
+                serial.file_digest("dep3.proto", include_source_code_info),
+            )
+        nested = parallel.global_messages_map[".example.dep3.Message7.Nested"]
+        self.assertEqual(nested.path, (4, 7, 3, 0))
+        self.assertEqual(nested.resource.value.type, "dep3/Res7")
+
+
+def _make_files_with_resources():
+    # A large set of dependencies with resources in nested messages, and an
+    # API file that imports them.
+    def resource_options(resource_type):
+        options = descriptor_pb2.MessageOptions()
+        resource = options.Extensions[resource_pb2.resource]
+        resource.type = resource_type
+        resource.pattern.append(resource_type.split("/")[1].lower() + "/{id}")
+        return options
+
+    dependencies = [
+        make_file_pb2(
+            name=f"dep{i}.proto",
+            package=f"example.dep{i}",
+            messages=[
+                make_message(
+                    f"Message{j}",
+                    nested_messages=[
+                        make_message(
+                            "Nested",
+                            options=resource_options(f"dep{i}/Res{j}"),
+                        )
+                    ],
+                    nested_enums=[make_enum("Kind")],
+                )
+                for j in range(50)
+            ],
+        )
+        for i in range(100)
+    ]
+    file_api = make_file_pb2(
+        name="api.proto",
+        package="example.v1",
+        messages=[make_message("Foo", options=resource_options("example/Foo"))],
+        dependency=[f.name for f in dependencies],
+    )
+    return dependencies, file_api
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -13,6 +13,7 @@
 # limitations under the License.
 
 import unittest
+from unittest import mock
 from test.tools.mock_descriptors import make_message, make_field, make_enum, make_oneof
 from proto_bcd.comparator import wrappers
 from google.protobuf import descriptor_pb2
@@ -167,6 +168,141 @@ class MessageTest(unittest.TestCase):
         self.assertEqual(message.source_code_line, 2)
         self.assertEqual(message.proto_file_name, "test.proto")
 
+    def test_collections_are_built_once(self):
+        inner_msg = [
+            make_message("InnerMessage"),
+            make_message(
+                "FieldEntry",
+                fields=(make_field(name="key"), make_field(name="value", number=2)),
+                map_entry=True,
+            ),
+        ]
+        message = make_message(
+            "Outer",
+            fields=(
+                make_field(name="field", type_name="FieldEntry", repeated=True),
+                make_field(name="other", number=2, oneof_index=0),
+            ),
+            oneofs=(make_oneof(name="choice"),),
+            nested_enums=(make_enum(name="InnerEnum"),),
+            nested_messages=inner_msg,
+        )
+        with mock.patch.object(
+            wrappers.Field, "_in_file", wraps=wrappers.Field._in_file
+        ) as make_field_in_file, mock.patch.object(
+            wrappers.Message, "_in_file", wraps=wrappers.Message._in_file
+        ) as make_message_in_file, mock.patch.object(
+            wrappers, "Enum", wraps=wrappers.Enum
+        ) as enum_cls, mock.patch.object(
+            wrappers, "Oneof", wraps=wrappers.Oneof
+        ) as oneof_cls:
+            for _ in range(3):
+                self.assertIs(message.fields, message.fields)
+                self.assertIs(message.nested_messages, message.nested_messages)
+                self.assertIs(message.map_entries, message.map_entries)
+                self.assertIs(message.oneofs, message.oneofs)
+                self.assertIs(message.nested_enums, message.nested_enums)
+        # Two fields, plus the key and value fields of the map entry.
+        self.assertEqual(make_field_in_file.call_count, 4)
+        self.assertEqual(make_message_in_file.call_count, 1)
+        self.assertEqual(enum_cls.call_count, 1)
+        self.assertEqual(oneof_cls.call_count, 1)
+
+    def test_wide_message_index_is_built_once(self):
+        entries = [
+            make_message(
+                f"Field{i}Entry",
+                fields=(make_field(name="key"), make_field(name="value", number=2)),
+                map_entry=True,
+            )
+            for i in range(200)
+        ]
+        fields = [
+            make_field(
+                name=f"field_{i}",
+                number=i + 1,
+                type_name=f"Field{i}Entry",
+                repeated=True,
+                oneof_index=0 if i % 2 else None,
+            )
+            for i in range(200)
+        ]
+        message = make_message(
+            "Wide",
+            fields=fields,
+            oneofs=(make_oneof(name="choice"),),
+            nested_messages=entries,
+        )
+        with mock.patch.object(
+            wrappers, "_MessageIndex", wraps=wrappers._MessageIndex
+        ) as index_cls:
+            self.assertEqual(len(message.fields), 200)
+            self.assertIsNone(message.resource)
+            self.assertEqual(len(message.map_entries), 200)
+        self.assertEqual(index_cls.call_count, 1)
+        self.assertEqual(message.fields[2].oneof_name, "choice")
+        self.assertIsNone(message.fields[1].oneof_name)
+        self.assertIs(message.fields[10].map_entry, message.map_entries["Field9Entry"])
+
+    def test_bounded_collection_cache(self):
+        first = make_message("First", fields=(make_field(name="a"),))
+        second = make_message("Second", fields=(make_field(name="b"),))
+        wrappers.set_collection_cache_size(1)
+        try:
+            first_fields = first.fields
+            self.assertIs(first.fields, first_fields)
+            # Building the collections of the second message evicts the first.
+            second_fields = second.fields
+            self.assertIs(second.fields, second_fields)
+            self.assertIsNot(first.fields, first_fields)
+            self.assertEqual(first.fields[1].name, "a")
+        finally:
+            wrappers.set_collection_cache_size(None)
+        with self.assertRaises(ValueError):
+            wrappers.set_collection_cache_size(0)
+
+    def test_bounded_collection_cache_keeps_nested_types(self):
+        outer = make_message(
+            "Outer",
+            fields=(make_field(name="a"),),
+            nested_messages=(make_message("Inner"),),
+            nested_enums=(make_enum("Kind"),),
+        )
+        other = make_message("Other", fields=(make_field(name="b"),))
+        wrappers.set_collection_cache_size(1)
+        try:
+            inner = outer.nested_messages["Inner"]
+            kind = outer.nested_enums["Kind"]
+            fields = outer.fields
+            # The other collections of the outer message are evicted, the
+            # nested types stay the same wrappers.
+            other.fields
+            self.assertIsNot(outer.fields, fields)
+            self.assertIs(outer.nested_messages["Inner"], inner)
+            self.assertIs(outer.nested_enums["Kind"], kind)
+        finally:
+            wrappers.set_collection_cache_size(None)
+
+    def test_structural_digest(self):
+        L = descriptor_pb2.SourceCodeInfo.Location
+
+        def digest(field_name="field", span=(1, 0, 5), comment="", nested="Inner"):
+            return make_message(
+                "Message",
+                fields=[make_field(name=field_name)],
+                nested_messages=[make_message(nested)],
+                locations=[L(path=(2, 0), span=span, leading_comments=comment)],
+                path=(),
+            ).structural_digest
+
+        self.assertEqual(digest(), digest())
+        # Source locations are ignored.
+        self.assertEqual(digest(), digest(span=(7, 0, 5)))
+        # Fields, nested messages and comments are part of the digest.
+        self.assertNotEqual(digest(), digest(field_name="renamed"))
+        self.assertNotEqual(digest(), digest(nested="Renamed"))
+        self.assertNotEqual(digest(), digest(comment=" A comment.\n"))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -13,6 +13,8 @@
 # limitations under the License.
 
 import unittest
+from unittest import mock
+from proto_bcd.comparator import wrappers
 from test.tools.mock_descriptors import make_method, make_message, make_field
 
 
@@ -96,6 +98,10 @@ class MethodTest(unittest.TestCase):
         )
         self.assertEqual(method.paged_result_field.name, "repeated_field")
         self.assertEqual(method.longrunning, False)
+        # The paged result field and the request/response fields are only
+        # looked up once.
+        self.assertIs(method.paged_result_field, method.paged_result_field)
+        self.assertIs(response_message.fields, response_message.fields)
 
     def test_method_no_page_field(self):
         # No repeated field in the response message.
@@ -160,6 +166,9 @@ class MethodTest(unittest.TestCase):
     def test_method_signatures(self):
         method = make_method("Method", signatures=["sig1", "sig2"])
         self.assertEqual(method.method_signatures.value, [("sig1",), ("sig2",)])
+        # A change to the returned list is not seen by the next caller.
+        method.method_signatures.value.append(("sig3",))
+        self.assertEqual(method.method_signatures.value, [("sig1",), ("sig2",)])
 
     def test_method_lro_annotationn(self):
         input_msg = make_message(name="Input", full_name=".example.v1.input")
@@ -189,6 +198,53 @@ class MethodTest(unittest.TestCase):
         self.assertEqual(http_annotation["http_uri"], "http_uri")
         self.assertEqual(http_annotation["http_body"], "*")
 
+    def test_options_are_decoded_once(self):
+        output_msg = make_message(
+            name="Operation", full_name=".google.longrunning.Operation"
+        )
+        method = make_method(
+            name="Method",
+            output_message=output_msg,
+            signatures=["a,b", "c"],
+            lro_response_type="response_type",
+            lro_metadata_type="metadata_type",
+            http_uri="http_uri",
+            http_body="*",
+        )
+        with mock.patch.object(
+            wrappers._MethodOptions, "decode", wraps=wrappers._MethodOptions.decode
+        ) as decode:
+            for _ in range(3):
+                self.assertEqual(method.method_signatures.value, [("a", "b"), ("c",)])
+                self.assertEqual(
+                    method.lro_annotation.value["metadata_type"], "metadata_type"
+                )
+                self.assertEqual(method.http_annotation.value["http_uri"], "http_uri")
+        self.assertEqual(decode.call_count, 1)
+
+    def test_structural_digest_covers_messages(self):
+        def make(field_name):
+            response = make_message(
+                name="Response",
+                fields=[make_field(name=field_name, proto_type="TYPE_STRING")],
+                full_name=".example.v1.Response",
+            )
+            return make_method(
+                "Method",
+                output_message=response,
+                messages_map={".example.v1.Response": response},
+            )
+
+        self.assertEqual(
+            make("next_page_token").structural_digest,
+            make("next_page_token").structural_digest,
+        )
+        # A change in the response message can change the pagination.
+        self.assertNotEqual(
+            make("next_page_token").structural_digest,
+            make("page_token").structural_digest,
+        )
+
 
 if __name__ == "__main__":
     unittest.main()
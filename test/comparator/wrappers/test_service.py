@@ -13,6 +13,7 @@
 # limitations under the License.
 
 import unittest
+from unittest import mock
 from test.tools.mock_descriptors import (
     make_method,
     make_message,
@@ -20,6 +21,7 @@ from test.tools.mock_descriptors import (
     make_service,
 )
 from google.protobuf import descriptor_pb2
+from proto_bcd.comparator import wrappers
 
 
 class ServiceTest(unittest.TestCase):
@@ -95,6 +97,23 @@ class ServiceTest(unittest.TestCase):
         self.assertEqual(service.source_code_line, 2)
         self.assertEqual(service.proto_file_name, "test.proto")
 
+    def test_methods_are_built_once(self):
+        service = make_service(
+            name="ThingDoer",
+            methods=(make_method(name="DoThing"), make_method(name="Jump")),
+            scopes=("https://foo/user/",),
+        )
+        with mock.patch.object(
+            wrappers.Method, "_in_file", wraps=wrappers.Method._in_file
+        ) as make_method_in_file, mock.patch.object(
+            wrappers, "WithLocation", wraps=wrappers.WithLocation
+        ) as with_location_cls:
+            for _ in range(3):
+                self.assertIs(service.methods, service.methods)
+                self.assertIs(service.oauth_scopes, service.oauth_scopes)
+        self.assertEqual(make_method_in_file.call_count, 2)
+        self.assertEqual(with_location_cls.call_count, 1)
+
 
 if __name__ == "__main__":
     unittest.main()
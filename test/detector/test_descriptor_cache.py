@@ -0,0 +1,96 @@
+# Copyright 2026 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import tempfile
+import unittest
+from google.protobuf import descriptor_pb2
+
+from proto_bcd.detector.descriptor_cache import DescriptorSetCache
+
+
+class DescriptorSetCacheTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.protos_dir = os.path.join(self._tmp.name, "protos")
+        os.makedirs(self.protos_dir)
+        self.cache = DescriptorSetCache(os.path.join(self._tmp.name, "cache"))
+        self._write_proto("a.proto", 'syntax = "proto3";\nimport "b.proto";\n')
+        self._write_proto("b.proto", 'syntax = "proto3";\n')
+        self.proto_files = [os.path.join(self.protos_dir, "a.proto")]
+        self.data = descriptor_pb2.FileDescriptorSet(
+            file=[
+                descriptor_pb2.FileDescriptorProto(name="b.proto"),
+                descriptor_pb2.FileDescriptorProto(
+                    name="a.proto", dependency=["b.proto"]
+                ),
+            ]
+        ).SerializeToString()
+
+    def _write_proto(self, name, content):
+        with open(os.path.join(self.protos_dir, name), "w") as f:
+            f.write(content)
+
+    def _key(self, protoc_identity="protoc 1", include_source_code=True):
+        return self.cache.key(
+            self.proto_files, [self.protos_dir], protoc_identity, include_source_code
+        )
+
+    def test_get_put(self):
+        key = self._key()
+        self.assertIsNone(self.cache.get(key, [self.protos_dir]))
+        self.cache.put(key, self.data, [self.protos_dir])
+        self.assertEqual(self.cache.get(key, [self.protos_dir]), self.data)
+
+    def test_key(self):
+        key = self._key()
+        self.assertEqual(self._key(), key)
+        self.assertNotEqual(self._key(protoc_identity="protoc 2"), key)
+        self.assertNotEqual(self._key(include_source_code=False), key)
+        self.assertNotEqual(
+            self.cache.key(self.proto_files, [], "protoc 1", True),
+            key,
+        )
+        # The key covers the contents of the proto files.
+        self._write_proto("a.proto", 'syntax = "proto2";\nimport "b.proto";\n')
+        self.assertNotEqual(self._key(), key)
+
+    def test_changed_import_is_a_miss(self):
+        key = self._key()
+        self.cache.put(key, self.data, [self.protos_dir])
+        # The imported file is not part of the key, but it is in the manifest.
+        self._write_proto("b.proto", 'syntax = "proto2";\n')
+        self.assertEqual(self._key(), key)
+        self.assertIsNone(self.cache.get(key, [self.protos_dir]))
+
+    def test_lru_eviction(self):
+        self.cache.max_bytes = 2 * len(self.data)
+        for key, mtime in (("first", 1), ("second", 2)):
+            self.cache.put(key, self.data, [self.protos_dir])
+            os.utime(os.path.join(self.cache.cache_dir, key + ".pb"), (mtime, mtime))
+        # A hit makes the first entry the most recently used one.
+        self.assertIsNotNone(self.cache.get("first", [self.protos_dir]))
+        self.cache.put("third", self.data, [self.protos_dir])
+        self.assertIsNone(self.cache.get("second", [self.protos_dir]))
+        self.assertIsNotNone(self.cache.get("first", [self.protos_dir]))
+        self.assertIsNotNone(self.cache.get("third", [self.protos_dir]))
+        self.assertEqual(
+            sorted(os.listdir(self.cache.cache_dir)),
+            ["first.json", "first.pb", "third.json", "third.pb"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
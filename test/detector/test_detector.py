@@ -12,6 +12,9 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import json
+import os
+import tempfile
 import unittest
 from unittest import mock
 from io import StringIO
@@ -27,6 +30,7 @@ from test.tools.mock_descriptors import (
 from proto_bcd.detector.detector import Detector
 from proto_bcd.detector.options import Options
 from proto_bcd.findings.finding import Finding
+from proto_bcd.findings.finding_category import ChangeType
 
 
 class DectetorTest(unittest.TestCase):
@@ -123,6 +127,94 @@ class DectetorTest(unittest.TestCase):
         all_changes = Detector(file_set_original, file_set_update).detect_all_changes()
         self.assertEqual(len(all_changes), 1)
 
+    def test_detector_serialized_descriptor_sets(self):
+        enum_foo = make_enum(name="foo")
+        enum_bar = make_enum(name="bar")
+        file_set_original = desc.FileDescriptorSet(
+            file=[make_file_pb2(name="original.proto", enums=[enum_foo])]
+        )
+        file_set_update = desc.FileDescriptorSet(
+            file=[make_file_pb2(name="update.proto", enums=[enum_bar])]
+        )
+        # The serialized sets are compared without writing them to files.
+        breaking_changes = Detector(
+            file_set_original.SerializeToString(),
+            memoryview(file_set_update.SerializeToString()),
+        ).detect_breaking_changes()
+        self.assertEqual(
+            [finding.get_message() for finding in breaking_changes],
+            [
+                finding.get_message()
+                for finding in Detector(
+                    file_set_original, file_set_update
+                ).detect_breaking_changes()
+            ],
+        )
+
+    def test_detector_json_lines(self):
+        enum_foo = make_enum(name="foo")
+        enum_bar = make_enum(name="bar", values=[("A", 1)])
+        file_set_original = desc.FileDescriptorSet(
+            file=[make_file_pb2(name="file.proto", enums=[enum_foo, enum_bar])]
+        )
+        file_set_update = desc.FileDescriptorSet(
+            file=[
+                make_file_pb2(
+                    name="file.proto",
+                    enums=[make_enum(name="bar", values=[("A", 1), ("B", 2)])],
+                )
+            ]
+        )
+        for human_readable_message in (False, True):
+            with tempfile.TemporaryDirectory() as tmp:
+                output_json_path = os.path.join(tmp, "findings.jsonl")
+                with mock.patch("os.path.isfile") as mocked_isfile:
+                    mocked_isfile.return_value = True
+                    opts = Options(
+                        original_api_definition_dirs=None,
+                        update_api_definition_dirs=None,
+                        original_proto_files=None,
+                        update_proto_files=None,
+                        original_descriptor_set_file_path="original.pb",
+                        update_descriptor_set_file_path="update.pb",
+                        human_readable_message=human_readable_message,
+                        output_json_path=output_json_path,
+                        output_format="jsonl",
+                    )
+                detector = Detector(file_set_original, file_set_update, opts)
+                with mock.patch("sys.stdout", new=StringIO()) as stdout:
+                    breaking_changes = detector.detect_breaking_changes()
+                with open(output_json_path) as f:
+                    lines = [json.loads(line) for line in f]
+            self.assertEqual(
+                sorted((line["subject"], line["change_type"]) for line in lines),
+                [("B", "MINOR"), ("foo", "MAJOR")],
+            )
+            finding_container = detector.finding_container
+            # The findings are counted, but only kept for the human-readable
+            # message.
+            self.assertEqual(finding_container.count(ChangeType.MAJOR), 1)
+            self.assertEqual(finding_container.count(), 2)
+            self.assertEqual(finding_container.keep_findings, human_readable_message)
+            self.assertEqual(
+                [finding.get_message() for finding in breaking_changes],
+                (
+                    ["An existing enum `foo` is removed."]
+                    if human_readable_message
+                    else []
+                ),
+            )
+            self.assertEqual(
+                stdout.getvalue(),
+                (
+                    "file.proto: An existing enum `foo` is removed.\n"
+                    if human_readable_message
+                    else ""
+                ),
+            )
+            # The sink is removed once the comparison is done.
+            self.assertFalse(finding_container._sinks)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -14,9 +14,23 @@
 
 import unittest
 import os
+import subprocess
+import sys
+import tempfile
+from unittest import mock
 from google.protobuf import descriptor_pb2
 
-from proto_bcd.detector.loader import Loader, _ProtocInvokerException
+from proto_bcd.comparator.lazy_file_set import LazyFileDescriptorSet
+from proto_bcd.detector import loader as loader_module
+from proto_bcd.detector.loader import (
+    Loader,
+    _ProtocInvokerException,
+    build_dependency_descriptor_set,
+    ensure_dependency_descriptor_set,
+    read_descriptor_set,
+    write_descriptor_set,
+)
+from proto_bcd.detector.protoc_pool import ProtocWorkerPool
 
 
 class LoaderTest(unittest.TestCase):
@@ -121,6 +135,585 @@ class LoaderTest(unittest.TestCase):
             loader.get_descriptor_set(), descriptor_pb2.FileDescriptorSet
         )
 
+    def test_loader_cache(self):
+        proto_dir = os.path.join(self._CURRENT_DIR, "test/testdata/protos/example/")
+        with tempfile.TemporaryDirectory() as cache_dir:
+
+            def load():
+                return Loader(
+                    proto_definition_dirs=[proto_dir, self.COMMON_PROTOS_DIR],
+                    proto_files=[os.path.join(proto_dir, "wrappers.proto")],
+                    descriptor_set=None,
+                    cache_dir=cache_dir,
+                ).get_descriptor_set()
+
+            with mock.patch.object(
+                loader_module.protoc, "main", wraps=loader_module.protoc.main
+            ) as protoc_main:
+                compiled = load()
+                cached = load()
+            # The second load is a cache hit, protoc only runs once.
+            self.assertEqual(protoc_main.call_count, 1)
+            self.assertEqual(cached, compiled)
+            self.assertTrue(cached.file)
+
+    def test_loader_protoc_in_subprocess(self):
+        proto_dir = os.path.join(self._CURRENT_DIR, "test/testdata/protos/example/")
+
+        def load(protoc_in_subprocess):
+            return Loader(
+                proto_definition_dirs=[proto_dir, self.COMMON_PROTOS_DIR],
+                proto_files=[os.path.join(proto_dir, "wrappers.proto")],
+                descriptor_set=None,
+                protoc_in_subprocess=protoc_in_subprocess,
+            ).get_descriptor_set()
+
+        with mock.patch.object(loader_module.protoc, "main") as protoc_main:
+            in_subprocess = load(True)
+        protoc_main.assert_not_called()
+        self.assertEqual(in_subprocess, load(False))
+
+    def test_loader_protoc_pool(self):
+        proto_dir = os.path.join(self._CURRENT_DIR, "test/testdata/protos/example/")
+        with ProtocWorkerPool(size=1) as pool:
+            loader = Loader(
+                proto_definition_dirs=[proto_dir, self.COMMON_PROTOS_DIR],
+                proto_files=[os.path.join(proto_dir, "wrappers.proto")],
+                descriptor_set=None,
+                protoc_pool=pool,
+            )
+            with mock.patch.object(loader_module.protoc, "main") as protoc_main:
+                in_pool = loader.get_descriptor_set()
+            protoc_main.assert_not_called()
+            loader.proto_files = ["missing.proto"]
+            with self.assertRaisesRegex(
+                _ProtocInvokerException,
+                "Protoc command to load the descriptor set fails.",
+            ):
+                loader.get_descriptor_set()
+        loader.protoc_pool = None
+        loader.proto_files = [os.path.join(proto_dir, "wrappers.proto")]
+        self.assertEqual(in_pool, loader.get_descriptor_set())
+
+    def test_loader_protoc_in_subprocess_error(self):
+        loader = Loader(
+            proto_definition_dirs=["dira"],
+            proto_files=["a.proto"],
+            descriptor_set=None,
+            protoc_in_subprocess=True,
+        )
+        with self.assertRaisesRegex(
+            _ProtocInvokerException, "Protoc command to load the descriptor set fails."
+        ):
+            loader.get_descriptor_set()
+
+    def test_loader_dependency_descriptor_set(self):
+        proto_dir = os.path.join(self._CURRENT_DIR, "test/testdata/protos/example/")
+        with tempfile.TemporaryDirectory() as tmp:
+            dependencies = os.path.join(tmp, "dependencies.pb")
+
+            def load(dependency_descriptor_set):
+                return Loader(
+                    proto_definition_dirs=[proto_dir, self.COMMON_PROTOS_DIR],
+                    proto_files=[
+                        os.path.join(proto_dir, "resource_reference_v1.proto")
+                    ],
+                    descriptor_set=None,
+                    dependency_descriptor_set=dependency_descriptor_set,
+                )
+
+            loader = load(dependencies)
+            with mock.patch.object(
+                loader_module.protoc, "main", wraps=loader_module.protoc.main
+            ) as protoc_main:
+                with_dependencies = loader.get_descriptor_set()
+                loader.get_descriptor_set()
+            # The dependency descriptor set is built once, on the first use.
+            self.assertTrue(os.path.isfile(dependencies))
+            self.assertEqual(protoc_main.call_count, 3)
+            self.assertIn(
+                f"--descriptor_set_in={dependencies}", protoc_main.call_args[0][0]
+            )
+            # The imported files come from the descriptor set, the same as
+            # from a full compilation.
+            self.assertEqual(with_dependencies, load(None).get_descriptor_set())
+
+    def test_build_dependency_descriptor_set(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "dependencies.pb")
+            build_dependency_descriptor_set(
+                path,
+                [self.COMMON_PROTOS_DIR],
+                proto_files=["google/api/resource.proto", "google/missing.proto"],
+            )
+            with open(path, "rb") as f:
+                desc_set = descriptor_pb2.FileDescriptorSet.FromString(f.read())
+            names = [fd.name for fd in desc_set.file]
+            self.assertIn("google/api/resource.proto", names)
+            self.assertIn("google/protobuf/descriptor.proto", names)
+            self.assertTrue(desc_set.file[0].source_code_info.location)
+
+            # The files in the proto paths of the API take precedence over the
+            # descriptor set, e.g. when the common protos themselves are checked.
+            def load(dependency_descriptor_set):
+                return Loader(
+                    proto_definition_dirs=[self.COMMON_PROTOS_DIR],
+                    proto_files=[
+                        os.path.join(
+                            self.COMMON_PROTOS_DIR, "google/api/resource.proto"
+                        )
+                    ],
+                    descriptor_set=None,
+                    dependency_descriptor_set=dependency_descriptor_set,
+                ).get_descriptor_set()
+
+            self.assertEqual(load(path), load(None))
+
+    def test_ensure_dependency_descriptor_set(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            dependency = os.path.join(tmp, "dep", "a.proto")
+            os.makedirs(os.path.dirname(dependency))
+            with open(dependency, "w") as f:
+                f.write('syntax = "proto3";\nmessage A {}\n')
+            path = os.path.join(tmp, "dependencies.pb")
+
+            def ensure():
+                return ensure_dependency_descriptor_set(
+                    path, [tmp], proto_files=["dep/a.proto"]
+                )
+
+            self.assertTrue(ensure())
+            self.assertTrue(os.path.isfile(path + ".json"))
+            # The set is up to date with the dependencies.
+            self.assertFalse(ensure())
+            # It is built again once a dependency changes.
+            with open(dependency, "a") as f:
+                f.write("message B {}\n")
+            self.assertTrue(ensure())
+            with open(path, "rb") as f:
+                desc_set = descriptor_pb2.FileDescriptorSet.FromString(f.read())
+            self.assertEqual(
+                [m.name for m in desc_set.file[0].message_type], ["A", "B"]
+            )
+            # A set without a manifest is built elsewhere, and used as is.
+            os.unlink(path + ".json")
+            with open(dependency, "a") as f:
+                f.write("message C {}\n")
+            self.assertFalse(ensure())
+
+    def test_dependency_descriptor_set_of_other_dependencies(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            for version, message in (("v1", "A"), ("v2", "B")):
+                os.makedirs(os.path.join(tmp, version, "dep"))
+                with open(os.path.join(tmp, version, "dep", "a.proto"), "w") as f:
+                    f.write(f'syntax = "proto3";\nmessage {message} {{}}\n')
+                with open(os.path.join(tmp, version, "api.proto"), "w") as f:
+                    f.write('syntax = "proto3";\nimport "dep/a.proto";\n')
+            path = os.path.join(tmp, "dependencies.pb")
+            build_dependency_descriptor_set(
+                path, [os.path.join(tmp, "v1")], proto_files=["dep/a.proto"]
+            )
+
+            def load(version):
+                loader = Loader(
+                    proto_definition_dirs=[os.path.join(tmp, version)],
+                    proto_files=[os.path.join(tmp, version, "api.proto")],
+                    descriptor_set=None,
+                    dependency_descriptor_set=path,
+                )
+                with mock.patch.object(
+                    loader_module.protoc, "main", wraps=loader_module.protoc.main
+                ) as protoc_main:
+                    desc_set = loader.get_descriptor_set()
+                return desc_set, protoc_main.call_args[0][0]
+
+            desc_set, args = load("v1")
+            self.assertIn(f"--descriptor_set_in={path}", args)
+            self.assertEqual(desc_set.file[0].message_type[0].name, "A")
+            # The set was built from the other version of the dependency.
+            desc_set, args = load("v2")
+            self.assertFalse(any("--descriptor_set_in" in a for a in args))
+            self.assertEqual(desc_set.file[0].message_type[0].name, "B")
+
+    def test_dependency_descriptor_set_with_other_imports(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            files = {
+                "api/dep/a.proto": "message A {}",
+                "other/b.proto": "message B {}",
+                "api/api.proto": 'import "dep/a.proto";\nimport "b.proto";',
+            }
+            for name, content in files.items():
+                os.makedirs(os.path.dirname(os.path.join(tmp, name)), exist_ok=True)
+                with open(os.path.join(tmp, name), "w") as f:
+                    f.write(f'syntax = "proto3";\n{content}\n')
+            api_dir, other_dir = os.path.join(tmp, "api"), os.path.join(tmp, "other")
+            path = os.path.join(tmp, "dependencies.pb")
+            build_dependency_descriptor_set(
+                path, [api_dir], proto_files=["dep/a.proto"]
+            )
+            loader = Loader(
+                proto_definition_dirs=[api_dir, other_dir],
+                proto_files=[os.path.join(api_dir, "api.proto")],
+                descriptor_set=None,
+                dependency_descriptor_set=path,
+            )
+            with mock.patch.object(
+                loader_module.protoc, "main", wraps=loader_module.protoc.main
+            ) as protoc_main:
+                desc_set = loader.get_descriptor_set()
+            # b.proto is neither in the descriptor set nor in the proto path of
+            # the API, so all the proto paths are passed.
+            args = protoc_main.call_args[0][0]
+            self.assertIn(f"--descriptor_set_in={path}", args)
+            self.assertIn(f"--proto_path={other_dir}", args)
+            self.assertEqual(
+                sorted(fd.name for fd in desc_set.file),
+                ["api.proto", "b.proto", "dep/a.proto"],
+            )
+
+    def test_dependency_descriptor_set_without_source_code_info(self):
+        proto_dir = os.path.join(self._CURRENT_DIR, "test/testdata/protos/example/")
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "dependencies.pb")
+            build_dependency_descriptor_set(
+                path, [self.COMMON_PROTOS_DIR], include_source_code=False
+            )
+
+            def protoc_args(include_source_code):
+                loader = Loader(
+                    proto_definition_dirs=[proto_dir, self.COMMON_PROTOS_DIR],
+                    proto_files=[os.path.join(proto_dir, "wrappers.proto")],
+                    descriptor_set=None,
+                    include_source_code=include_source_code,
+                    dependency_descriptor_set=path,
+                )
+                with mock.patch.object(
+                    loader_module.protoc, "main", wraps=loader_module.protoc.main
+                ) as protoc_main:
+                    loader.get_descriptor_set()
+                return protoc_main.call_args[0][0]
+
+            # Only the API proto path is passed with the descriptor set.
+            args = protoc_args(False)
+            self.assertIn(f"--descriptor_set_in={path}", args)
+            self.assertNotIn(f"--proto_path={self.COMMON_PROTOS_DIR}", args)
+            # The imported files would miss their source code info.
+            args = protoc_args(True)
+            self.assertFalse(any("--descriptor_set_in" in a for a in args))
+            self.assertIn(f"--proto_path={self.COMMON_PROTOS_DIR}", args)
+
+    def test_loader_incremental_compilation(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            proto_dir = os.path.join(tmp, "protos")
+            os.makedirs(os.path.join(proto_dir, "example"))
+
+            def write(name, content):
+                with open(os.path.join(proto_dir, "example", name), "w") as f:
+                    f.write('syntax = "proto3";\npackage example;\n' + content)
+
+            write("b.proto", "message B { string name = 1; }\n")
+            write("a.proto", 'import "example/b.proto";\nmessage A { B b = 1; }\n')
+            write(
+                "c.proto",
+                'import "google/api/resource.proto";\nmessage C { google.api.ResourceDescriptor r = 1; }\n',
+            )
+            write(
+                "d.proto",
+                'import "example/a.proto";\nimport "example/c.proto";\n'
+                "message D { A a = 1; C c = 2; }\n",
+            )
+
+            def load(cache_dir, names):
+                loader = Loader(
+                    proto_definition_dirs=[proto_dir, self.COMMON_PROTOS_DIR],
+                    proto_files=[
+                        os.path.join(proto_dir, "example", name) for name in names
+                    ],
+                    descriptor_set=None,
+                    cache_dir=cache_dir,
+                )
+                with mock.patch.object(
+                    loader_module.protoc, "main", wraps=loader_module.protoc.main
+                ) as protoc_main:
+                    desc_set = loader.get_descriptor_set()
+                compiled = [
+                    os.path.basename(arg)
+                    for args in protoc_main.call_args_list
+                    for arg in args[0][0]
+                    if arg.endswith(".proto")
+                ]
+                return desc_set, compiled
+
+            cache_dir = os.path.join(tmp, "cache")
+            names = ["d.proto", "c.proto", "b.proto"]
+            load(cache_dir, names)
+            # Only the changed file and the files that import it are compiled.
+            write("b.proto", "message B { string name = 1; int32 id = 2; }\n")
+            incremental, compiled = load(cache_dir, names)
+            self.assertEqual(sorted(compiled), ["a.proto", "b.proto", "d.proto"])
+            self.assertEqual(incremental, load(None, names)[0])
+            # A new import is followed.
+            write("c.proto", 'import "example/b.proto";\nmessage C { B b = 1; }\n')
+            incremental, compiled = load(cache_dir, names)
+            self.assertEqual(sorted(compiled), ["c.proto", "d.proto"])
+            self.assertEqual(incremental, load(None, names)[0])
+            # The set is assembled from the cached files only.
+            incremental, compiled = load(cache_dir, ["c.proto", "a.proto"])
+            self.assertEqual(compiled, [])
+            self.assertEqual(incremental, load(None, ["c.proto", "a.proto"])[0])
+
+    def test_loader_descriptor_set_is_mapped(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "descriptor_set.pb")
+            file_set = descriptor_pb2.FileDescriptorSet(
+                file=[
+                    descriptor_pb2.FileDescriptorProto(name=f"{i}.proto")
+                    for i in range(3)
+                ]
+            )
+            with open(path, "wb") as f:
+                f.write(file_set.SerializeToString())
+            loader = Loader(
+                proto_definition_dirs=None, proto_files=None, descriptor_set=path
+            )
+            with mock.patch.object(
+                loader_module, "_map_file", wraps=loader_module._map_file
+            ) as map_file:
+                self.assertEqual(loader.get_descriptor_set(), file_set)
+            map_file.assert_called_once_with(path)
+            # An empty file cannot be mapped, it is an empty descriptor set.
+            open(path, "wb").close()
+            self.assertEqual(
+                loader.get_descriptor_set(), descriptor_pb2.FileDescriptorSet()
+            )
+
+    def test_loader_lazy_descriptor_set(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "descriptor_set.pb")
+            file_set = descriptor_pb2.FileDescriptorSet()
+            fd = file_set.file.add(name="a.proto", package="a")
+            fd.source_code_info.location.add(path=(2,), span=(0, 0, 10))
+            with open(path, "wb") as f:
+                f.write(file_set.SerializeToString())
+            desc_set = Loader(
+                proto_definition_dirs=None,
+                proto_files=None,
+                descriptor_set=path,
+                lazy=True,
+            ).get_descriptor_set()
+            self.assertIsInstance(desc_set, LazyFileDescriptorSet)
+            self.assertEqual(
+                desc_set.file[0],
+                descriptor_pb2.FileDescriptorProto(name="a.proto", package="a"),
+            )
+            self.assertEqual(desc_set.source_code_info(0), fd.source_code_info)
+        path = os.path.join(
+            self._CURRENT_DIR, "test/testdata/protos/enum/v1/enum_descriptor_set.pb"
+        )
+        eager, lazy = (
+            Loader(
+                proto_definition_dirs=None,
+                proto_files=None,
+                descriptor_set=path,
+                lazy=lazy,
+            ).get_descriptor_set()
+            for lazy in (False, True)
+        )
+        self.assertEqual(
+            [header.name for header in lazy.headers], [fd.name for fd in eager.file]
+        )
+
+    def test_loader_compressed_descriptor_set(self):
+        path = os.path.join(
+            self._CURRENT_DIR, "test/testdata/protos/enum/v1/enum_descriptor_set.pb"
+        )
+        with open(path, "rb") as f:
+            data = f.read()
+        file_set = descriptor_pb2.FileDescriptorSet.FromString(data)
+        with tempfile.TemporaryDirectory() as tmp:
+            for compression in (None, "gzip", "bz2", "xz"):
+                # The format is detected from the content, not the extension.
+                snapshot = os.path.join(tmp, f"{compression}.pb")
+                write_descriptor_set(snapshot, data, compression)
+                self.assertEqual(loader_module._compression_of(snapshot), compression)
+                self.assertEqual(bytes(read_descriptor_set(snapshot)), data)
+                desc_set, lazy = (
+                    Loader(
+                        proto_definition_dirs=None,
+                        proto_files=None,
+                        descriptor_set=snapshot,
+                        lazy=lazy,
+                    ).get_descriptor_set()
+                    for lazy in (False, True)
+                )
+                self.assertEqual(desc_set, file_set)
+                self.assertEqual(
+                    [lazy.source_code_info(i) for i in range(len(lazy))],
+                    [fd.source_code_info for fd in file_set.file],
+                )
+            with self.assertRaisesRegex(ValueError, "zip"):
+                write_descriptor_set(os.path.join(tmp, "a.pb"), data, "zip")
+            # The failed write left no temporary file.
+            self.assertEqual(
+                sorted(os.listdir(tmp)), ["None.pb", "bz2.pb", "gzip.pb", "xz.pb"]
+            )
+
+    def test_loader_descriptor_set_out(self):
+        proto_dir = os.path.join(self._CURRENT_DIR, "test/testdata/protos/example/")
+        with tempfile.TemporaryDirectory() as tmp:
+            snapshot = os.path.join(tmp, "snapshot")
+            compiled = Loader(
+                proto_definition_dirs=[proto_dir, self.COMMON_PROTOS_DIR],
+                proto_files=[os.path.join(proto_dir, "wrappers.proto")],
+                descriptor_set=None,
+                descriptor_set_out=snapshot,
+                descriptor_set_out_compression="gzip",
+            ).get_descriptor_set()
+            with open(snapshot, "rb") as f:
+                self.assertEqual(f.read(2), b"\x1f\x8b")
+            loaded = Loader(
+                proto_definition_dirs=None, proto_files=None, descriptor_set=snapshot
+            ).get_descriptor_set()
+        self.assertEqual(loaded, compiled)
+
+    def test_loader_serialized_descriptor_set(self):
+        path = os.path.join(
+            self._CURRENT_DIR, "test/testdata/protos/enum/v1/enum_descriptor_set.pb"
+        )
+        with open(path, "rb") as f:
+            data = f.read()
+        file_set = descriptor_pb2.FileDescriptorSet.FromString(data)
+        with tempfile.TemporaryDirectory() as tmp:
+            snapshot = os.path.join(tmp, "snapshot.pb")
+            write_descriptor_set(snapshot, data, "xz")
+            with open(snapshot, "rb") as f:
+                compressed = f.read()
+        for descriptor_set in (data, bytearray(data), memoryview(data), compressed):
+            loader = Loader(
+                proto_definition_dirs=None,
+                proto_files=None,
+                descriptor_set=descriptor_set,
+            )
+            self.assertEqual(bytes(loader.get_serialized_descriptor_set()), data)
+            self.assertEqual(loader.get_descriptor_set(), file_set)
+        # Parsing does not release the view of the caller.
+        self.assertEqual(descriptor_set, compressed)
+        view = memoryview(data)
+        Loader(
+            proto_definition_dirs=None, proto_files=None, descriptor_set=view
+        ).get_descriptor_set()
+        self.assertEqual(view.tobytes(), data)
+        self.assertEqual(
+            Loader(
+                proto_definition_dirs=None, proto_files=None, descriptor_set=None
+            ).get_serialized_descriptor_set(),
+            b"",
+        )
+
+    @unittest.skipUnless(hasattr(os, "memfd_create"), "Needs memfd_create.")
+    def test_loader_protoc_output_in_memory(self):
+        proto_dir = os.path.join(self._CURRENT_DIR, "test/testdata/protos/example/")
+
+        def load(**kwargs):
+            return Loader(
+                proto_definition_dirs=[proto_dir, self.COMMON_PROTOS_DIR],
+                proto_files=[os.path.join(proto_dir, "wrappers.proto")],
+                descriptor_set=None,
+                **kwargs,
+            ).get_serialized_descriptor_set()
+
+        with mock.patch.object(
+            tempfile, "mkstemp", side_effect=AssertionError("Temporary file")
+        ):
+            in_process = bytes(load())
+            # An external protoc writes to the inherited memfd, and the
+            # command is split into its arguments without a shell.
+            external = bytes(
+                load(protoc_binary=f"{sys.executable} -m grpc_tools.protoc")
+            )
+        self.assertTrue(in_process)
+        self.assertEqual(external, in_process)
+
+    def test_mapped_descriptor_set(self):
+        # A descriptor set file is parsed from a read-only mapping of the file,
+        # not from a private copy.
+        file_set = descriptor_pb2.FileDescriptorSet()
+        for i in range(10):
+            fd = file_set.file.add(name=f"{i}.proto")
+            fd.source_code_info.location.add(path=(4, 0), span=(i, 0, 10))
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "descriptor_set.pb")
+            with open(path, "wb") as f:
+                f.write(file_set.SerializeToString())
+            data = loader_module._map_file(path)
+            self.assertIsInstance(data, memoryview)
+            self.assertTrue(data.readonly)
+            loaded = Loader(
+                proto_definition_dirs=None, proto_files=None, descriptor_set=path
+            ).get_descriptor_set()
+        self.assertEqual(loaded, file_set)
+
+    @unittest.skipUnless(
+        os.environ.get("PROTO_BCD_BENCHMARKS"),
+        "Benchmark, set PROTO_BCD_BENCHMARKS=1 to run it.",
+    )
+    @unittest.skipUnless(
+        os.path.exists("/proc/self/status"), "Reads the memory usage from /proc."
+    )
+    def test_memory_of_mapped_descriptor_set(self):
+        # Compare the memory of a process that parses a large descriptor set
+        # read into a bytes object and one that parses it from a mapped file,
+        # right after parsing while both the buffer and the message are alive.
+        script = """
+import sys
+from google.protobuf import descriptor_pb2
+from proto_bcd.detector import loader
+
+def memory():
+    with open("/proc/self/status") as f:
+        status = dict(line.split(":", 1) for line in f)
+    return [int(status[key].split()[0]) // 1024 for key in ("VmHWM", "RssAnon")]
+
+path, mode = sys.argv[1:]
+desc_set = descriptor_pb2.FileDescriptorSet()
+if mode == "read":
+    with open(path, "rb") as f:
+        data = f.read()
+else:
+    data = loader._map_file(path)
+desc_set.ParseFromString(data)
+print(*memory(), len(desc_set.file))
+"""
+        file_set = descriptor_pb2.FileDescriptorSet()
+        for i in range(100):
+            fd = file_set.file.add(name=f"{i}.proto")
+            for j in range(2000):
+                fd.source_code_info.location.add(
+                    path=(4, j), span=(j, 0, 10), leading_comments="comment " * 8
+                )
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "descriptor_set.pb")
+            with open(path, "wb") as f:
+                f.write(file_set.SerializeToString())
+            size = os.path.getsize(path) // (1024 * 1024)
+            results = {}
+            for mode in ("read", "mapped"):
+                output = subprocess.run(
+                    [sys.executable, "-c", script, path, mode],
+                    stdout=subprocess.PIPE,
+                    check=True,
+                    env=dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path)),
+                ).stdout
+                results[mode] = [int(value) for value in output.split()]
+        for mode, (peak, anonymous, files) in results.items():
+            print(
+                f"\n{size} MB descriptor set, {mode}: peak RSS {peak} MB, "
+                f"anonymous RSS {anonymous} MB"
+            )
+            self.assertEqual(files, 100)
+        # The mapped file is not a private copy.
+        self.assertLess(results["mapped"][1], results["read"][1])
+
     def test_loader_invalid_proto_compiler(self):
         loader = Loader(
             proto_definition_dirs=["dira", "dirb", "dirc"],
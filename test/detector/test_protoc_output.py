@@ -0,0 +1,60 @@
+# Copyright 2026 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from proto_bcd.detector import protoc_output
+from proto_bcd.detector.protoc_output import ProtocOutput, map_fd
+
+
+class ProtocOutputTest(unittest.TestCase):
+    def _write(self, output, data):
+        # protoc opens the output by its path, and truncates it.
+        with open(output.path, "wb") as f:
+            f.write(data)
+
+    @unittest.skipUnless(hasattr(os, "memfd_create"), "Needs memfd_create.")
+    def test_output_in_memory(self):
+        with mock.patch.object(
+            tempfile, "mkstemp", side_effect=AssertionError("Temporary file")
+        ):
+            with ProtocOutput() as output:
+                self.assertEqual(output.path, f"/dev/fd/{output.fd}")
+                self._write(output, b"descriptor set")
+                self.assertEqual(output.read(), b"descriptor set")
+
+    def test_output_in_temporary_file(self):
+        # The platforms without memfd_create use a temporary file.
+        with mock.patch.object(protoc_output.os, "memfd_create", create=True):
+            del protoc_output.os.memfd_create
+            output = ProtocOutput()
+        with output:
+            self.assertTrue(os.path.isfile(output.path))
+            self._write(output, b"descriptor set")
+            self.assertEqual(output.read(), b"descriptor set")
+        self.assertFalse(os.path.exists(output.path))
+
+    def test_map_empty_file(self):
+        with tempfile.TemporaryFile() as f:
+            self.assertEqual(map_fd(f.fileno()), b"")
+            f.write(b"descriptor set")
+            f.flush()
+            self.assertEqual(map_fd(f.fileno()), b"descriptor set")
+
+
+if __name__ == "__main__":
+    unittest.main()
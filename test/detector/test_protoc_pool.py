@@ -0,0 +1,185 @@
+# Copyright 2026 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import multiprocessing
+import os
+import subprocess
+import tempfile
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+from google.protobuf import descriptor_pb2
+
+from proto_bcd.detector import protoc_pool
+from proto_bcd.detector.protoc_pool import ProtocWorkerError, ProtocWorkerPool
+
+
+class ProtocWorkerPoolTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        with open(os.path.join(self._tmp.name, "a.proto"), "w") as f:
+            f.write('syntax = "proto3";\npackage a;\nmessage A { string name = 1; }\n')
+        self.protoc_command = [
+            "grpc_tools.protoc",
+            f"--proto_path={self._tmp.name}",
+            "--include_imports",
+            os.path.join(self._tmp.name, "a.proto"),
+        ]
+
+    def _pids(self, pool):
+        workers = list(pool._idle.queue)
+        return {w.process.pid for w in workers if w is not None}
+
+    def test_compile(self):
+        with ProtocWorkerPool(size=2) as pool:
+            for _ in range(3):
+                status, data = pool.compile(self.protoc_command)
+                self.assertEqual(status, 0)
+                file_set = descriptor_pb2.FileDescriptorSet.FromString(data)
+                self.assertEqual(file_set.file[0].message_type[0].name, "A")
+            # The same warm worker served all the compilations.
+            self.assertEqual(len(self._pids(pool)), 1)
+
+    def test_compile_error(self):
+        with ProtocWorkerPool(size=1) as pool:
+            status, data = pool.compile(self.protoc_command[:-1] + ["missing.proto"])
+            self.assertNotEqual(status, 0)
+            self.assertEqual(data, b"")
+            # The worker is still usable.
+            self.assertEqual(pool.compile(self.protoc_command)[0], 0)
+
+    def test_worker_recycling(self):
+        with ProtocWorkerPool(size=1, max_requests=2) as pool:
+            pool.compile(self.protoc_command)
+            first = self._pids(pool)
+            pool.compile(self.protoc_command)
+            # The worker is stopped after its last request.
+            self.assertEqual(self._pids(pool), set())
+            pool.compile(self.protoc_command)
+            self.assertNotEqual(self._pids(pool), first)
+
+    def test_dead_worker_is_replaced(self):
+        with ProtocWorkerPool(size=1) as pool:
+            pool.compile(self.protoc_command)
+            worker = pool._idle.queue[0]
+            worker.process.kill()
+            worker.process.wait()
+            self.assertEqual(pool.compile(self.protoc_command)[0], 0)
+            self.assertNotIn(worker.process.pid, self._pids(pool))
+
+    def test_worker_dies_during_request(self):
+        with ProtocWorkerPool(size=1) as pool:
+            pool.compile(self.protoc_command)
+            worker = pool._idle.queue[0]
+            # The worker fails to change to the working directory and exits
+            # before it responds.
+            with mock.patch.object(
+                protoc_pool.os, "getcwd", return_value="/nonexistent/dir"
+            ):
+                with self.assertRaisesRegex(ProtocWorkerError, "exited unexpectedly"):
+                    pool.compile(self.protoc_command)
+            # The broken worker was stopped and is respawned.
+            self.assertIsNotNone(worker.process.poll())
+            self.assertEqual(self._pids(pool), set())
+            self.assertEqual(pool.compile(self.protoc_command)[0], 0)
+            self.assertEqual(len(self._pids(pool)), 1)
+
+    def test_worker_is_not_available(self):
+        with ProtocWorkerPool(size=1) as pool:
+            pool.compile(self.protoc_command)
+            worker = pool._idle.queue[0]
+            worker.process.kill()
+            worker.process.wait()
+            # The worker died after it was checked, the request cannot be sent.
+            with mock.patch.object(
+                protoc_pool._Worker, "alive", new_callable=mock.PropertyMock
+            ) as alive:
+                alive.return_value = True
+                with self.assertRaisesRegex(ProtocWorkerError, "not available"):
+                    pool.compile(self.protoc_command)
+            self.assertEqual(pool.compile(self.protoc_command)[0], 0)
+            self.assertNotIn(worker.process.pid, self._pids(pool))
+
+    def test_stuck_worker_is_killed(self):
+        worker = protoc_pool._Worker()
+        stdin = worker.process.stdin
+        self.addCleanup(stdin.close)
+        wait = worker.process.wait
+        timeouts = [subprocess.TimeoutExpired("protoc", 5)]
+
+        def wait_once(timeout=None):
+            if timeouts:
+                raise timeouts.pop()
+            return wait(timeout)
+
+        # The worker does not see the end of its requests, and does not exit.
+        with mock.patch.object(stdin, "close", side_effect=OSError), mock.patch.object(
+            worker.process, "wait", side_effect=wait_once
+        ):
+            worker.close()
+        self.assertEqual(worker.process.returncode, -9)
+
+    def test_serve(self):
+        # The loop of a worker, run in a thread of this process over pipes.
+        streams = []
+        for mode in ("rb", "wb"):
+            reader, writer = multiprocessing.Pipe(duplex=False)
+            for connection, connection_mode in ((reader, "rb"), (writer, "wb")):
+                streams.append(os.fdopen(os.dup(connection.fileno()), connection_mode))
+                connection.close()
+        requests, requests_writer, responses_reader, responses = streams
+        for stream in streams:
+            self.addCleanup(stream.close)
+        thread = threading.Thread(target=protoc_pool._serve, args=(requests, responses))
+        thread.start()
+        for _ in range(2):
+            protoc_pool._write_request(requests_writer, self.protoc_command)
+            status, data = protoc_pool._read_response(responses_reader)
+            self.assertEqual(status, 0)
+            file_set = descriptor_pb2.FileDescriptorSet.FromString(data)
+            self.assertEqual(file_set.file[0].name, "a.proto")
+        protoc_pool._write_request(
+            requests_writer, self.protoc_command[:-1] + ["missing.proto"]
+        )
+        self.assertEqual(protoc_pool._read_response(responses_reader)[1], b"")
+        # The loop ends with the requests.
+        requests_writer.close()
+        thread.join(timeout=30)
+        self.assertFalse(thread.is_alive())
+
+    def test_concurrency_limit(self):
+        with ProtocWorkerPool(size=2) as pool:
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                results = list(executor.map(pool.compile, [self.protoc_command] * 16))
+            self.assertTrue(all(status == 0 for status, _ in results))
+            self.assertLessEqual(len(self._pids(pool)), 2)
+
+    def test_no_temp_files_are_left(self):
+        temp_dir = os.path.join(self._tmp.name, "tmp")
+        os.makedirs(temp_dir)
+        with mock.patch.dict(os.environ, {"TMPDIR": temp_dir}):
+            with ProtocWorkerPool(size=1) as pool:
+                for _ in range(5):
+                    pool.compile(self.protoc_command)
+                # A worker reuses one output file, in memory if it can.
+                self.assertEqual(
+                    len(os.listdir(temp_dir)), 0 if hasattr(os, "memfd_create") else 1
+                )
+        self.assertEqual(os.listdir(temp_dir), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -12,8 +12,11 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import io
+import json
 import unittest
-from proto_bcd.findings.finding_container import FindingContainer
+from proto_bcd.findings.finding_container import FindingContainer, JsonLinesWriter
+from proto_bcd.findings.messages import templates
 from proto_bcd.findings.finding_category import (
     FindingCategory,
     ChangeType,
@@ -163,6 +166,168 @@ class FindingContainerTest(unittest.TestCase):
             message, "test.proto L1: A new method `subject` is added to service ``.\n"
         )
 
+    def test_write_human_readable_message(self):
+        finding_container = FindingContainer()
+        for proto_file_name, source_code_line, subject in (
+            ("b.proto", 3, "b"),
+            ("a.proto", 7, "a"),
+            ("b.proto", 1, "c"),
+            ("a.proto", 7, "b"),
+        ):
+            finding_container.add_finding(
+                category=FindingCategory.MESSAGE_REMOVAL,
+                proto_file_name=proto_file_name,
+                source_code_line=source_code_line,
+                conventional_commit_tag=ConventionalCommitTag.FIX_BREAKING,
+                subject=subject,
+            )
+        stream = io.StringIO()
+        finding_container.write_human_readable_message(stream, line_numbers=False)
+        self.assertEqual(
+            stream.getvalue(),
+            "a.proto: An existing message `a` is removed.\n"
+            + "a.proto: An existing message `b` is removed.\n"
+            + "b.proto: An existing message `c` is removed.\n"
+            + "b.proto: An existing message `b` is removed.\n",
+        )
+        self.assertEqual(
+            finding_container.to_human_readable_message(line_numbers=False),
+            stream.getvalue(),
+        )
+
+    def test_messages(self):
+        finding_container = FindingContainer()
+        for category in FindingCategory:
+            finding_container.add_finding(
+                category=category,
+                proto_file_name="my_proto.proto",
+                source_code_line=12,
+                conventional_commit_tag=ConventionalCommitTag.FIX_BREAKING,
+                subject="subject",
+                oldsubject=1,
+                context="context",
+                type="type",
+                oldtype="oldtype",
+                oldcontext="oldcontext",
+            )
+        for finding in finding_container.finding_results:
+            self.assertEqual(
+                finding.get_message(),
+                templates[finding.category].format(**finding.to_dict()),
+            )
+            self.assertEqual(finding.location, ("my_proto.proto", 12))
+            self.assertEqual(finding.location.source_code_line, 12)
+
+    def test_indexed_queries(self):
+        for columnar in (False, True):
+            finding_container = FindingContainer(columnar=columnar)
+            for proto_file_name, context, tag in (
+                ("a.proto", "Foo", ConventionalCommitTag.FIX_BREAKING),
+                ("a.proto", "Bar", ConventionalCommitTag.FEAT),
+                ("b.proto", "Foo", ConventionalCommitTag.FIX_BREAKING),
+                ("a.proto", "Foo", ConventionalCommitTag.FIX_BREAKING),
+            ):
+                finding_container.add_finding(
+                    category=FindingCategory.FIELD_REMOVAL,
+                    proto_file_name=proto_file_name,
+                    source_code_line=len(finding_container.finding_results),
+                    conventional_commit_tag=tag,
+                    context=context,
+                )
+            self.assertEqual(finding_container.count(), 4)
+            self.assertEqual(finding_container.count(ChangeType.MAJOR), 3)
+            self.assertEqual(
+                finding_container.count(ChangeType.MAJOR, proto_file_name="a.proto"), 2
+            )
+            self.assertEqual(
+                finding_container.count(
+                    category=FindingCategory.FIELD_REMOVAL, context="Foo"
+                ),
+                3,
+            )
+            self.assertEqual(
+                finding_container.count(
+                    ChangeType.MAJOR, proto_file_name="a.proto", context="Foo"
+                ),
+                2,
+            )
+            self.assertEqual(finding_container.count(context="Baz"), 0)
+            self.assertEqual(
+                finding_container.count_by("proto_file_name", ChangeType.MAJOR),
+                {"a.proto": 2, "b.proto": 1},
+            )
+            self.assertEqual(
+                finding_container.count_by("change_type"),
+                {ChangeType.MAJOR: 3, ChangeType.MINOR: 1},
+            )
+            found = finding_container.find(
+                proto_file_name="a.proto", change_type=ChangeType.MAJOR
+            )
+            self.assertEqual([f.source_code_line for f in found], [0, 3])
+            # The findings added after a query are indexed too.
+            finding_container.add_finding(
+                category=FindingCategory.FIELD_ADDITION,
+                proto_file_name="a.proto",
+                source_code_line=-1,
+                conventional_commit_tag=ConventionalCommitTag.FEAT,
+                context="Foo",
+            )
+            self.assertEqual(
+                [f.category for f in finding_container.find(context="Foo")],
+                [FindingCategory.FIELD_ADDITION] + [FindingCategory.FIELD_REMOVAL] * 3,
+            )
+            self.assertEqual(
+                len(finding_container.find()), len(finding_container.finding_results)
+            )
+            with self.assertRaisesRegex(ValueError, "subject"):
+                finding_container.count_by("subject")
+            with self.assertRaisesRegex(ValueError, "type"):
+                finding_container.find(type="string")
+
+    def test_counts_of_findings_that_are_not_kept(self):
+        finding_container = FindingContainer(keep_findings=False)
+        finding_container.add_finding(
+            category=FindingCategory.METHOD_REMOVAL,
+            proto_file_name="my_proto.proto",
+            source_code_line=12,
+            conventional_commit_tag=ConventionalCommitTag.FIX_BREAKING,
+        )
+        self.assertEqual(finding_container.count(ChangeType.MAJOR), 1)
+        self.assertEqual(
+            finding_container.count_by("category"), {FindingCategory.METHOD_REMOVAL: 1}
+        )
+        self.assertEqual(finding_container.find(), [])
+        # The combined filters are looked up in the kept findings.
+        with self.assertRaisesRegex(ValueError, "not kept"):
+            finding_container.count(proto_file_name="my_proto.proto", context="")
+
+    def test_sinks(self):
+        stream = io.StringIO()
+        sink = JsonLinesWriter(stream)
+        finding_container = FindingContainer(keep_findings=False)
+        finding_container.add_sink(sink)
+        finding_container.add_finding(
+            category=FindingCategory.METHOD_REMOVAL,
+            proto_file_name="my_proto.proto",
+            source_code_line=12,
+            conventional_commit_tag=ConventionalCommitTag.FIX_BREAKING,
+            subject="subject",
+        )
+        # The finding is written as soon as it is added, and not kept.
+        self.assertEqual(
+            [json.loads(line)["category"] for line in stream.getvalue().splitlines()],
+            ["METHOD_REMOVAL"],
+        )
+        self.assertEqual(finding_container.get_all_findings(), [])
+        finding_container.remove_sink(sink)
+        finding_container.add_finding(
+            category=FindingCategory.FIELD_ADDITION,
+            proto_file_name="my_proto.proto",
+            source_code_line=15,
+            conventional_commit_tag=ConventionalCommitTag.FEAT,
+        )
+        self.assertEqual(len(stream.getvalue().splitlines()), 1)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,162 @@
+# Copyright 2026 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import random
+import unittest
+from unittest import mock
+from proto_bcd.findings import finding_container as finding_container_module
+from proto_bcd.findings import finding_store
+from proto_bcd.findings.finding import Finding
+from proto_bcd.findings.finding_container import FindingContainer
+from proto_bcd.findings.finding_category import (
+    FindingCategory,
+    ChangeType,
+    ConventionalCommitTag,
+)
+from proto_bcd.findings.finding_store import ColumnarFindingStore
+
+
+class ColumnarFindingStoreTest(unittest.TestCase):
+    def _add_findings(self, *finding_containers):
+        rng = random.Random(0)
+        for _ in range(500):
+            kwargs = dict(
+                category=rng.choice(list(FindingCategory)),
+                proto_file_name=rng.choice(["a.proto", "b.proto", "c/d.proto"]),
+                source_code_line=rng.randrange(-1, 20),
+                conventional_commit_tag=rng.choice(list(ConventionalCommitTag)),
+                extra_info=rng.choice([None, ["Foo", "bar"]]),
+                subject=rng.choice(["foo", "bar", "", "baz"]),
+                oldsubject=rng.choice(["", "foo", "qux"]),
+                context=rng.choice(["", "Foo", "Bar"]),
+                type=rng.choice(["", "string", "int32"]),
+            )
+            for finding_container in finding_containers:
+                finding_container.add_finding(**kwargs)
+
+    def test_same_findings_as_list(self):
+        findings = FindingContainer()
+        columnar = FindingContainer(columnar=True)
+        self._add_findings(findings, columnar)
+        self.assertIsInstance(columnar.finding_results, ColumnarFindingStore)
+        self.assertEqual(len(columnar.finding_results), 500)
+        self.assertEqual(columnar.to_dict_arr(), findings.to_dict_arr())
+        for get_findings in ("get_all_findings", "get_actionable_findings"):
+            self.assertEqual(
+                [f.to_dict() for f in getattr(columnar, get_findings)()],
+                [f.to_dict() for f in getattr(findings, get_findings)()],
+            )
+        self.assertEqual(
+            columnar.to_human_readable_message(all_changes=True),
+            findings.to_human_readable_message(all_changes=True),
+        )
+
+    def test_rows(self):
+        finding_container = FindingContainer(columnar=True)
+        self._add_findings(finding_container)
+        store = finding_container.finding_results
+        self.assertEqual(store.rows(), list(range(500)))
+        rows = store.rows([ChangeType.MINOR, ChangeType.PATCH])
+        self.assertTrue(rows)
+        self.assertEqual(
+            rows,
+            [
+                row
+                for row, finding in enumerate(store)
+                if finding.change_type in (ChangeType.MINOR, ChangeType.PATCH)
+            ],
+        )
+        self.assertEqual(store.rows([ChangeType.UNDEFINED]), [])
+
+    def test_strings_are_interned(self):
+        store = ColumnarFindingStore()
+        finding_container = FindingContainer()
+        finding_container.finding_results = store
+        for line in range(3):
+            finding_container.add_finding(
+                category=FindingCategory.FIELD_REMOVAL,
+                proto_file_name="foo.proto",
+                source_code_line=line,
+                conventional_commit_tag=ConventionalCommitTag.FIX_BREAKING,
+                subject="foo",
+                oldsubject=1,
+                context="Foo",
+            )
+        # Every distinct value is stored once.
+        self.assertEqual(len(store.strings), 5)
+        self.assertEqual(set(store.strings), {"foo.proto", "foo", 1, "Foo", ""})
+        self.assertEqual(store[-1].source_code_line, 2)
+        self.assertEqual(store[-1].oldsubject, 1)
+        self.assertEqual([f.source_code_line for f in store[1:]], [1, 2])
+        with self.assertRaises(IndexError):
+            store[3]
+
+    def test_findings_are_built_on_access(self):
+        finding_container = FindingContainer(columnar=True)
+        with mock.patch.object(
+            finding_container_module, "Finding", side_effect=AssertionError
+        ), mock.patch.object(finding_store, "Finding", wraps=Finding) as built:
+            # The attributes are added to the columns, no Finding is built.
+            self._add_findings(finding_container)
+            built.assert_not_called()
+            actionable = finding_container.get_actionable_findings()
+            self.assertEqual(built.call_count, len(actionable))
+        store = finding_container.finding_results
+        # The Findings are not kept, every access builds new ones.
+        self.assertIsNot(store[0], store[0])
+        self.assertEqual(store[0].to_dict(), next(iter(store)).to_dict())
+        self.assertEqual(
+            [f.to_dict() for f in finding_container.get_actionable_findings()],
+            [f.to_dict() for f in actionable],
+        )
+
+    def test_findings_of_sinks_are_stored(self):
+        finding_container = FindingContainer(columnar=True)
+        sunk = []
+        finding_container.add_sink(sunk.append)
+        finding_container.add_finding(
+            category=FindingCategory.FIELD_REMOVAL,
+            proto_file_name="z.proto",
+            source_code_line=1,
+            conventional_commit_tag=ConventionalCommitTag.FIX_BREAKING,
+            subject="foo",
+        )
+        self.assertEqual(
+            [f.to_dict() for f in finding_container.finding_results],
+            [f.to_dict() for f in sunk],
+        )
+
+    def test_sort_values_of_different_types(self):
+        findings = FindingContainer()
+        columnar = FindingContainer(columnar=True)
+        for proto_file_name, subject in (("b.proto", 2), ("a.proto", "foo")):
+            for finding_container in (findings, columnar):
+                finding_container.add_finding(
+                    category=FindingCategory.ENUM_VALUE_REMOVAL,
+                    proto_file_name=proto_file_name,
+                    source_code_line=1,
+                    conventional_commit_tag=ConventionalCommitTag.FIX_BREAKING,
+                    subject=subject,
+                )
+        # A number and a string are not ordered, the strings are sorted by
+        # type first.
+        self.assertEqual(
+            [f.to_dict() for f in columnar.get_all_findings()],
+            [f.to_dict() for f in findings.get_all_findings()],
+        )
+        self.assertEqual([f.subject for f in columnar.get_all_findings()], ["foo", 2])
+
+
+if __name__ == "__main__":
+    unittest.main()